@@ -10,6 +10,8 @@ import pandas as pd
 import numpy as np
 from scipy.interpolate import interp1d
 
+from proxy_qc import read_screened
+
 def calculate_HgAR_vector(Hg_conc, density, SAR, err_Hg, err_DBD, err_SAR):
     """
     Compute HgAR and its absolute error.
@@ -119,6 +121,24 @@ def main():
         err_SAR = err_SAR_GDL
     )
 
+    # === Save results (every sample; proxy_qc flags HgAR with its Hg value when read) ===
+    results = pd.DataFrame({
+        'Hg_AR_EYC': HgAR_EYC,
+        'Err_EYC': err_EYC,
+        'Hg_AR_GDL': HgAR_GDL,
+        'Err_GDL': err_GDL
+    })
+
+    results.to_excel('HgAR.xlsx', index=False)
+    print("Results saved in 'HgAR.xlsx'")
+
+    # === Leave the samples flagged by proxy_qc out of the budget ===
+    df_Hg_qc = read_screened('Hg.xlsx')
+    ok_EYC = df_Hg_qc['Hg_conc_EYC'].notna()
+    ok_GDL = df_Hg_qc['Hg_conc_GDL'].notna()
+    HgAR_EYC, err_EYC = HgAR_EYC.where(ok_EYC), err_EYC.where(ok_EYC)
+    HgAR_GDL, err_GDL = HgAR_GDL.where(ok_GDL), err_GDL.where(ok_GDL)
+
     # === Extract age vectors ===
     age_EYC = df_Age['age_EYC']
     age_GDL = df_Age['age_GDL']
@@ -129,6 +149,12 @@ def main():
 
     HgAR_GDL_sel = HgAR_GDL.iloc[0:20]     # GDL 1–20
     age_GDL_sel = age_GDL.iloc[0:20]
+
+    # === Drop flagged samples from the selection ===
+    keep_EYC = HgAR_EYC_sel.notna()
+    keep_GDL = HgAR_GDL_sel.notna()
+    HgAR_EYC_sel, age_EYC_sel = HgAR_EYC_sel[keep_EYC], age_EYC_sel[keep_EYC]
+    HgAR_GDL_sel, age_GDL_sel = HgAR_GDL_sel[keep_GDL], age_GDL_sel[keep_GDL]
     
     # === Check and reverse if needed to ensure increasing age ===
     if age_EYC_sel.iloc[0] > age_EYC_sel.iloc[-1]:
@@ -144,8 +170,8 @@ def main():
     area_GDL = integrate_HgAR(HgAR_GDL_sel, age_GDL_sel)
 
     # === Select 1970–2023 range for error vectors ===
-    err_EYC_sel = err_EYC.iloc[0:18]
-    err_GDL_sel = err_GDL.iloc[0:20]
+    err_EYC_sel = err_EYC.iloc[0:18][keep_EYC]
+    err_GDL_sel = err_GDL.iloc[0:20][keep_GDL]
 
     # === Reverse errors if needed ===
     if age_EYC_sel.iloc[0] > age_EYC_sel.iloc[-1]:
@@ -170,24 +196,15 @@ def main():
     print(f"  EYC lake: {mass_EYC/1e9:.3f} kg ± {err_mass_EYC/1e9:.3f} kg")
     print(f"  GDL lake: {mass_GDL/1e9:.3f} kg ± {err_mass_GDL/1e9:.3f} kg")
 
-    # === Save results ===
-    results = pd.DataFrame({
-        'Hg_AR_EYC': HgAR_EYC,
-        'Err_EYC': err_EYC,
-        'Hg_AR_GDL': HgAR_GDL,
-        'Err_GDL': err_GDL
-    })
 
-    results.to_excel('HgAR.xlsx', index=False)
-    print("Results saved in 'HgAR.xlsx'")
-    
-    
     # --- Normalizza ciascuna curva al proprio valore nel 1970 ---
 
-    # 1) funzione ausiliaria per avere vettori monotoni
+    # 1) funzione ausiliaria per avere vettori monotoni (senza campioni scartati)
     def _ensure_increasing(x, y):
         x = np.asarray(x)
         y = np.asarray(y)
+        ok = np.isfinite(x) & np.isfinite(y)
+        x, y = x[ok], y[ok]
         if x[0] > x[-1]:
             return x[::-1], y[::-1]
         return x, y
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:41:06 2026
+
+Incremental update of HgAR results when new slices are analysed.
+
+The full computation of HgAR_calc.main() is done once per core to initialise a
+columnar results store (HgAR_results/<core>.results). Afterwards, new sample
+rows (e.g. an analyzer run log with Sample, Depth, Hg, RSD) are dated and
+converted to HgAR individually, appended to the store, and the 1970–2023 flux
+integral, its uncertainty and the lake Hg mass are updated with the
+contribution of the affected trapezoids only.
+
+Usage:
+    python HgAR_incremental.py init
+    python HgAR_incremental.py <core> <run_log.csv>
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from HgAR_calc import calculate_HgAR_vector, compute_mass, surface_EYC_m2, surface_GDL_m2
+from proxy_qc import read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = DATA_DIR / "HgAR_results"
+
+# Same settings as HgAR_calc.main()
+ERR_DBD = 0.05
+WINDOW = (1970.0, 2023.0)
+WINDOW_TOLERANCE = 0.5  # a sample this close to the start year closes the window [yr]
+SURFACES = {'EYC': surface_EYC_m2, 'GDL': surface_GDL_m2}
+
+COLUMNS = ['run', 'sample', 'depth', 'age', 'Hg', 'RSD', 'DBD', 'HgAR', 'err']
+
+
+def results_path(core):
+    return RESULTS_DIR / f"{core}.results"
+
+
+def window_mask(age, window=WINDOW):
+    """
+    Select the samples used for the flux integral.
+
+    As in HgAR_calc.main() (iloc[0:18] for EYC, iloc[0:20] for GDL), the window
+    holds every sample younger than window[0] plus the first older one, so that
+    the integral reaches the start year; the older sample is not added when a
+    sample already lies within WINDOW_TOLERANCE of the start year (EYC, 1970.09).
+
+    Parameters:
+    - age: vector of ages sorted by increasing age
+    - window: (start, end) years
+
+    Returns:
+    - boolean mask on age
+    """
+    age = np.asarray(age)
+    mask = (age >= window[0]) & (age <= window[1])
+    older = np.flatnonzero(age < window[0])
+    if older.size and not np.any(mask & (age - window[0] <= WINDOW_TOLERANCE)):
+        mask[older[-1]] = True
+    return mask
+
+
+def trapezoid_terms(age, HgAR, err):
+    """
+    Area and variance of each trapezoid of the HgAR curve.
+
+    Same rule as HgAR_calc.integrate_HgAR and HgAR_calc.integrate_error.
+
+    Returns:
+    - area, var: vectors of length len(age) - 1
+    """
+    dx = np.diff(age)
+    area = dx * (HgAR[1:] + HgAR[:-1]) / 2
+    var = (dx / 2) ** 2 * (err[1:] ** 2 + err[:-1] ** 2)
+    return area, var
+
+
+def current_samples(core):
+    """
+    Latest result of every sample of a core, sorted by increasing age.
+
+    Returns:
+    - DataFrame with the COLUMNS of the results store
+    """
+    df = columnar_store.read_frame(results_path(core))
+    df = df.drop_duplicates('sample', keep='last')
+    return df.sort_values('age', kind='stable').reset_index(drop=True)
+
+
+def initialise(core, data_dir=DATA_DIR):
+    """
+    Run the full HgAR computation for a core and create its results store.
+
+    Parameters:
+    - core: 'EYC' or 'GDL'
+    - data_dir: path of the Data folder
+
+    Returns:
+    - attrs: running state (SAR, integrals, mass) stored with the results
+    """
+    # Samples flagged by proxy_qc are left out (dropna below)
+    df_Hg = read_screened(data_dir / 'Hg.xlsx')
+    df_DBD = read_screened(data_dir / 'DBD.xlsx')
+    df_Age = pd.read_excel(data_dir / '210_Pb_dating' / 'Age.xlsx')
+
+    SAR = float(df_Age[f'SAR_{core}'].iloc[0])
+    err_SAR = float(df_Age[f'err_SAR_{core}'].iloc[0])
+
+    df = pd.DataFrame({
+        'sample': df_Hg[f'Sample_{core}'],
+        'depth': df_Hg[f'Depth_{core}'],
+        'age': df_Age[f'age_{core}'],
+        'Hg': df_Hg[f'Hg_conc_{core}'],
+        'RSD': df_Hg[f'RSD_{core}'],
+        'DBD': df_DBD[f'DBD_{core}'],
+    }).dropna()
+    df['HgAR'], df['err'] = calculate_HgAR_vector(df['Hg'], df['DBD'], SAR, df['RSD'], ERR_DBD, err_SAR)
+    df['run'] = 0
+
+    path = results_path(core)
+    if columnar_store.exists(path):
+        raise FileExistsError(f"Results store already exists: {path}")
+
+    df = df.sort_values('age').reset_index(drop=True)
+    sel = window_mask(df['age'].to_numpy())
+    area, var = trapezoid_terms(*(df.loc[sel, c].to_numpy() for c in ('age', 'HgAR', 'err')))
+
+    attrs = {
+        'core': core, 'SAR': SAR, 'err_SAR': err_SAR, 'err_DBD': ERR_DBD,
+        'window': list(WINDOW), 'surface_m2': SURFACES[core],
+        'area': float(area.sum()), 'var_area': float(var.sum()), 'last_run': 0,
+    }
+    attrs['mass'], attrs['err_mass'] = compute_mass(attrs['area'], np.sqrt(attrs['var_area']), SURFACES[core])
+
+    columnar_store.append_columns(path, _to_columns(df), attrs=attrs)
+    return attrs
+
+
+def _to_columns(df):
+    return {
+        'run': df['run'].to_numpy(dtype=np.int32),
+        'sample': df['sample'].astype(str).to_numpy().astype('S16'),
+        **{c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS[2:]},
+    }
+
+
+def date_samples(depth, samples, SAR):
+    """
+    Age of new slices from the depth-age pairs of the existing samples.
+
+    Inside the dated range ages are interpolated linearly; below or above it
+    they are extrapolated with the constant sedimentation rate of the core.
+
+    Parameters:
+    - depth: vector of depths of the new slices [mm]
+    - samples: DataFrame of current samples (depth, age)
+    - SAR: sediment accumulation rate [cm/yr]
+
+    Returns:
+    - vector of ages [years AD]
+    """
+    ref = samples.sort_values('depth')
+    d, a = ref['depth'].to_numpy(), ref['age'].to_numpy()
+    depth = np.asarray(depth, dtype=float)
+    age = np.interp(depth, d, a)
+    rate = SAR * 10  # mm/yr
+    age = np.where(depth > d[-1], a[-1] - (depth - d[-1]) / rate, age)
+    age = np.where(depth < d[0], a[0] + (d[0] - depth) / rate, age)
+    return age
+
+
+def append_measurements(core, run_log):
+    """
+    Add new (or re-measured) slices and update the running integrals.
+
+    Only the new rows are converted to HgAR; the flux integral and its
+    variance are updated with the trapezoids that changed, and the lake mass
+    follows from the updated integral.
+
+    Parameters:
+    - core: 'EYC' or 'GDL'
+    - run_log: DataFrame with columns Sample, Depth [mm], Hg [ng/g], RSD and
+      optionally DBD [g/cm³] and Age; missing DBD and Age are interpolated
+      from the existing samples
+
+    Returns:
+    - attrs: updated running state
+    - new: DataFrame of the rows appended to the results store
+    """
+    path = results_path(core)
+    attrs = columnar_store.read_meta(path)['attrs']
+    old = current_samples(core)
+
+    # === Complete and convert the new rows ===
+    new = pd.DataFrame({
+        'sample': run_log['Sample'].astype(str),
+        'depth': run_log['Depth'].astype(float),
+        'Hg': run_log['Hg'].astype(float),
+        'RSD': run_log['RSD'].astype(float),
+    })
+    by_depth = old.sort_values('depth')
+    if 'DBD' in run_log:
+        new['DBD'] = run_log['DBD'].astype(float).to_numpy()
+    else:
+        new['DBD'] = np.interp(new['depth'], by_depth['depth'], by_depth['DBD'])
+    if 'Age' in run_log:
+        new['age'] = run_log['Age'].astype(float).to_numpy()
+    else:
+        new['age'] = date_samples(new['depth'], old, attrs['SAR'])
+    new['HgAR'], new['err'] = calculate_HgAR_vector(new['Hg'], new['DBD'], attrs['SAR'],
+                                                    new['RSD'], attrs['err_DBD'], attrs['err_SAR'])
+    new['run'] = attrs['last_run'] + 1
+
+    # === Merge with the current samples (a sample re-measured replaces the old row) ===
+    cur = pd.concat([old[~old['sample'].isin(new['sample'])], new[COLUMNS]], ignore_index=True)
+    cur = cur.sort_values('age', kind='stable').reset_index(drop=True)
+
+    # === Delta update of the integrals over the changed trapezoids ===
+    window = tuple(attrs['window'])
+    xo, yo, eo = (old.loc[window_mask(old['age'].to_numpy(), window), c].to_numpy() for c in ('age', 'HgAR', 'err'))
+    xn, yn, en = (cur.loc[window_mask(cur['age'].to_numpy(), window), c].to_numpy() for c in ('age', 'HgAR', 'err'))
+    lo, hi_o, hi_n = _changed_span((xo, yo, eo), (xn, yn, en))
+    a_old, v_old = trapezoid_terms(xo[lo:hi_o], yo[lo:hi_o], eo[lo:hi_o])
+    a_new, v_new = trapezoid_terms(xn[lo:hi_n], yn[lo:hi_n], en[lo:hi_n])
+
+    attrs['area'] += float(a_new.sum() - a_old.sum())
+    attrs['var_area'] += float(v_new.sum() - v_old.sum())
+    attrs['mass'], attrs['err_mass'] = compute_mass(attrs['area'], np.sqrt(attrs['var_area']),
+                                                    attrs['surface_m2'])
+    attrs['last_run'] = int(new['run'].iloc[0])
+
+    columnar_store.append_columns(path, _to_columns(new), attrs=attrs)
+    return attrs, new
+
+
+def _changed_span(old, new):
+    """
+    Index span of the samples that differ between two sorted windows.
+
+    Samples before lo and the last samples outside the span are identical in
+    both windows, so only trapezoids inside [lo, hi) can have changed.
+
+    Returns:
+    - lo, hi_old, hi_new: slice bounds in the old and new windows
+    """
+    n_o, n_n = len(old[0]), len(new[0])
+    n = min(n_o, n_n)
+
+    same_head = np.ones(n, dtype=bool)
+    same_tail = np.ones(n, dtype=bool)
+    for a, b in zip(old, new):
+        same_head &= a[:n] == b[:n]
+        same_tail &= a[n_o - n:][::-1] == b[n_n - n:][::-1]
+    head = n if same_head.all() else int(np.argmin(same_head))
+    tail = n if same_tail.all() else int(np.argmin(same_tail))
+    tail = min(tail, n - head)
+
+    # Keep one unchanged sample on each side: it closes the first/last changed trapezoid
+    lo = max(head - 1, 0)
+    return lo, min(n_o - tail + 1, n_o), min(n_n - tail + 1, n_n)
+
+
+def recompute_integrals(core):
+    """
+    Full recomputation of the flux integral and its variance (for checks).
+
+    Returns:
+    - area, var_area
+    """
+    attrs = columnar_store.read_meta(results_path(core))['attrs']
+    cur = current_samples(core)
+    sel = window_mask(cur['age'].to_numpy(), tuple(attrs['window']))
+    area, var = trapezoid_terms(*(cur.loc[sel, c].to_numpy() for c in ('age', 'HgAR', 'err')))
+    return float(area.sum()), float(var.sum())
+
+
+def main():
+    if len(sys.argv) == 2 and sys.argv[1] == 'init':
+        for core in SURFACES:
+            attrs = initialise(core)
+            print(f"{core}: flux {attrs['area']:.2f} ± {np.sqrt(attrs['var_area']):.2f} µg/m², "
+                  f"mass {attrs['mass']/1e9:.3f} ± {attrs['err_mass']/1e9:.3f} kg")
+    elif len(sys.argv) == 3:
+        core, run_log = sys.argv[1], pd.read_csv(sys.argv[2])
+        attrs, new = append_measurements(core, run_log)
+        print(f"{core}: run {attrs['last_run']} added {len(new)} samples")
+        print(f"  flux {attrs['area']:.2f} ± {np.sqrt(attrs['var_area']):.2f} µg/m², "
+              f"mass {attrs['mass']/1e9:.3f} ± {attrs['err_mass']/1e9:.3f} kg")
+    else:
+        print("\n".join(__doc__.strip().splitlines()[-2:]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 29 09:48:20 2026
+
+Sensitivity sweep of the HgAR budget over its hard-coded choices.
+
+The flux integrals, lake masses, normalised integrals and glacier excess of
+HgAR_calc.main() are evaluated over a grid of
+- window_start: start year of the integration window (HgAR_calc: 1970, i.e.
+  iloc[0:18] for EYC and iloc[0:20] for GDL);
+- ref_year: year of the normalisation reference (HgAR_calc: 1970);
+- err_DBD: relative error on the dry bulk density (HgAR_calc: 0.05);
+- norm: how the reference HgAR is taken: 'interp' (interp1d at ref_year, as
+  HgAR_calc), 'nearest' (sample closest to ref_year) or 'figure_3' (fixed
+  rows 17 for EYC and 20 for GDL, as figure_3.py; ref_year is ignored).
+Grid points are evaluated in parallel processes and every output is stored as
+an N-dimensional array labelled by the grid coordinates (result store
+results/HgAR_sweep, see result_store.py), so
+what-if questions become lookups with select().
+
+Usage:
+    python HgAR_sweep.py
+"""
+
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+
+import result_store
+from HgAR_calc import calculate_HgAR_vector, compute_mass, surface_EYC_m2, surface_GDL_m2
+from HgAR_incremental import trapezoid_terms, window_mask
+from proxy_qc import read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+SWEEP_PATH = result_store.RESULTS_DIR / "HgAR_sweep"
+
+CORES = ('EYC', 'GDL')
+SURFACES = {'EYC': surface_EYC_m2, 'GDL': surface_GDL_m2}
+
+# Reference rows used by figure_3.py
+FIGURE_3_ROWS = {'EYC': 17, 'GDL': 20}
+
+WINDOW_END = 2023.0
+N_GRID = 1000
+
+# Default grid: dimension -> coordinates (HgAR_calc values included)
+GRID = {
+    'window_start': [1950.0, 1955.0, 1960.0, 1965.0, 1970.0, 1975.0, 1980.0],
+    'ref_year': [1960.0, 1965.0, 1970.0, 1975.0, 1980.0],
+    'err_DBD': [0.02, 0.05, 0.10, 0.15],
+    'norm': ['interp', 'nearest', 'figure_3'],
+}
+
+OUTPUTS = ['area_EYC', 'err_area_EYC', 'area_GDL', 'err_area_GDL',
+           'mass_EYC', 'err_mass_EYC', 'mass_GDL', 'err_mass_GDL',
+           'ref_EYC', 'ref_GDL', 'integral_norm_EYC', 'integral_norm_GDL',
+           'area_between', 'mass_diff_g']
+
+
+def load_inputs(data_dir=DATA_DIR):
+    """
+    Per-core inputs of the budget, sorted by increasing age (samples flagged
+    by proxy_qc left out).
+
+    Returns:
+    - dict core -> dict with row, age, Hg, RSD, DBD (vectors), SAR, err_SAR
+    """
+    df_Hg = read_screened(Path(data_dir) / 'Hg.xlsx')
+    df_DBD = read_screened(Path(data_dir) / 'DBD.xlsx')
+    df_Age = pd.read_excel(Path(data_dir) / '210_Pb_dating' / 'Age.xlsx')
+
+    inputs = {}
+    for core in CORES:
+        df = pd.DataFrame({
+            'age': df_Age[f'age_{core}'], 'Hg': df_Hg[f'Hg_conc_{core}'],
+            'RSD': df_Hg[f'RSD_{core}'], 'DBD': df_DBD[f'DBD_{core}'],
+        }).dropna().sort_values('age')
+        inputs[core] = {'row': df.index.to_numpy(), **{c: df[c].to_numpy(dtype=float) for c in df},
+                        'SAR': float(df_Age[f'SAR_{core}'].iloc[0]),
+                        'err_SAR': float(df_Age[f'err_SAR_{core}'].iloc[0])}
+    return inputs
+
+
+def evaluate(inputs, window_start=1970.0, ref_year=1970.0, err_DBD=0.05, norm='interp',
+             window_end=WINDOW_END, n_grid=N_GRID):
+    """
+    Budget of HgAR_calc.main() for one set of choices (defaults: those of HgAR_calc).
+
+    Returns:
+    - dict output name -> value (see OUTPUTS)
+    """
+    out = {}
+    grid = np.linspace(window_start, window_end, n_grid)
+    for core in CORES:
+        d = inputs[core]
+        age = d['age']
+        HgAR, err = calculate_HgAR_vector(d['Hg'], d['DBD'], d['SAR'], d['RSD'], err_DBD, d['err_SAR'])
+
+        sel = window_mask(age, (window_start, window_end))
+        area, var = trapezoid_terms(age[sel], HgAR[sel], err[sel])
+        out[f'area_{core}'], out[f'err_area_{core}'] = area.sum(), np.sqrt(var.sum())
+        out[f'mass_{core}'], out[f'err_mass_{core}'] = compute_mass(out[f'area_{core}'], out[f'err_area_{core}'],
+                                                                    SURFACES[core])
+
+        if norm == 'interp':
+            ref = float(interp1d(age, HgAR, bounds_error=False, fill_value="extrapolate")(ref_year))
+        elif norm == 'nearest':
+            ref = HgAR[np.argmin(np.abs(age - ref_year))]
+        elif norm == 'figure_3':
+            ref = HgAR[d['row'] == FIGURE_3_ROWS[core]][0]
+        else:
+            raise ValueError(f"Unknown normalisation '{norm}' (use 'interp', 'nearest' or 'figure_3')")
+        curve = interp1d(age, HgAR / ref, bounds_error=False, fill_value="extrapolate")(grid)
+        out[f'ref_{core}'] = ref
+        out[f'integral_norm_{core}'] = np.sum(np.diff(grid) * (curve[1:] + curve[:-1]) / 2)
+
+    out['area_between'] = out['integral_norm_EYC'] - out['integral_norm_GDL']
+    out['mass_diff_g'] = out['area_between'] * out['ref_EYC'] * SURFACES['EYC'] / 1e6
+    return out
+
+
+_INPUTS = None
+
+
+def _init_worker(data_dir):
+    global _INPUTS
+    _INPUTS = load_inputs(data_dir)
+
+
+def _evaluate_chunk(points):
+    return [evaluate(_INPUTS, **p) for p in points]
+
+
+def run_sweep(grid=GRID, data_dir=DATA_DIR, n_workers=None, chunk_size=64):
+    """
+    Evaluate the budget over the full grid in parallel processes.
+
+    Parameters:
+    - grid: dict dimension -> coordinates; the dimensions are keyword arguments
+      of evaluate() (those not swept keep their defaults)
+    - data_dir: path of the Data folder
+    - n_workers: number of processes (default: ProcessPoolExecutor default)
+    - chunk_size: grid points per task
+
+    Returns:
+    - sweep: dict with 'dims', 'coords' (dim -> array) and 'data'
+      (output -> array of shape [len(coords[d]) for d in dims])
+    """
+    dims = list(grid)
+    coords = {d: np.asarray(grid[d]) for d in dims}
+    points = [dict(zip(dims, p)) for p in itertools.product(*(grid[d] for d in dims))]
+    chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(data_dir,)) as pool:
+        results = [r for chunk in pool.map(_evaluate_chunk, chunks) for r in chunk]
+
+    shape = [len(coords[d]) for d in dims]
+    data = {k: np.array([r[k] for r in results], dtype=float).reshape(shape) for k in OUTPUTS}
+    return {'dims': dims, 'coords': coords, 'data': data}
+
+
+def save_sweep(sweep, path=SWEEP_PATH):
+    """
+    Write a sweep to a labelled result store (see result_store.py), replacing
+    an existing one.
+    """
+    result_store.create(path, sweep['coords'], attrs={'source': 'HgAR_sweep.py', 'dims': sweep['dims']},
+                        overwrite=True)
+    for k, v in sweep['data'].items():
+        result_store.write_variable(path, k, v, sweep['dims'])
+
+
+def load_sweep(path=SWEEP_PATH):
+    """
+    Read a sweep saved by save_sweep (see run_sweep for the layout).
+    """
+    meta = result_store.read_meta(path)
+    dims = meta['attrs']['dims']
+    return {'dims': dims,
+            'coords': {d: np.asarray(meta['dims'][d]) for d in dims},
+            'data': {k: result_store.open_variable(path, k).values for k in meta['variables']}}
+
+
+def select(sweep, output, **coords):
+    """
+    Look up an output at given coordinates (nearest grid value for numbers).
+
+    Dimensions not given are kept, e.g.
+    select(sweep, 'mass_diff_g', err_DBD=0.05, norm='interp') returns the
+    (window_start, ref_year) table.
+
+    Returns:
+    - scalar or array over the remaining dimensions
+    """
+    index = []
+    for d in sweep['dims']:
+        if d not in coords:
+            index.append(slice(None))
+            continue
+        c = sweep['coords'][d]
+        if c.dtype.kind in 'US':
+            index.append(int(np.flatnonzero(c == coords[d])[0]))
+        else:
+            index.append(int(np.argmin(np.abs(c - coords[d]))))
+    return sweep['data'][output][tuple(index)]
+
+
+def main():
+    t0 = time.perf_counter()
+    sweep = run_sweep()
+    n = int(np.prod([len(c) for c in sweep['coords'].values()]))
+    print(f"{n} grid points evaluated in {time.perf_counter() - t0:.2f} s")
+    save_sweep(sweep)
+    result_store.export_excel(SWEEP_PATH, SWEEP_PATH.with_suffix(".xlsx"))
+    print(f"Saved to {SWEEP_PATH.relative_to(DATA_DIR)}")
+
+    base = dict(window_start=1970.0, ref_year=1970.0, err_DBD=0.05, norm='interp')
+    print("\nHgAR_calc settings:")
+    for k in ('area_EYC', 'area_GDL', 'mass_EYC', 'mass_GDL', 'area_between', 'mass_diff_g'):
+        print(f"  {k}: {float(select(sweep, k, **base)):.4f}")
+
+    table = select(sweep, 'mass_diff_g', err_DBD=0.05, norm='interp')
+    print("\nGlacier excess [g] (rows: window_start, columns: ref_year):")
+    print(pd.DataFrame(table, index=sweep['coords']['window_start'],
+                       columns=sweep['coords']['ref_year']).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
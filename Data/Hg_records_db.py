@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:40 2026
+
+Local SQLite store for multi-lake Hg records in long format.
+
+Every value is stored as one row (lake, core, variable, age, depth, value, error),
+so published records with different age axes (Hg_lake.xlsx, HgAR.xlsx, ...) can be
+queried together and returned as aligned NumPy arrays without re-parsing the
+spreadsheets.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from proxy_qc import read_screened
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    lake     TEXT NOT NULL,
+    core     TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    age      REAL NOT NULL,
+    depth    REAL,
+    value    REAL NOT NULL,
+    error    REAL,
+    source   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_records_lake_core_age ON records (lake, core, age);
+CREATE INDEX IF NOT EXISTS idx_records_variable ON records (variable);
+"""
+
+# Default location of the store, next to the workbooks it is built from
+DEFAULT_DB = Path(__file__).resolve().parent / "Hg_records.sqlite"
+
+
+def connect_store(db_path=DEFAULT_DB):
+    """
+    Open (and create if needed) the Hg record store.
+
+    Parameters:
+    - db_path: path of the SQLite file, or ":memory:"
+
+    Returns:
+    - conn: sqlite3 connection with the schema in place
+    """
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def insert_records(conn, lake, core, variable, age, value, error=None, depth=None, source=None):
+    """
+    Insert one record (one variable of one core) into the store.
+
+    Rows with a missing age or value are skipped. Existing rows with the same
+    (lake, core, variable, source) are replaced, so ingestion can be re-run.
+
+    Parameters:
+    - lake, core, variable: identifiers of the record
+    - age: vector of ages [years AD]
+    - value: vector of values, same length as age
+    - error: optional vector of absolute errors
+    - depth: optional vector of depths [cm]
+    - source: optional name of the file the record comes from
+
+    Returns:
+    - n: number of rows inserted
+    """
+    age = np.asarray(age, dtype=float)
+    value = np.asarray(value, dtype=float)
+    error = np.full(age.shape, np.nan) if error is None else np.asarray(error, dtype=float)
+    depth = np.full(age.shape, np.nan) if depth is None else np.asarray(depth, dtype=float)
+
+    keep = np.isfinite(age) & np.isfinite(value)
+    rows = [
+        (lake, core, variable, a, None if np.isnan(d) else d, v, None if np.isnan(e) else e, source)
+        for a, d, v, e in zip(age[keep].tolist(), depth[keep].tolist(),
+                              value[keep].tolist(), error[keep].tolist())
+    ]
+
+    with conn:
+        conn.execute(
+            "DELETE FROM records WHERE lake = ? AND core = ? AND variable = ? AND source IS ?",
+            (lake, core, variable, source),
+        )
+        conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def ingest_wide_workbook(conn, path, columns, sheet_name=0):
+    """
+    Ingest a wide-format workbook where each record sits in its own columns.
+
+    Parameters:
+    - path: Excel file to read
+    - columns: list of dicts with keys lake, core, variable, age, value and
+      optionally error, depth (column names in the workbook)
+    - sheet_name: sheet to read
+
+    Returns:
+    - n: total number of rows inserted
+    """
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    n = 0
+    for spec in columns:
+        n += insert_records(
+            conn,
+            lake=spec["lake"],
+            core=spec["core"],
+            variable=spec["variable"],
+            age=df[spec["age"]],
+            value=df[spec["value"]],
+            error=df[spec["error"]] if spec.get("error") else None,
+            depth=df[spec["depth"]] if spec.get("depth") else None,
+            source=Path(path).name,
+        )
+    return n
+
+
+def ingest_repository(conn, data_dir):
+    """
+    Ingest the Hg records shipped in the Data folder.
+
+    - Hg_lake.xlsx: Hg fluxes of Luitel (Lui) and Montcortés (Mont)
+    - HgAR.xlsx + 210_Pb_dating/Age.xlsx: Hg accumulation rates of GDL and EYC
+    - Hg.xlsx + 210_Pb_dating/Age.xlsx: Hg concentrations of GDL and EYC
+
+    Parameters:
+    - conn: open store connection
+    - data_dir: path of the Data folder
+
+    Returns:
+    - n: total number of rows inserted
+    """
+    data_dir = Path(data_dir)
+
+    # === Published records of other lakes (wide format) ===
+    n = ingest_wide_workbook(conn, data_dir / "Hg_lake.xlsx", [
+        {"lake": "Lui", "core": "Lui", "variable": "HgAR", "age": "Age_Lui", "value": "Flux_Lui"},
+        {"lake": "Mont", "core": "Mont", "variable": "HgAR", "age": "Age_Mont", "value": "Flux_Mont"},
+    ])
+
+    # === Records of this study share the age model of Age.xlsx (QC flags applied) ===
+    df_age = pd.read_excel(data_dir / "210_Pb_dating" / "Age.xlsx")
+    df_HgAR = read_screened(data_dir / "HgAR.xlsx")
+    df_Hg = read_screened(data_dir / "Hg.xlsx")
+
+    for lake in ["GDL", "EYC"]:
+        age = df_age[f"age_{lake}"]
+        n += insert_records(conn, lake, lake, "HgAR", age, df_HgAR[f"Hg_AR_{lake}"],
+                            error=df_HgAR[f"Err_{lake}"], depth=df_Hg[f"Depth_{lake}"],
+                            source="HgAR.xlsx")
+        n += insert_records(conn, lake, lake, "Hg_conc", age, df_Hg[f"Hg_conc_{lake}"],
+                            error=df_Hg[f"RSD_{lake}"] * df_Hg[f"Hg_conc_{lake}"],
+                            depth=df_Hg[f"Depth_{lake}"], source="Hg.xlsx")
+    return n
+
+
+def list_records(conn):
+    """
+    Summarise the content of the store.
+
+    Returns:
+    - DataFrame with one row per (lake, core, variable) and its age range
+    """
+    return pd.read_sql_query(
+        "SELECT lake, core, variable, COUNT(*) AS n, MIN(age) AS age_min, MAX(age) AS age_max "
+        "FROM records GROUP BY lake, core, variable ORDER BY lake, core, variable",
+        conn,
+    )
+
+
+def query_aligned(conn, lakes, variable, age_min=None, age_max=None, age_grid=None, cores=None):
+    """
+    Return one variable for a set of lakes as aligned arrays.
+
+    Without age_grid, the rows are aligned on the union of the ages found in
+    the window (NaN where a lake has no sample at that age). With age_grid,
+    every record is linearly interpolated on the grid, without extrapolation
+    beyond its own age range; the window then also keeps the first sample of
+    each lake beyond each bound, so grid points between that sample and the
+    first sample inside the window are interpolated too.
+
+    Every row is the record of one core; a lake holding several cores of the
+    variable needs its core in cores (records are never merged across cores).
+
+    Parameters:
+    - lakes: list of lake codes (e.g. ['GDL', 'Lui', 'Mont'])
+    - variable: variable name (e.g. 'HgAR')
+    - age_min, age_max: optional age window [years AD], bounds included
+    - age_grid: optional vector of ages to interpolate on
+    - cores: optional list of core codes, one per lake (None: the only core
+      of the lake)
+
+    Returns:
+    - ages: vector of ages, shape (n_ages,)
+    - values: array of shape (len(lakes), n_ages)
+    - errors: array of shape (len(lakes), n_ages)
+    """
+    lakes = list(lakes)
+    cores = [None] * len(lakes) if cores is None else list(cores)
+    if len(cores) != len(lakes):
+        raise ValueError("cores must give one core per lake")
+    sql = (
+        f"SELECT lake, core, age, value, error FROM records "
+        f"WHERE variable = ? AND lake IN ({','.join('?' * len(lakes))})"
+    )
+    params = [variable] + lakes
+    # With a grid, keep the nearest sample of each core beyond each bound, so
+    # the grid points near the window edges can still be interpolated
+    bracket = (
+        "COALESCE((SELECT {fn}(b.age) FROM records b WHERE b.variable = records.variable "
+        "AND b.lake = records.lake AND b.core = records.core AND b.age {op} ?), ?)"
+    )
+    if age_min is not None:
+        if age_grid is None:
+            sql += " AND age >= ?"
+            params.append(float(age_min))
+        else:
+            sql += " AND age >= " + bracket.format(fn='MAX', op='<')
+            params += [float(age_min)] * 2
+    if age_max is not None:
+        if age_grid is None:
+            sql += " AND age <= ?"
+            params.append(float(age_max))
+        else:
+            sql += " AND age <= " + bracket.format(fn='MIN', op='>')
+            params += [float(age_max)] * 2
+
+    rows = conn.execute(sql + " ORDER BY lake, core, age", params).fetchall()
+    if rows:
+        lake_col, core_col, age, value, error = zip(*rows)
+    else:
+        lake_col, core_col, age, value, error = (), (), (), (), ()
+    lake_col = np.asarray(lake_col, dtype=object)
+    core_col = np.asarray(core_col, dtype=object)
+    age = np.asarray(age, dtype=float)
+    value = np.asarray(value, dtype=float)
+    error = np.asarray([np.nan if e is None else e for e in error], dtype=float)
+
+    if age_grid is None:
+        ages = np.unique(age)
+    else:
+        ages = np.asarray(age_grid, dtype=float)
+
+    values = np.full((len(lakes), len(ages)), np.nan)
+    errors = np.full((len(lakes), len(ages)), np.nan)
+
+    for i, (lake, core) in enumerate(zip(lakes, cores)):
+        sel = lake_col == lake
+        if core is None:
+            found = np.unique(core_col[sel])
+            if len(found) > 1:
+                raise ValueError(f"lake {lake} has several {variable} cores "
+                                 f"({', '.join(found)}); choose one with cores")
+        else:
+            sel &= core_col == core
+        if not sel.any():
+            continue
+        a, v, e = age[sel], value[sel], error[sel]
+        if age_grid is None:
+            idx = np.searchsorted(ages, a)
+            values[i, idx] = v
+            errors[i, idx] = e
+        else:
+            inside = (ages >= a[0]) & (ages <= a[-1])
+            values[i, inside] = np.interp(ages[inside], a, v)
+            errors[i, inside] = np.interp(ages[inside], a, e)
+
+    return ages, values, errors
+
+
+def main():
+    data_dir = Path(__file__).resolve().parent
+
+    # === Build (or refresh) the store from the workbooks ===
+    conn = connect_store(DEFAULT_DB)
+    t0 = time.perf_counter()
+    n = ingest_repository(conn, data_dir)
+    print(f"Ingested {n} rows into '{DEFAULT_DB.name}' in {time.perf_counter() - t0:.2f} s")
+    print(list_records(conn).to_string(index=False))
+
+    # === Example query: HgAR of three lakes on an annual grid ===
+    t0 = time.perf_counter()
+    ages, values, errors = query_aligned(conn, ["GDL", "Lui", "Mont"], "HgAR",
+                                         age_min=1900, age_max=2023,
+                                         age_grid=np.arange(1900, 2024))
+    print(f"Aligned query {values.shape} in {(time.perf_counter() - t0) * 1e3:.2f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:02:37 2026
+
+Streaming ingestion of raw XRF core-scanner exports.
+
+A raw export (one row per scan position, text file) is parsed in chunks,
+screened for quality (count rate and fit MSE), shifted from scanner depth to
+sediment depth (TOP_OFFSETS), dated through the 210Pb CFCS age model of the
+core and appended to a compact columnar scan file
+(<core>.scan/, see columnar_store.py). Sections already present in the scan
+file are skipped, so new sections can be added without reprocessing the core.
+The QC settings, elements and top offset are kept in the scan file, and an
+append with different settings is refused instead of mixing them.
+
+Usage:
+    python XRF_ingest.py <core> <export.txt> [<export2.txt> ...]
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from compositional import CLR_ELEMENTS, area_column, transform_frame
+
+DATA_DIR = Path(__file__).resolve().parent
+
+# Rows parsed at once from the raw export
+CHUNK_ROWS = 50_000
+
+# Scanner depth of the sediment surface of each core [mm]: the sediment depth
+# used by the age model is CoreDepth minus this offset (Depth in X_ray.xlsx)
+TOP_OFFSETS = {'EYC': 0.0, 'GDL': 52.0}
+
+# Default quality-control settings
+QC_DEFAULTS = {
+    'cps_col': 'cps',       # total count rate column of the export
+    'min_cps': 1000.0,      # positions with a lower count rate are rejected
+    'mse_col': 'MSE',       # spectrum fit error column of the export
+    'max_mse': 3.0,         # positions with a higher fit error are rejected
+}
+
+
+def load_age_model(core, data_dir=DATA_DIR):
+    """
+    Load the CFCS depth-age model of a core from the 210Pb dating folder.
+
+    Parameters:
+    - core: core code ('EYC', 'GDL')
+    - data_dir: path of the Data folder
+
+    Returns:
+    - DataFrame with depth_avg_mm, BestAD, MinAD, MaxAD sorted by depth
+    """
+    path = Path(data_dir) / "210_Pb_dating" / core / f"{core}_CFCS_interpolation.txt"
+    model = pd.read_csv(path, sep=r"\s+")
+    return model.sort_values("depth_avg_mm").reset_index(drop=True)
+
+
+def depth_to_age(depth_mm, age_model):
+    """
+    Interpolate ages (best, min, max) at scan depths.
+
+    Depths outside the dated interval get NaN, as in the Age_X_* columns of X_ray.xlsx.
+
+    Parameters:
+    - depth_mm: vector of depths [mm]
+    - age_model: DataFrame from load_age_model
+
+    Returns:
+    - best, min, max: vectors of ages [years AD]
+    """
+    depth_mm = np.asarray(depth_mm, dtype=float)
+    d = age_model["depth_avg_mm"].to_numpy()
+    inside = (depth_mm >= d[0]) & (depth_mm <= d[-1])
+    ages = []
+    for col in ("BestAD", "MinAD", "MaxAD"):
+        a = np.full(depth_mm.shape, np.nan)
+        a[inside] = np.interp(depth_mm[inside], d, age_model[col].to_numpy())
+        ages.append(a)
+    return tuple(ages)
+
+
+def quality_mask(chunk, qc):
+    """
+    Flag the scan positions that pass the quality control.
+
+    Criteria whose column is absent from the export are skipped.
+
+    Parameters:
+    - chunk: DataFrame of raw scan positions
+    - qc: dict of QC settings (see QC_DEFAULTS)
+
+    Returns:
+    - keep: boolean vector
+    - rejected: dict criterion -> number of positions rejected by it
+    """
+    keep = np.ones(len(chunk), dtype=bool)
+    rejected = {}
+    if qc.get('cps_col') in chunk.columns:
+        ok = chunk[qc['cps_col']].to_numpy(dtype=float) >= qc['min_cps']
+        rejected['cps'] = int((~ok).sum())
+        keep &= ok
+    if qc.get('mse_col') in chunk.columns:
+        ok = chunk[qc['mse_col']].to_numpy(dtype=float) <= qc['max_mse']
+        rejected['mse'] = int((~ok).sum())
+        keep &= ok
+    return keep, rejected
+
+
+def ingest_export(export_path, core, scan_path=None, elements=CLR_ELEMENTS, depth_col='CoreDepth',
+                  top_offset=None, section_col='SectionID', qc=None, age_model=None,
+                  chunk_rows=CHUNK_ROWS, **read_kwargs):
+    """
+    Parse a raw scanner export in chunks and append it to the scan file of a core.
+
+    For every kept position the scan file stores section, sediment depth, ages
+    (best/min/max), element areas (float32) and their CLR on `elements`.
+
+    Each append holds whole sections and records them in the 'sections'
+    attribute in the same commit (the last section of a chunk is carried over
+    to the next chunk, as it may continue there). An ingest interrupted
+    partway can therefore be re-run without duplicating rows. The rows of a
+    section must be contiguous in the export: a section that appears again
+    after another one raises ValueError rather than being skipped.
+
+    The scan file records qc, elements and top_offset; appending with other
+    values raises ValueError (write to a new scan_path to re-screen a core).
+
+    Parameters:
+    - export_path: raw text export (one row per position)
+    - core: core code, used for the age model and the default scan file name
+    - scan_path: scan folder (default Data/XRF_scans/<core>.scan)
+    - elements: elements kept and closed for the CLR
+    - depth_col: depth column of the export [mm]
+    - top_offset: value of depth_col at the sediment surface [mm], subtracted
+      before dating (default: TOP_OFFSETS of the core, 0 if absent)
+    - section_col: section identifier column of the export
+    - qc: dict overriding QC_DEFAULTS
+    - age_model: DataFrame from load_age_model (default: the core's CFCS model)
+    - chunk_rows: rows parsed at once
+    - read_kwargs: extra arguments for pandas.read_csv (default sep is tab)
+
+    Returns:
+    - summary: dict with counts of rows read, kept, rejected and sections skipped
+    """
+    qc = {**QC_DEFAULTS, **(qc or {})}
+    if scan_path is None:
+        scan_path = DATA_DIR / "XRF_scans" / f"{core}.scan"
+    if age_model is None:
+        age_model = load_age_model(core)
+    if top_offset is None:
+        top_offset = TOP_OFFSETS.get(core, 0.0)
+    read_kwargs.setdefault('sep', '\t')
+
+    done = set()
+    if columnar_store.exists(scan_path):
+        attrs = columnar_store.read_meta(scan_path)["attrs"]
+        settings = {'qc': qc, 'elements': list(elements), 'top_offset': float(top_offset)}
+        for key, value in settings.items():
+            if attrs.get(key) != value:
+                raise ValueError(f"Scan file {scan_path} was written with {key} "
+                                 f"{attrs.get(key)}, not {value}")
+        done = set(attrs.get("sections", []))
+
+    summary = {'read': 0, 'kept': 0, 'rejected': {}, 'sections_skipped': set(), 'sections_added': set()}
+
+    def commit(chunk):
+        # Append the kept rows of whole sections, and mark them as ingested in the same commit
+        keep, rejected = quality_mask(chunk, qc)
+        for k, v in rejected.items():
+            summary['rejected'][k] = summary['rejected'].get(k, 0) + v
+        chunk = chunk.loc[keep]
+        if chunk.empty:
+            return
+
+        # === Sediment depth -> age through the 210Pb model ===
+        depth = (chunk[depth_col].to_numpy(dtype=float) - top_offset).astype(np.float32)
+        best, lo, hi = depth_to_age(depth, age_model)
+
+        columns = {
+            'section': chunk[section_col].astype(str).to_numpy().astype('S16'),
+            'depth_mm': depth,
+            'age': best.astype(np.float32),
+            'age_min': lo.astype(np.float32),
+            'age_max': hi.astype(np.float32),
+        }
+        for e in elements:
+            columns[e] = chunk[area_column(chunk.columns, e)].to_numpy(dtype=np.float32)
+        clr = transform_frame(chunk, elements, method='clr')
+        for name in clr.columns:
+            columns[name] = clr[name].to_numpy()
+
+        added = set(np.unique(columns['section']).astype(str).tolist())
+        done.update(added)
+        columnar_store.append_columns(scan_path, columns, attrs={
+            'core': core, 'elements': list(elements), 'qc': qc, 'top_offset': float(top_offset),
+            'sections': sorted(done)})
+        summary['kept'] += len(chunk)
+        summary['sections_added'].update(added)
+
+    pending = None
+    closed, current = set(), None
+    for chunk in pd.read_csv(export_path, chunksize=chunk_rows, **read_kwargs):
+        summary['read'] += len(chunk)
+        sections = chunk[section_col].astype(str).to_numpy()
+
+        # === Sections must be contiguous (a later run would be skipped as done) ===
+        starts = np.r_[0, np.flatnonzero(sections[1:] != sections[:-1]) + 1]
+        runs = sections[starts].tolist()
+        if runs and runs[0] == current:
+            runs = runs[1:]
+        if runs and current is not None:
+            closed.add(current)
+        for s in runs:
+            if s in closed:
+                raise ValueError(f"Section {s} appears again after other sections in "
+                                 f"{export_path}; the rows of a section must be contiguous")
+            closed.add(s)
+        if runs:
+            current = runs[-1]
+            closed.discard(current)
+
+        # === Skip sections already in the scan file ===
+        new = ~np.isin(sections, list(done))
+        summary['sections_skipped'].update(np.unique(sections[~new]).tolist())
+        chunk = chunk.loc[new]
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        if chunk.empty:
+            continue
+
+        # === Hold back the last section, which may continue in the next chunk ===
+        sections = chunk[section_col].astype(str).to_numpy()
+        last = sections == sections[-1]
+        pending = chunk.loc[last]
+        commit(chunk.loc[~last])
+
+    if pending is not None and not pending.empty:
+        commit(pending)
+    return summary
+
+
+def read_scan(core, columns=None, scan_path=None):
+    """
+    Read a core scan file as a DataFrame sorted by depth.
+
+    Parameters:
+    - core: core code
+    - columns: optional list of columns to read
+    - scan_path: scan folder (default Data/XRF_scans/<core>.scan)
+    """
+    if scan_path is None:
+        scan_path = DATA_DIR / "XRF_scans" / f"{core}.scan"
+    if columns is not None and 'depth_mm' not in columns:
+        columns = list(columns) + ['depth_mm']
+    df = columnar_store.read_frame(scan_path, columns)
+    return df.sort_values('depth_mm', kind='stable').reset_index(drop=True)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        sys.exit(1)
+
+    core = sys.argv[1]
+    for export in sys.argv[2:]:
+        summary = ingest_export(export, core)
+        print(f"{export}: {summary['read']} positions read, {summary['kept']} kept, "
+              f"rejected {summary['rejected']}")
+        if summary['sections_skipped']:
+            print(f"  sections already ingested, skipped: {sorted(summary['sections_skipped'])}")
+
+
+if __name__ == "__main__":
+    main()
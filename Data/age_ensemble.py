@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:17:52 2026
+
+Age-model ensembles and their propagation through the derived time series.
+
+N monotonic age-depth realisations are drawn per core from the 210Pb age
+uncertainty (err_age_* in Age.xlsx, or MinAD/MaxAD of the CFCS interpolation
+files) and kept as one (N × depth) float32 array. HgAR, the 1970–2023
+integrals and masses, the 1970 normalisation, the glacier excess and the
+before/after-1970 correlations are then computed for all realisations at once,
+and summarised as percentile envelopes. The ensembles and budgets are kept
+in a labelled result store (results/age_ensemble, see result_store.py) with
+a percentile summary in results/age_ensemble.xlsx.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import result_store
+from HgAR_calc import surface_EYC_m2, surface_GDL_m2
+from HgAR_incremental import WINDOW_TOLERANCE
+from proxy_qc import read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+FIGURE_DIR = DATA_DIR.parent / "Figure"
+STORE_PATH = result_store.RESULTS_DIR / "age_ensemble"
+
+N_DRAWS = 1000
+ERR_DBD = 0.05
+SURFACES = {'EYC': surface_EYC_m2, 'GDL': surface_GDL_m2}
+
+
+# === Sampling ===
+
+def sample_ages(best, err, n=N_DRAWS, local_sigma=0.0, rng=None):
+    """
+    Draw monotonic age-depth realisations around a best age model.
+
+    Each realisation shifts the time elapsed since the top sample by err · z,
+    with one z ~ N(0, 1) per realisation (the 210Pb age errors of a core are
+    driven by common terms), so every depth keeps its own 1σ error. Elapsed
+    times are kept increasing with depth (and at least 5% of their best value),
+    and the intervals are optionally stretched by an independent log-normal
+    factor. Since every interval keeps a non-negative duration, ages stay
+    monotonic with depth. The local stretching of time at each depth, g, scales
+    the sedimentation rate there by 1/g.
+
+    Parameters:
+    - best: vector of best ages, ordered by depth (top first) [years AD]
+    - err: vector of 1σ age errors, same length
+    - n: number of realisations
+    - local_sigma: log-normal spread of the interval durations (0 = none)
+    - rng: numpy Generator (default: new unseeded generator)
+
+    Returns:
+    - ages: float32 array (n, len(best))
+    - g: array (n, len(best)) of local stretching factors (time scaled by g, SAR by 1/g)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    best = np.asarray(best, dtype=float)
+    err = np.asarray(err, dtype=float)
+
+    elapsed = best[0] - best
+    z = rng.standard_normal(n)
+    drawn = np.maximum(elapsed[None, :] + err[None, :] * z[:, None], 0.05 * elapsed[None, :])
+    drawn = np.maximum.accumulate(drawn, axis=1)
+
+    if local_sigma > 0:
+        steps = np.diff(drawn, axis=1)
+        steps *= rng.lognormal(-local_sigma ** 2 / 2, local_sigma, size=steps.shape)
+        drawn[:, 1:] = np.cumsum(steps, axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        g = np.gradient(drawn, axis=1) / np.gradient(elapsed)[None, :]
+    g = np.where(np.isfinite(g), g, 1.0)
+
+    ages = (best[0] - drawn).astype(np.float32)
+    return ages, g
+
+
+def load_samples(core, data_dir=DATA_DIR):
+    """
+    Hg samples of a core with their age, Hg, RSD and DBD on aligned rows.
+
+    Age.xlsx, Hg.xlsx and DBD.xlsx share the row order of the samples; a row
+    missing any of the values (or flagged by proxy_qc) is dropped from all of
+    them at once.
+
+    Returns:
+    - DataFrame with columns depth, age, err_age, Hg, RSD, DBD, top first
+    """
+    data_dir = Path(data_dir)
+    df_Age = pd.read_excel(data_dir / "210_Pb_dating" / "Age.xlsx")
+    df_Hg = read_screened(data_dir / "Hg.xlsx")
+    df_DBD = read_screened(data_dir / "DBD.xlsx")
+    df = pd.DataFrame({'depth': df_Hg[f"Depth_{core}"], 'age': df_Age[f"age_{core}"],
+                       'err_age': df_Age[f"err_age_{core}"], 'Hg': df_Hg[f"Hg_conc_{core}"],
+                       'RSD': df_Hg[f"RSD_{core}"], 'DBD': df_DBD[f"DBD_{core}"]})
+    return df.dropna(subset=['age', 'err_age', 'Hg', 'RSD', 'DBD']).reset_index(drop=True)
+
+
+def load_sample_ensemble(core, n=N_DRAWS, seed=None, data_dir=DATA_DIR):
+    """
+    Age ensemble at the Hg samples of a core (rows of load_samples, err_age_<core>).
+
+    Returns:
+    - ages: float32 array (n, n_samples)
+    - g: array (n, n_samples) of local stretching factors
+    """
+    df = load_samples(core, data_dir)
+    return sample_ages(df['age'], df['err_age'], n, rng=np.random.default_rng(seed))
+
+
+def load_cfcs_ensemble(core, depth_mm, n=N_DRAWS, seed=None, data_dir=DATA_DIR):
+    """
+    Age ensemble at arbitrary depths from the CFCS interpolation file (MinAD/MaxAD).
+
+    Parameters:
+    - core: core code
+    - depth_mm: vector of increasing depths [mm] inside the dated interval
+
+    Returns:
+    - ages: float32 array (n, len(depth_mm))
+    - g: array (n, len(depth_mm)) of local stretching factors
+    """
+    path = Path(data_dir) / "210_Pb_dating" / core / f"{core}_CFCS_interpolation.txt"
+    model = pd.read_csv(path, sep=r"\s+").sort_values("depth_avg_mm")
+    d = model["depth_avg_mm"].to_numpy()
+    best = np.interp(depth_mm, d, model["BestAD"].to_numpy())
+    err = np.interp(depth_mm, d, ((model["MaxAD"] - model["MinAD"]) / 2).to_numpy())
+    return sample_ages(best, err, n, rng=np.random.default_rng(seed))
+
+
+def save_ensemble(path, ens, budget=None, data_dir=DATA_DIR):
+    """
+    Save the ensembles of all cores in a labelled result store (see
+    result_store.py), with dimensions core, draw and sample (Hg samples from
+    the top, NaN-padded to the longest core). An existing store is replaced.
+
+    Parameters:
+    - path: folder of the store
+    - ens: dict core -> (ages, HgAR), arrays (n, n_samples) sorted by increasing age
+    - budget: optional dict of vectors (n,) from propagate_budget
+    """
+    cores = list(ens)
+    n_draws = len(next(iter(ens.values()))[0])
+    n_samples = max(a.shape[1] for a, _ in ens.values())
+
+    shape = (len(cores), n_draws, n_samples)
+    ages, HgAR = np.full(shape, np.nan, dtype=np.float32), np.full(shape, np.nan, dtype=np.float32)
+    depth_mm = np.full((len(cores), n_samples), np.nan)
+    for i, (core, (a, h)) in enumerate(ens.items()):
+        k = a.shape[1]
+        ages[i, :, :k], HgAR[i, :, :k] = a[:, ::-1], h[:, ::-1]   # back to depth order
+        depth_mm[i, :k] = load_samples(core, data_dir)['depth'].to_numpy()[:k]
+
+    result_store.create(path, {'core': cores, 'draw': np.arange(n_draws), 'sample': np.arange(n_samples)},
+                        attrs={'source': 'age_ensemble.py'}, overwrite=True)
+    result_store.write_variable(path, 'depth', depth_mm, ['core', 'sample'], attrs={'units': 'mm'})
+    result_store.write_variable(path, 'age', ages, ['core', 'draw', 'sample'], attrs={'units': 'yr AD'})
+    result_store.write_variable(path, 'HgAR', HgAR, ['core', 'draw', 'sample'], attrs={'units': 'µg/m²/yr'})
+    for name, values in (budget or {}).items():
+        result_store.write_variable(path, name, np.asarray(values), ['draw'])
+
+
+# === Batched kernels ===
+
+def interp_rows(xq, x, y):
+    """
+    Linear interpolation of many curves at once, with linear extrapolation
+    (as interp1d(..., fill_value="extrapolate")).
+
+    Rows are interpolated independently in a single searchsorted call, by
+    offsetting every row onto its own segment of the real line.
+
+    Parameters:
+    - xq: query points, shape (m,) or (n_rows, m)
+    - x: increasing abscissae, shape (n_rows, n)
+    - y: ordinates, shape (n_rows, n)
+
+    Returns:
+    - array (n_rows, m)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_rows, n = x.shape
+    xq = np.broadcast_to(np.asarray(xq, dtype=float), (n_rows, np.shape(xq)[-1]))
+
+    lo = np.minimum(x.min(), xq.min())
+    span = max(x.max(), xq.max()) - lo + 1.0
+    offset = (np.arange(n_rows) * span)[:, None]
+
+    flat = (x - lo + offset).ravel()
+    idx = np.searchsorted(flat, (xq - lo + offset).ravel()).reshape(xq.shape)
+    idx -= (np.arange(n_rows) * n)[:, None]
+    idx = np.clip(idx, 1, n - 1)
+
+    rows = np.arange(n_rows)[:, None]
+    x0, x1 = x[rows, idx - 1], x[rows, idx]
+    y0, y1 = y[rows, idx - 1], y[rows, idx]
+    return y0 + (y1 - y0) * (xq - x0) / (x1 - x0)
+
+
+def window_pairs(x, start, end):
+    """
+    Trapezoids used by the flux integral of HgAR_calc.main(), for many curves.
+
+    Vectorised form of HgAR_incremental.window_mask: the window holds the
+    samples between start and end plus the first older one, unless a sample
+    already lies within WINDOW_TOLERANCE of start (iloc[0:18] for EYC,
+    iloc[0:20] for GDL in HgAR_calc).
+
+    Parameters:
+    - x: increasing ages, shape (n_rows, n)
+    - start, end: window bounds, scalars or vectors (n_rows,)
+
+    Returns:
+    - boolean array (n_rows, n - 1), True for the trapezoids in the window
+    """
+    x = np.asarray(x, dtype=float)
+    start = np.broadcast_to(start, x.shape[0])[:, None]
+    end = np.broadcast_to(end, x.shape[0])[:, None]
+    keep = (x >= start) & (x <= end)
+    closed = np.any(keep & (x - start <= WINDOW_TOLERANCE), axis=1, keepdims=True)
+    keep[:, :-1] |= keep[:, 1:] & (x[:, :-1] < start) & ~closed
+    return keep[:, 1:] & keep[:, :-1]
+
+
+def integrate_rows(x, y, start, end):
+    """
+    Batched version of HgAR_calc.integrate_HgAR over the window of window_pairs.
+
+    Returns:
+    - vector (n_rows,) [µg/m²]
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    terms = np.diff(x, axis=1) * (y[:, 1:] + y[:, :-1]) / 2
+    return np.where(window_pairs(x, start, end), terms, 0.0).sum(axis=1)
+
+
+def integrate_error_rows(x, err, start, end):
+    """
+    Batched version of HgAR_calc.integrate_error over the window of window_pairs.
+
+    Returns:
+    - vector (n_rows,) [µg/m²]
+    """
+    x = np.asarray(x, dtype=float)
+    err = np.asarray(err, dtype=float)
+    var = (np.diff(x, axis=1) / 2) ** 2 * (err[:, 1:] ** 2 + err[:, :-1] ** 2)
+    return np.sqrt(np.where(window_pairs(x, start, end), var, 0.0).sum(axis=1))
+
+
+def pearson_masked(x, y, mask):
+    """
+    Pearson correlation of y with every column of x, for many sample masks.
+
+    Parameters:
+    - x: array (n, k) of predictors
+    - y: vector (n,)
+    - mask: boolean array (n_rows, n), one selection of samples per row
+
+    Returns:
+    - r: array (n_rows, k); NaN where fewer than 3 samples are selected
+    """
+    w = mask.astype(float)
+    m = w.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx = (w @ x) / m
+        my = (w @ y)[:, None] / m
+        sxy = (w @ (x * y[:, None])) / m - mx * my
+        sxx = (w @ x ** 2) / m - mx ** 2
+        syy = (w @ y ** 2)[:, None] / m - my ** 2
+        r = sxy / np.sqrt(sxx * syy)
+    r[m[:, 0] < 3] = np.nan
+    return r
+
+
+def envelope(ens, q=(2.5, 50, 97.5), axis=0):
+    """
+    Percentile envelope of an ensemble along the realisation axis.
+
+    Returns:
+    - array with one leading entry per percentile in q
+    """
+    return np.nanpercentile(ens, q, axis=axis)
+
+
+# === Propagation ===
+
+def propagate_HgAR(core, ages, g, analytical=True, seed=None, data_dir=DATA_DIR):
+    """
+    HgAR realisations consistent with an age ensemble.
+
+    Stretching the time axis by g scales the sedimentation rate by 1/g (g per
+    realisation, or per realisation and sample); with analytical=True the Hg,
+    DBD and SAR errors of HgAR_calc.calculate_HgAR_vector are sampled as well
+    (one SAR draw per realisation, as SAR is one value per core).
+
+    The ensemble must be drawn at the rows of load_samples (load_sample_ensemble).
+
+    Returns:
+    - HgAR: array (n, n_samples) [µg/m²/yr]
+    - ages: the ensemble, sorted by increasing age along the depth axis
+    """
+    rng = np.random.default_rng(seed)
+    df = load_samples(core, data_dir)
+    if np.shape(ages)[1] != len(df):
+        raise ValueError(f"The ensemble has {np.shape(ages)[1]} samples, {core} has {len(df)}")
+    df_Age = pd.read_excel(Path(data_dir) / "210_Pb_dating" / "Age.xlsx")
+    SAR = df_Age[f"SAR_{core}"].iloc[0]
+    err_SAR = df_Age[f"err_SAR_{core}"].iloc[0]
+
+    Hg = np.broadcast_to(df['Hg'].to_numpy(), (len(g), len(df)))
+    DBD = np.broadcast_to(df['DBD'].to_numpy(), Hg.shape)
+    SAR = np.full((len(g), 1), SAR)
+    if analytical:
+        Hg = Hg * (1 + df['RSD'].to_numpy() * rng.standard_normal(Hg.shape))
+        DBD = DBD * (1 + ERR_DBD * rng.standard_normal(Hg.shape))
+        SAR = SAR * (1 + err_SAR * rng.standard_normal(SAR.shape))
+
+    g = np.asarray(g, dtype=float)
+    g = g[:, None] if g.ndim == 1 else g
+    HgAR = Hg * DBD * SAR / g * 10
+    return HgAR[:, ::-1], np.asarray(ages)[:, ::-1]
+
+
+def propagate_budget(ens, start=1970.0, end=2023.0, n_grid=1000):
+    """
+    Integrals, masses, 1970 normalisation and glacier excess for all realisations.
+
+    Mirrors HgAR_calc.main(): each core is normalised to its HgAR at `start`,
+    both curves are interpolated on a common grid, integrated and the
+    difference is converted to a mass of excess Hg at EYC.
+
+    Parameters:
+    - ens: dict core -> (ages, HgAR), arrays (n, n_samples) sorted by increasing age
+
+    Returns:
+    - dict of vectors (n,): area_<core>, mass_<core>, ref_<core>,
+      integral_norm_<core>, area_between, mass_diff_g
+    """
+    out = {}
+    grid = np.linspace(start, end, n_grid)
+    for core, (ages, HgAR) in ens.items():
+        out[f"area_{core}"] = integrate_rows(ages, HgAR, start, end)
+        out[f"mass_{core}"] = out[f"area_{core}"] * SURFACES[core]
+        ref = interp_rows(np.array([start]), ages, HgAR)[:, 0]
+        norm = interp_rows(grid, ages, HgAR / ref[:, None])
+        out[f"ref_{core}"] = ref
+        out[f"integral_norm_{core}"] = np.sum(np.diff(grid) * (norm[:, 1:] + norm[:, :-1]) / 2, axis=1)
+
+    out["area_between"] = out["integral_norm_EYC"] - out["integral_norm_GDL"]
+    out["mass_diff_g"] = out["area_between"] * out["ref_EYC"] * SURFACES['EYC'] / 1e6
+    return out
+
+
+def propagate_period_correlations(ages_sorted, processed, element_cols, hg_col='Hg_EYC', cutoff=1970.0):
+    """
+    Before/after-cutoff correlations of Hg with the XRF proxies for every realisation.
+
+    The rows of `processed` (erosion.py output) are the intervals between
+    consecutive Hg samples, dated by their mid-point age; each realisation
+    moves these mid-points and therefore the split at the cutoff.
+
+    Parameters:
+    - ages_sorted: array (n, n_samples) sorted by increasing age
+    - processed: DataFrame from erosion.aggregate_core_scan (sorted by age)
+    - element_cols: proxy columns
+
+    Returns:
+    - r_before, r_after: arrays (n, len(element_cols))
+    """
+    mid = (ages_sorted[:, 1:] + ages_sorted[:, :-1]) / 2
+    x = processed[element_cols].to_numpy(dtype=float)
+    y = processed[hg_col].to_numpy(dtype=float)
+    return pearson_masked(x, y, mid < cutoff), pearson_masked(x, y, mid >= cutoff)
+
+
+def main():
+    # === Draw the age ensembles and propagate them ===
+    ens = {}
+    for i, core in enumerate(['EYC', 'GDL']):
+        ages, g = load_sample_ensemble(core, N_DRAWS, seed=i)
+        HgAR, ages_sorted = propagate_HgAR(core, ages, g, seed=10 + i)
+        ens[core] = (ages_sorted, HgAR)
+
+    budget = propagate_budget(ens)
+    save_ensemble(STORE_PATH, ens, budget)
+    result_store.export_excel(STORE_PATH, STORE_PATH.with_suffix(".xlsx"))
+
+    def fmt(v, scale=1.0):
+        lo, med, hi = envelope(v / scale)
+        return f"{med:.3f} [{lo:.3f}–{hi:.3f}]"
+
+    print(f"Age-model ensemble, N = {N_DRAWS} (median [2.5–97.5 %])")
+    for core in ens:
+        print(f"  {core}: flux 1970–2023 {fmt(budget[f'area_{core}'])} µg/m², "
+              f"mass {fmt(budget[f'mass_{core}'], 1e9)} kg")
+    print(f"  Net normalised area (EYC - GDL): {fmt(budget['area_between'])} yr")
+    print(f"  Excess Hg due to glacier: {fmt(budget['mass_diff_g'])} g")
+
+    # === Correlations before/after 1970 (erosion.py output) ===
+    processed_file = FIGURE_DIR / "erosion_proxy_analysis" / "processed_data.xlsx"
+    if processed_file.exists():
+        processed = pd.read_excel(processed_file).sort_values('Age_EYC')
+        elements = [c for c in processed.columns if c.startswith('CLR_')]
+        r_before, r_after = propagate_period_correlations(ens['EYC'][0], processed, elements)
+        rb, ra = envelope(r_before), envelope(r_after)
+        for j, e in enumerate(elements):
+            print(f"  {e}: R before 1970 {rb[1, j]:.2f} [{rb[0, j]:.2f}, {rb[2, j]:.2f}], "
+                  f"after {ra[1, j]:.2f} [{ra[0, j]:.2f}, {ra[2, j]:.2f}]")
+
+
+if __name__ == "__main__":
+    main()
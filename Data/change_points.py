@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  9 09:33:05 2026
+
+Change points (regime shifts) of the Hg, HgAR and XRF proxy records.
+
+The horizons of Figure_2.py and figure_3.py (1915, 1940, 1970, the 1942-1949
+band) are drawn by hand. Here every series is segmented with PELT (Killick
+et al., 2012) on a change in mean or in linear trend:
+
+- the segment costs come from cumulative sums (of 1, t, t², y, ty, y²), so
+  any segment cost is O(1) and a segmentation is close to linear in the
+  number of samples;
+- PELT runs on a matrix of series of the same length at once (one row per
+  penalty of a sweep or per bootstrap replicate): the candidate set is the
+  union of the candidates still alive in any row;
+- costs are scaled by the long-run noise variance of the series, so the
+  penalty is beta × log(n) whatever the units. The scans are autocorrelated,
+  and the MAD of the first differences alone underestimates their noise
+  (many spurious shifts a year apart). The scale is therefore re-estimated
+  from the residuals of the fitted segments, as their robust sd inflated
+  for lag-1 autocorrelation φ by √((1 + φ) / (1 - φ)), and the series is
+  re-segmented until the change points no longer change (noise_scale);
+- every change point gets a support and the 2.5-97.5 % interval of its
+  matched ages over a moving-block bootstrap of the residuals of the fitted
+  segments (blocks at least as long as the AR(1) decorrelation length).
+
+The support is the fraction of bootstrap replicates that have a change point
+within MATCH_YEARS of the detected one. It measures stability: whether
+redrawing noise like the residuals around the fitted segments would move or
+remove the change point. It is not a p-value. The replicates are built from
+the fitted segmentation, so a shift that is large compared with the noise
+always gets a support close to 1, and only weak or poorly located shifts
+fall below it.
+
+Usage:
+    python change_points.py [mean|slope] [<beta>]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from proxy_qc import AGE_COLUMNS, read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+OUTPUT_PATH = DATA_DIR / "results" / "change_points.csv"
+
+CORES = ('EYC', 'GDL')
+PROXIES = ('CLR_Ti', 'CLR_Fe', 'CLR_Zr', 'CLR_Br')
+
+BETA = 2.0              # penalty = BETA × log(n) (BIC for a mean shift)
+BETAS = (0.5, 1, 2, 4, 8, 16)
+MIN_SIZE = {'mean': 2, 'slope': 3}
+N_BOOT = 200
+MATCH_YEARS = 5.0       # a bootstrap change point within this distance supports a detected one
+MAX_PHI = 0.95          # bound of the lag-1 autocorrelation of the residuals
+MAX_ITER = 10           # re-segmentations of noise_scale
+SEED = 42
+
+# Horizons drawn in the figures
+HORIZONS = (1915, 1940, 1970)
+BANDS = ((1942, 1949),)
+
+
+def load_series(data_dir=DATA_DIR, cores=CORES, proxies=PROXIES):
+    """
+    Hg concentration and HgAR of the slices and XRF proxies of the scans,
+    against age. QC flags of proxy_qc are applied to every input (HgAR is
+    flagged with its Hg concentration, proxy_qc.DERIVED_COLUMNS).
+
+    Returns:
+    - dict (core, variable) -> (age, values), sorted by increasing age
+    """
+    data_dir = Path(data_dir)
+    age = pd.read_excel(data_dir / "210_Pb_dating" / "Age.xlsx")
+    hg = read_screened(data_dir / "Hg.xlsx")
+    hgar = read_screened(data_dir / "HgAR.xlsx")
+    out = {}
+    for core in cores:
+        for var, values in (('Hg', hg[f"Hg_conc_{core}"]), ('HgAR', hgar[f"Hg_AR_{core}"])):
+            out[(core, var)] = _clean(age[f"age_{core}"], values)
+        xrf = read_screened(data_dir / "X_ray.xlsx", sheet_name=core)
+        for p in proxies:
+            if p in xrf:
+                out[(core, p)] = _clean(xrf[AGE_COLUMNS[core]], xrf[p])
+    return out
+
+
+def _clean(age, values):
+    # Finite pairs sorted by age
+    age, values = np.asarray(age, dtype=float), np.asarray(values, dtype=float)
+    ok = np.isfinite(age) & np.isfinite(values)
+    order = np.argsort(age[ok], kind='stable')
+    return age[ok][order], values[ok][order]
+
+
+def noise_sd(y):
+    """
+    Robust noise standard deviation of each row (MAD of the first differences / √2).
+
+    Starting value of noise_scale(): for autocorrelated noise it is too small,
+    since differencing removes the slowly varying part.
+    """
+    d = np.diff(np.atleast_2d(y), axis=-1)
+    mad = np.median(np.abs(d - np.median(d, axis=-1, keepdims=True)), axis=-1)
+    return np.maximum(1.4826 * mad / np.sqrt(2), 1e-12)
+
+
+def residual_noise(r, cps):
+    """
+    Robust sd and lag-1 autocorrelation of the residuals of fitted segments
+    (pairs across a change point excluded).
+
+    Returns:
+    - sd, phi (phi clipped to [0, MAX_PHI])
+    """
+    sd = 1.4826 * np.median(np.abs(r - np.median(r)))
+    inside = np.ones(len(r) - 1, dtype=bool)
+    inside[np.asarray(cps, dtype=int) - 1] = False
+    a, b = r[:-1][inside], r[1:][inside]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        phi = np.sum(a * b) / np.sqrt(np.sum(a * a) * np.sum(b * b))
+    return sd, float(np.clip(np.nan_to_num(phi), 0.0, MAX_PHI))
+
+
+def noise_scale(age, y, kind='mean', beta=BETA, max_iter=MAX_ITER):
+    """
+    Long-run noise scale of a series for the segment costs.
+
+    The series is segmented with the current scale, the residuals of the
+    fitted segments give a robust sd and a lag-1 autocorrelation φ, and the
+    scale becomes sd √((1 + φ) / (1 - φ)) (the sd of a segment mean under
+    AR(1) noise, times √n), never below the MAD of the first differences.
+    This is repeated until the change points no longer change.
+
+    Returns:
+    - scale, phi, cps (change points at that scale)
+    """
+    pen = beta * np.log(len(y))
+    scale = noise_sd(y)[0]
+    floor, prev, phi = scale, None, 0.0
+    for _ in range(max_iter):
+        z = (y - y.mean()) / scale
+        cps = pelt_batch(z, age, kind, pen)[0]
+        if prev is not None and np.array_equal(cps, prev):
+            break
+        sd, phi = residual_noise((z - fitted(age, z, cps, kind)) * scale, cps)
+        prev, scale = cps, max(floor, sd * np.sqrt((1 + phi) / (1 - phi)))
+    return scale, phi, cps
+
+
+def cumulative_stats(t, Y):
+    """
+    Cumulative sums with a leading zero column.
+
+    Parameters:
+    - t: vector (n,) of (centred) positions
+    - Y: array (m, n)
+
+    Returns:
+    - dict: shared 'n', 't', 'tt' (n + 1,) and per-row 'y', 'ty', 'yy' (m, n + 1)
+    """
+    def c(a):
+        return np.concatenate([np.zeros(a.shape[:-1] + (1,)), np.cumsum(a, axis=-1)], axis=-1)
+
+    return {'n': c(np.ones_like(t)), 't': c(t), 'tt': c(t * t), 'y': c(Y), 'ty': c(t * Y), 'yy': c(Y * Y)}
+
+
+def segment_cost(S, s, e, kind='mean'):
+    """
+    Residual sum of squares of the segments [s, e) of every row.
+
+    Parameters:
+    - S: cumulative_stats
+    - s: vector of segment starts, e: segment end (scalar)
+    - kind: 'mean' (constant) or 'slope' (straight line)
+
+    Returns:
+    - array (m, len(s))
+    """
+    n = S['n'][e] - S['n'][s]
+    sy = S['y'][:, [e]] - S['y'][:, s]
+    cost = (S['yy'][:, [e]] - S['yy'][:, s]) - sy ** 2 / n
+    if kind == 'slope':
+        st = S['t'][e] - S['t'][s]
+        stt = (S['tt'][e] - S['tt'][s]) - st ** 2 / n
+        sty = (S['ty'][:, [e]] - S['ty'][:, s]) - st * sy / n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cost = cost - np.where(stt > 1e-12, sty ** 2 / stt, 0.0)
+    return np.maximum(cost, 0.0)
+
+
+def pelt_batch(Y, t=None, kind='mean', penalty=None, min_size=None):
+    """
+    PELT segmentation of every row of Y (same positions t).
+
+    Parameters:
+    - Y: array (m, n), already scaled to unit noise
+    - t: positions (n,) used by the slope cost (default: 0..n-1)
+    - kind: 'mean' or 'slope'
+    - penalty: per-change-point penalty, scalar or (m,) (default BETA log n)
+    - min_size: minimum number of samples per segment
+
+    Returns:
+    - list of m arrays of change-point indices (first sample of each new segment)
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    m, n = Y.shape
+    t = np.arange(n, dtype=float) if t is None else np.asarray(t, dtype=float)
+    t = t - t.mean()
+    min_size = min_size or MIN_SIZE[kind]
+    pen = np.broadcast_to(BETA * np.log(n) if penalty is None else np.asarray(penalty, dtype=float), (m,))
+    S = cumulative_stats(t, Y)
+
+    F = np.full((m, n + 1), np.inf)
+    F[:, 0] = -pen
+    last = np.zeros((m, n + 1), dtype=int)
+    # Step from which each candidate is pruned for each row. A candidate that
+    # fails the PELT test at e can still end the last segment before e + min_size
+    # (no admissible split at e yet), so it is only dropped from then on.
+    R = np.zeros(0, dtype=int)
+    expiry = np.zeros((m, 0))
+    for e in range(min_size, n + 1):
+        s_new = e - min_size
+        if s_new == 0 or np.isfinite(F[:, s_new]).any():
+            R = np.append(R, s_new)
+            expiry = np.column_stack([expiry, np.where(np.isfinite(F[:, s_new]), np.inf, -np.inf)])
+        alive = expiry > e
+        vals = np.where(alive, F[:, R] + segment_cost(S, R, e, kind), np.inf)
+        k = np.argmin(vals, axis=1)
+        F[:, e] = vals[np.arange(m), k] + pen
+        last[:, e] = R[k]
+        expiry = np.where(alive & (vals > F[:, [e]]) & np.isinf(expiry), e + min_size, expiry)
+        keep = (expiry > e + 1).any(axis=0)
+        R, expiry = R[keep], expiry[:, keep]
+
+    cps = []
+    for i in range(m):
+        c, e = [], n
+        while e > 0:
+            e = last[i, e]
+            if e > 0:
+                c.append(e)
+        cps.append(np.array(c[::-1], dtype=int))
+    return cps
+
+
+def fitted(t, y, cps, kind='mean'):
+    """
+    Piecewise constant or linear fit of y with change points cps.
+    """
+    out = np.empty_like(y)
+    for a, b in zip(np.r_[0, cps], np.r_[cps, len(y)]):
+        if kind == 'slope' and b - a >= 2 and np.ptp(t[a:b]) > 0:
+            out[a:b] = np.polyval(np.polyfit(t[a:b], y[a:b], 1), t[a:b])
+        else:
+            out[a:b] = y[a:b].mean()
+    return out
+
+
+def block_bootstrap(resid, n_boot, block=None, rng=None):
+    """
+    Moving-block bootstrap replicates of a residual vector.
+
+    Returns:
+    - array (n_boot, n)
+    """
+    rng = rng or np.random.default_rng(SEED)
+    n = len(resid)
+    block = block or max(1, int(round(n ** (1 / 3))))
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n - block + 1, (n_boot, n_blocks))
+    idx = (starts[..., None] + np.arange(block)).reshape(n_boot, -1)[:, :n]
+    return resid[idx]
+
+
+def cp_ages(age, cps):
+    # Age of a change point: midway between the samples on either side
+    return (age[cps - 1] + age[cps]) / 2
+
+
+def detect(age, y, kind='mean', beta=BETA, n_boot=N_BOOT, seed=SEED):
+    """
+    Change points of one series with bootstrap support.
+
+    The noise scale comes from noise_scale(). The support is a stability
+    measure, not a p-value (see the module docstring).
+
+    Returns:
+    - DataFrame with one row per change point: index, age, age_lo, age_hi
+      (2.5-97.5 % of the matched bootstrap ages), support (fraction of
+      replicates with a change point within MATCH_YEARS), shift (change of
+      the fitted level across the change point), scale and phi (noise scale
+      and lag-1 autocorrelation of the residuals)
+    """
+    sd, phi, cps = noise_scale(age, y, kind, beta)
+    z = (y - y.mean()) / sd
+    pen = beta * np.log(len(y))
+    fit = fitted(age, z, cps, kind)
+
+    rng = np.random.default_rng(seed)
+    block = max(int(round(len(y) ** (1 / 3))), int(np.ceil((1 + phi) / (1 - phi))))
+    boot = fit + block_bootstrap(z - fit, n_boot, block, rng=rng)
+    boot_ages = [cp_ages(age, c) for c in pelt_batch(boot, age, kind, pen)]
+
+    rows = []
+    for c, a in zip(cps, cp_ages(age, cps)):
+        matched = [b[np.argmin(np.abs(b - a))] for b in boot_ages if b.size and np.min(np.abs(b - a)) <= MATCH_YEARS]
+        rows.append({'index': int(c), 'age': a,
+                     'age_lo': np.percentile(matched, 2.5) if matched else np.nan,
+                     'age_hi': np.percentile(matched, 97.5) if matched else np.nan,
+                     'support': len(matched) / n_boot,
+                     'shift': (fit[c] - fit[c - 1]) * sd, 'scale': sd, 'phi': phi})
+    return pd.DataFrame(rows, columns=['index', 'age', 'age_lo', 'age_hi', 'support', 'shift', 'scale', 'phi'])
+
+
+def penalty_sweep(age, y, kind='mean', betas=BETAS):
+    """
+    Change points of a series for every penalty of a sweep (one batched PELT).
+
+    Returns:
+    - DataFrame with beta, n_cps and the change-point ages
+    """
+    z = (y - y.mean()) / noise_scale(age, y, kind)[0]
+    betas = np.asarray(betas, dtype=float)
+    cps = pelt_batch(np.repeat(z[None], len(betas), axis=0), age, kind, betas * np.log(len(y)))
+    return pd.DataFrame({'beta': betas, 'n_cps': [len(c) for c in cps],
+                         'ages': [np.round(cp_ages(age, c), 1).tolist() for c in cps]})
+
+
+def nearest_horizon(a):
+    """
+    Nearest hand-drawn horizon (or band) of the figures and its distance [years].
+    """
+    marks = [(str(h), abs(a - h)) for h in HORIZONS]
+    marks += [(f"{lo}-{hi}", 0.0 if lo <= a <= hi else min(abs(a - lo), abs(a - hi))) for lo, hi in BANDS]
+    return min(marks, key=lambda m: m[1])
+
+
+def detect_all(series, kind='mean', beta=BETA, n_boot=N_BOOT):
+    """
+    Change points of every series of load_series.
+
+    Returns:
+    - DataFrame with core, variable, n, kind and the columns of detect(),
+      plus the nearest figure horizon
+    """
+    frames = []
+    for (core, var), (age, y) in series.items():
+        df = detect(age, y, kind, beta, n_boot)
+        df.insert(0, 'n', len(y))
+        df.insert(0, 'variable', var)
+        df.insert(0, 'core', core)
+        df['kind'] = kind
+        near = [nearest_horizon(a) for a in df['age']]
+        df['horizon'] = [h for h, _ in near]
+        df['horizon_offset'] = [d for _, d in near]
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    kind = sys.argv[1] if len(sys.argv) > 1 else 'mean'
+    beta = float(sys.argv[2]) if len(sys.argv) > 2 else BETA
+    series = load_series()
+
+    t0 = time.perf_counter()
+    results = detect_all(series, kind, beta)
+    dt = time.perf_counter() - t0
+    print(f"{len(series)} series, {kind} model, beta {beta:g}, {N_BOOT} bootstrap replicates: {dt:.1f} s\n")
+    print(results.drop(columns=['kind', 'index']).round(2).to_string(index=False))
+
+    print("\nPenalty sweep (number of change points):")
+    sweep = {f"{core} {var}": penalty_sweep(age, y, kind).set_index('beta')['n_cps']
+             for (core, var), (age, y) in series.items()}
+    print(pd.DataFrame(sweep).T.to_string())
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(OUTPUT_PATH, index=False)
+    print(f"\nSaved to {OUTPUT_PATH.relative_to(DATA_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
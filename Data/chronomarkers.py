@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Nov  4 10:21:37 2026
+
+137Cs / 241Am chronomarkers of the 210Pb cores and check of their CFCS age
+models.
+
+Every 210_Pb_dating/<core>/<core>.txt gives Cs and Am activities with their
+counting errors. The 1963 maximum of the nuclear weapon tests (NWT) and the
+1986 Chernobyl fallout are located in all cores at once:
+
+- the profiles of all cores are stacked into NaN-padded arrays and perturbed
+  within their counting errors (Monte Carlo draws), the peak depth is also
+  drawn uniformly within its slice;
+- in every draw, 1963 is the Cs local maximum closest to the Am maximum (Am
+  is only diagnostic of the test fallout in the NH) or, without Am, the
+  deepest major Cs maximum; 1986 is the largest Cs maximum above it;
+- the spread of the peak depths over the draws gives the depth uncertainty,
+  the fraction of draws that find the peak in the modal slice its support.
+
+The CFCS ages (<core>_CFCS_interpolation.txt, BestAD with the MinAD-MaxAD
+envelope) at the peak depths are compared with 1963 and 1986, and a marker
+is flagged when the offset exceeds FLAG_Z combined standard deviations. The
+depth ranges entered in serac (<core>_Metadata_*.txt) are reported alongside.
+
+Usage:
+    python chronomarkers.py [<n_draws>]
+"""
+
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent
+PB_DIR = DATA_DIR / "210_Pb_dating"
+OUTPUT_PATH = DATA_DIR / "results" / "chronomarkers.csv"
+
+N_DRAWS = 2000
+SEED = 42
+
+# Marker years and their serac metadata keys
+MARKERS = {'NWT': 1963.0, 'Chernobyl': 1986.0}
+METADATA_KEYS = {'NWT': 'Nuclear_War_Test', 'Chernobyl': 'Chernobyl'}
+
+PEAK_FRACTION = 0.25    # a major Cs peak reaches this fraction of the core maximum
+MIN_SUPPORT = 0.5       # below this fraction of draws in the modal slice: 'weak'
+FLAG_Z = 2.0            # |offset| / combined sd above which a marker is flagged
+
+
+def list_cores(pb_dir=PB_DIR):
+    """
+    Cores with a <core>/<core>.txt activity file.
+    """
+    return sorted(p.name for p in Path(pb_dir).iterdir() if (p / f"{p.name}.txt").exists())
+
+
+def read_activities(core, pb_dir=PB_DIR):
+    """
+    Activity table of a core (depths in mm), with the slice mid-depth.
+    """
+    df = pd.read_csv(Path(pb_dir) / core / f"{core}.txt", sep='\t')
+    df['depth_mid'] = (df['depth_top'] + df['depth_bottom']) / 2
+    return df
+
+
+def read_cfcs(core, pb_dir=PB_DIR):
+    """
+    CFCS age-depth interpolation of a core (depth_avg_mm, BestAD, MinAD, MaxAD, ...).
+    """
+    return pd.read_csv(Path(pb_dir) / core / f"{core}_CFCS_interpolation.txt", sep=r'\s+')
+
+
+def read_metadata(core, pb_dir=PB_DIR):
+    """
+    Key/value pairs of the latest serac metadata file of a core (empty if none).
+    """
+    files = sorted((Path(pb_dir) / core).glob(f"{core}_Metadata_*.txt"))
+    if not files:
+        return {}
+    with open(files[-1], newline='') as fh:
+        return {row[0]: row[1] for row in csv.reader(fh, delimiter='\t') if len(row) >= 2 and row[0]}
+
+
+def serac_range(meta, marker):
+    """
+    Depth range [mm] of a marker entered in serac, e.g. '87-92.5 (NH)' -> (87, 92.5).
+    """
+    value = (meta.get(METADATA_KEYS[marker]) or 'NA').split()[0]
+    try:
+        top, bottom = (float(v) for v in value.split('-'))
+    except ValueError:
+        return None
+    return top, bottom
+
+
+def stack_profiles(tables, column):
+    """
+    Valid samples of one isotope of every core, stacked and NaN-padded.
+
+    Parameters:
+    - tables: list of activity tables (read_activities)
+    - column: 'Cs' or 'Am'
+
+    Returns:
+    - dict of arrays (n_cores, n_max): 'value', 'err', 'top', 'bottom'
+    """
+    valid = [t[t[column].notna()] for t in tables]
+    n_max = max(1, max(len(v) for v in valid))
+    out = {k: np.full((len(tables), n_max), np.nan) for k in ('value', 'err', 'top', 'bottom')}
+    for i, v in enumerate(valid):
+        n = len(v)
+        out['value'][i, :n] = v[column]
+        out['err'][i, :n] = v[f"{column}_er"].fillna(0)
+        out['top'][i, :n] = v['depth_top']
+        out['bottom'][i, :n] = v['depth_bottom']
+    return out
+
+
+def _local_maxima(v):
+    # Samples above the previous valid sample and not below the next one; v (..., n), NaN = -inf
+    v = np.where(np.isfinite(v), v, -np.inf)
+    pad = np.full(v.shape[:-1] + (1,), -np.inf)
+    prev, nxt = np.concatenate([pad, v[..., :-1]], -1), np.concatenate([v[..., 1:], pad], -1)
+    return np.isfinite(v) & (v > prev) & (v >= nxt)
+
+
+def detect_peaks(cs, am, n_draws=N_DRAWS, seed=SEED):
+    """
+    Monte Carlo location of the 1963 and 1986 Cs peaks in all cores at once.
+
+    Parameters:
+    - cs, am: stacked profiles (stack_profiles)
+    - n_draws: number of draws of the profiles within their errors
+
+    Returns:
+    - dict marker -> dict with 'index' (n_draws, n_cores) sample index of
+      the Cs profile (-1: not found) and 'depth' (n_draws, n_cores) [mm]
+    """
+    rng = np.random.default_rng(seed)
+    n_cores, n = cs['value'].shape
+    cs_draw = cs['value'] + cs['err'] * rng.standard_normal((n_draws, n_cores, n))
+    am_draw = am['value'] + am['err'] * rng.standard_normal((n_draws,) + am['value'].shape)
+    cs_mid = (cs['top'] + cs['bottom']) / 2
+    am_mid = (am['top'] + am['bottom']) / 2
+
+    # Major Cs maxima of every draw
+    peak = _local_maxima(cs_draw)
+    peak &= cs_draw >= PEAK_FRACTION * np.nanmax(cs_draw, axis=-1, keepdims=True)
+    has_peak = peak.any(-1)
+
+    # 1963: Cs peak nearest to the Am maximum, or the deepest one when a core has no Am
+    has_am = np.isfinite(am['value']).any(-1)
+    am_idx = np.argmax(np.where(np.isfinite(am_draw), am_draw, -np.inf), axis=-1)
+    am_depth = np.take_along_axis(np.broadcast_to(am_mid, am_draw.shape), am_idx[..., None], -1)[..., 0]
+    distance = np.abs(cs_mid - am_depth[..., None])
+    distance = np.where(has_am[:, None], distance, -cs_mid)
+    i63 = np.argmin(np.where(peak, distance, np.inf), axis=-1)
+
+    # 1986: largest Cs peak above the 1963 one
+    above = peak & (np.arange(n) < i63[..., None])
+    i86 = np.argmax(np.where(above, cs_draw, -np.inf), axis=-1)
+
+    index = {'NWT': np.where(has_peak, i63, -1), 'Chernobyl': np.where(above.any(-1), i86, -1)}
+
+    # Peak depth uniformly within the slice
+    out = {}
+    for marker, idx in index.items():
+        safe = np.maximum(idx, 0)
+        top = np.take_along_axis(np.broadcast_to(cs['top'], idx.shape + (n,)), safe[..., None], -1)[..., 0]
+        bottom = np.take_along_axis(np.broadcast_to(cs['bottom'], idx.shape + (n,)), safe[..., None], -1)[..., 0]
+        depth = top + rng.uniform(size=idx.shape) * (bottom - top)
+        out[marker] = {'index': idx, 'depth': np.where(idx >= 0, depth, np.nan)}
+    return out
+
+
+def compare_with_cfcs(depth, cfcs):
+    """
+    CFCS age at the drawn peak depths of one marker in one core.
+
+    Parameters:
+    - depth: drawn peak depths [mm] (NaN: not found)
+    - cfcs: interpolation table (read_cfcs)
+
+    Returns:
+    - median age, sd of the age over the depth draws, half-width of the
+      MinAD-MaxAD envelope at the median depth (NaN beyond the model)
+    """
+    d = cfcs['depth_avg_mm'].to_numpy()
+    depth = depth[np.isfinite(depth)]
+    if depth.size == 0 or np.median(depth) > d.max():
+        return np.nan, np.nan, np.nan
+    age = np.interp(depth, d, cfcs['BestAD'], right=np.nan)
+    mid = np.median(depth)
+    envelope = (np.interp(mid, d, cfcs['MaxAD']) - np.interp(mid, d, cfcs['MinAD'])) / 2
+    return np.nanmedian(age), np.nanstd(age), envelope
+
+
+def chronomarkers(cores=None, pb_dir=PB_DIR, n_draws=N_DRAWS, seed=SEED):
+    """
+    Detect the 1963 / 1986 markers of every core and check the CFCS ages.
+
+    Returns:
+    - DataFrame, one row per core and marker: detected depth (median, 16th
+      and 84th percentiles [mm]), modal slice and its support, CFCS age,
+      offset to the marker year and its z-score, serac depth range, status
+      ('ok', 'disagree', 'weak', 'missing', 'no model')
+    """
+    cores = list_cores(pb_dir) if cores is None else list(cores)
+    tables = [read_activities(c, pb_dir) for c in cores]
+    cs, am = stack_profiles(tables, 'Cs'), stack_profiles(tables, 'Am')
+    peaks = detect_peaks(cs, am, n_draws, seed)
+
+    rows = []
+    for k, core in enumerate(cores):
+        cfcs_file = Path(pb_dir) / core / f"{core}_CFCS_interpolation.txt"
+        cfcs = read_cfcs(core, pb_dir) if cfcs_file.exists() else None
+        meta = read_metadata(core, pb_dir)
+        for marker, year in MARKERS.items():
+            idx, depth = peaks[marker]['index'][:, k], peaks[marker]['depth'][:, k]
+            found = idx >= 0
+            row = {'core': core, 'marker': marker, 'year': year, 'p_found': found.mean()}
+            if found.any():
+                mode = np.bincount(idx[found]).argmax()
+                row.update({
+                    'depth': np.median(depth[found]),
+                    'depth_16': np.percentile(depth[found], 16),
+                    'depth_84': np.percentile(depth[found], 84),
+                    'slice': f"{cs['top'][k, mode]:g}-{cs['bottom'][k, mode]:g}",
+                    'support': np.mean(idx == mode),
+                    'Cs': cs['value'][k, mode],
+                })
+            rng_serac = serac_range(meta, marker)
+            row['serac'] = f"{rng_serac[0]:g}-{rng_serac[1]:g}" if rng_serac else ''
+            if rng_serac and found.any():
+                top, bottom = cs['top'][k, mode], cs['bottom'][k, mode]
+                row['serac_match'] = bool(top < rng_serac[1] and bottom > rng_serac[0])
+
+            if not found.any():
+                row['status'] = 'missing'
+            elif cfcs is None:
+                row['status'] = 'no model'
+            else:
+                age, sd_depth, envelope = compare_with_cfcs(depth, cfcs)
+                sd = np.hypot(sd_depth, envelope)
+                row.update({'age_CFCS': age, 'age_sd': sd, 'offset': age - year,
+                            'z': (age - year) / sd if sd > 0 else np.nan})
+                if not np.isfinite(age):
+                    row['status'] = 'no model'
+                elif abs(row['z']) > FLAG_Z:
+                    row['status'] = 'disagree'
+                elif row['support'] < MIN_SUPPORT:
+                    row['status'] = 'weak'
+                else:
+                    row['status'] = 'ok'
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def flagged(results):
+    """
+    Cores with at least one marker whose CFCS age disagrees.
+    """
+    return sorted(results.loc[results['status'] == 'disagree', 'core'].unique())
+
+
+def main():
+    n_draws = int(sys.argv[1]) if len(sys.argv) > 1 else N_DRAWS
+    t0 = time.perf_counter()
+    results = chronomarkers(n_draws=n_draws)
+    dt = time.perf_counter() - t0
+    print(f"{results['core'].nunique()} cores, {n_draws} draws: {dt:.2f} s\n")
+
+    columns = ['core', 'marker', 'slice', 'support', 'depth', 'depth_16', 'depth_84', 'age_CFCS', 'age_sd',
+               'offset', 'z', 'serac', 'serac_match', 'status']
+    print(results[[c for c in columns if c in results]].round(2).to_string(index=False))
+
+    bad = flagged(results)
+    print(f"\nChronologies disagreeing with the Cs/Am markers: {', '.join(bad) if bad else 'none'}")
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(OUTPUT_PATH, index=False)
+    print(f"Saved to {OUTPUT_PATH.relative_to(DATA_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:20:51 2026
+
+Append-only columnar file store.
+
+A store is a folder holding one raw binary file per column (<name>.bin) and a
+small meta.json with the column dtypes, the number of committed rows and free
+attributes. Appending only writes the new rows at the end of each column file,
+and columns are read back as memory maps, so a store can grow section by
+section without rewriting what is already there.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Metadata layout: 'columns' (name -> dtype string), 'n_rows' and 'attrs'
+from store_meta import exists, read_meta, write_meta as _write_meta
+
+def append_columns(path, data, attrs=None):
+    """
+    Append rows to a store, creating it on first use.
+
+    Rows are only committed (n_rows updated in meta.json) once every column
+    file has been written, so an interrupted append leaves the store readable.
+
+    Parameters:
+    - path: folder of the store
+    - data: dict column name -> vector; all vectors have the same length
+    - attrs: optional dict merged into the store attributes
+
+    Returns:
+    - n_rows: total number of rows after the append
+    """
+    path = Path(path)
+    arrays = {name: np.asarray(values) for name, values in data.items()}
+    lengths = {len(a) for a in arrays.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns have different lengths: {lengths}")
+
+    if exists(path):
+        meta = read_meta(path)
+        if set(arrays) != set(meta["columns"]):
+            raise ValueError(
+                f"Columns {sorted(arrays)} do not match store columns {sorted(meta['columns'])}"
+            )
+    else:
+        path.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "columns": {name: a.dtype.newbyteorder("<").str for name, a in arrays.items()},
+            "n_rows": 0,
+            "attrs": {},
+        }
+
+    n_new = lengths.pop() if lengths else 0
+    for name, dtype in meta["columns"].items():
+        a = np.ascontiguousarray(arrays[name], dtype=np.dtype(dtype))
+        with open(path / f"{name}.bin", "r+b" if (path / f"{name}.bin").exists() else "wb") as f:
+            # Overwrite anything past the committed rows (left by an interrupted append)
+            f.seek(meta["n_rows"] * a.dtype.itemsize)
+            f.write(a.tobytes())
+            f.truncate()
+
+    meta["n_rows"] += n_new
+    if attrs:
+        meta["attrs"].update(attrs)
+    _write_meta(path, meta)
+    return meta["n_rows"]
+
+
+def update_attrs(path, **attrs):
+    """
+    Merge attributes into the store metadata without touching the data.
+    """
+    meta = read_meta(path)
+    meta["attrs"].update(attrs)
+    _write_meta(path, meta)
+
+
+def read_columns(path, columns=None):
+    """
+    Memory-map columns of a store.
+
+    Parameters:
+    - path: folder of the store
+    - columns: list of column names (default: all)
+
+    Returns:
+    - dict column name -> read-only array of length n_rows
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    columns = list(meta["columns"]) if columns is None else list(columns)
+    n = meta["n_rows"]
+
+    out = {}
+    for name in columns:
+        dtype = np.dtype(meta["columns"][name])
+        if n == 0:
+            out[name] = np.empty(0, dtype=dtype)
+        else:
+            out[name] = np.memmap(path / f"{name}.bin", dtype=dtype, mode="r", shape=(n,))
+    return out
+
+
+def read_frame(path, columns=None):
+    """
+    Read columns of a store into a DataFrame (byte-string columns decoded).
+    """
+    cols = read_columns(path, columns)
+    return pd.DataFrame({
+        name: np.char.decode(a) if a.dtype.kind == "S" else np.asarray(a)
+        for name, a in cols.items()
+    })
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 31 09:27:15 2026
+
+Concurrent loading of the workbooks used by the figure scripts.
+
+A figure declares what it needs as a manifest of LoadRequest entries (name,
+file, sheet, usecols, screened). load_all() groups the requests by workbook,
+opens each workbook once and parses the workbooks concurrently in a worker
+pool (processes by default: parsing xlsx is pure Python and holds the GIL).
+Only the requested columns are kept, QC-screened sheets get the flags of
+proxy_qc applied, and the frames come back in a DataBundle together
+with the time spent on every workbook.
+
+Usage:
+    python data_loader.py      (loads every workbook and prints the timings)
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence, Union
+
+import pandas as pd
+
+from proxy_qc import apply_flags, load_flags
+
+DATA_DIR = Path(__file__).resolve().parent
+
+EXECUTORS = {'process': ProcessPoolExecutor, 'thread': ThreadPoolExecutor}
+
+
+class LoadRequest(NamedTuple):
+    """
+    One sheet (or column subset of a sheet) needed by a script.
+
+    - name: key of the frame in the bundle
+    - file: workbook path, relative to the data folder
+    - sheet: sheet name or index (None: first sheet)
+    - usecols: columns to keep (None: all)
+    - screened: apply the QC flags of proxy_qc (values flagged set to NaN)
+    """
+    name: str
+    file: str
+    sheet: Optional[Union[str, int]] = None
+    usecols: Optional[Sequence[str]] = None
+    screened: bool = False
+
+
+class DataBundle(dict):
+    """
+    Frames of a manifest by request name (also available as attributes),
+    with the load time of every workbook in `timings` [s].
+    """
+
+    def __init__(self, frames, timings):
+        super().__init__(frames)
+        self.timings = timings
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def report(self):
+        width = max(len(f) for f in self.timings)
+        lines = [f"  {f:<{width}}  {dt * 1000:8.1f} ms" for f, dt in
+                 sorted(self.timings.items(), key=lambda kv: -kv[1])]
+        return "\n".join(lines + [f"  {'sum':<{width}}  {sum(self.timings.values()) * 1000:8.1f} ms"])
+
+
+def _group_by_file(manifest):
+    by_file = {}
+    for r in manifest:
+        by_file.setdefault(r.file, []).append(r)
+    return by_file
+
+
+def _load_workbook(path, requests, flags):
+    """
+    Parse every request on one workbook (worker side).
+
+    Returns:
+    - dict name -> DataFrame, elapsed time [s]
+    """
+    t0 = time.perf_counter()
+    frames = {}
+    with pd.ExcelFile(path) as xl:
+        first = xl.sheet_names[0]
+        for r in requests:
+            sheet = first if r.sheet in (None, 0) else r.sheet
+            df = xl.parse(sheet, usecols=None if r.usecols is None else list(r.usecols))
+            if r.screened:
+                # Same sheet matching as proxy_qc.read_screened ('' = first sheet)
+                df = apply_flags(df, flags, Path(path).name, (sheet, '') if sheet == first else (sheet,))
+            frames[r.name] = df
+    return frames, time.perf_counter() - t0
+
+
+def load_all(manifest, data_dir=DATA_DIR, executor='process', n_workers=None):
+    """
+    Load a manifest concurrently, one task per workbook.
+
+    Parameters:
+    - manifest: list of LoadRequest
+    - data_dir: folder the request files are relative to
+    - executor: 'process' or 'thread'
+    - n_workers: pool size (default: one worker per workbook, at most one
+      per CPU; with a single worker the manifest is loaded in-process)
+
+    Returns:
+    - DataBundle
+    """
+    data_dir = Path(data_dir)
+    names = [r.name for r in manifest]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate request names in manifest: {names}")
+
+    by_file = _group_by_file(manifest)
+    missing = [f for f in by_file if not (data_dir / f).exists()]
+    if missing:
+        raise FileNotFoundError(f"Not found in {data_dir}: {', '.join(missing)}")
+
+    n_workers = n_workers or min(len(by_file), os.cpu_count() or 1)
+    if n_workers == 1:
+        return load_serial(manifest, data_dir)
+
+    flags = load_flags(data_dir) if any(r.screened for r in manifest) else None
+    frames, timings = {}, {}
+    with EXECUTORS[executor](max_workers=n_workers) as pool:
+        futures = {f: pool.submit(_load_workbook, data_dir / f, reqs, flags) for f, reqs in by_file.items()}
+        for f, fut in futures.items():
+            frames_f, timings[f] = fut.result()
+            frames.update(frames_f)
+    return DataBundle({n: frames[n] for n in names}, timings)
+
+
+def load_serial(manifest, data_dir=DATA_DIR):
+    """
+    Load a manifest one workbook after the other (same result as load_all).
+    """
+    data_dir = Path(data_dir)
+    flags = load_flags(data_dir) if any(r.screened for r in manifest) else None
+    frames, timings = {}, {}
+    for f, reqs in _group_by_file(manifest).items():
+        frames_f, timings[f] = _load_workbook(data_dir / f, reqs, flags)
+        frames.update(frames_f)
+    return DataBundle({r.name: frames[r.name] for r in manifest}, timings)
+
+
+def main():
+    # Every workbook of the data folder, first sheet
+    files = sorted(p for p in DATA_DIR.rglob("*.xlsx") if not p.name.startswith("~$")
+                   and p.parent.name != "results")
+    manifest = [LoadRequest(str(p.relative_to(DATA_DIR)), str(p.relative_to(DATA_DIR))) for p in files]
+
+    t0 = time.perf_counter()
+    serial = load_serial(manifest)
+    t_serial = time.perf_counter() - t0
+    print(f"Serial: {t_serial:.2f} s")
+    print(serial.report())
+
+    for executor in EXECUTORS:
+        t0 = time.perf_counter()
+        bundle = load_all(manifest, executor=executor, n_workers=len(_group_by_file(manifest)))
+        dt = time.perf_counter() - t0
+        same = all(bundle[k].equals(serial[k]) for k in serial)
+        print(f"\n{executor.capitalize()} pool: {dt:.2f} s ({t_serial / dt:.1f}× faster), identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 09:31:27 2026
+
+Normalised Hg ratios and enrichment factors for all cores and normalisers.
+
+The Hg slices of every core are aligned in one proxy cube (core × slice ×
+proxy, NaN-padded): Hg concentration, XRF Ti and Al areas averaged over each
+slice, total carbon (TOC proxy, EYC only) and LOI 550, each with its
+uncertainty. Hg/X ratios, their baseline over a reference window and the
+enrichment factors EF = (Hg/X) / (Hg/X)_baseline are computed for every core
+and normaliser in one array pass, with first-order error propagation.
+
+The cores do not reach pre-industrial times (oldest slices ~1906), so the
+default baseline is the oldest part of the records (before 1930).
+
+Results are cached in enrichment_cache/ under a key made of the input files,
+the code of the modules involved (including the proxy_qc thresholds) and the
+settings, so figures can call load_enrichment() without recomputing.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compositional import area_column
+from mixing_model import slice_edges, slice_means
+from proxy_qc import DEPTH_COLUMNS, read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+CACHE_DIR = DATA_DIR / "enrichment_cache"
+
+CORES = ('EYC', 'GDL')
+PROXIES = ('Hg', 'Ti', 'Al', 'TOC', 'LOI_550')
+NORMALISERS = ('Ti', 'Al', 'TOC', 'LOI_550')
+
+# Baseline window [years AD]; None = open end
+BASELINE_WINDOW = (None, 1930.0)
+
+# Relative errors used where the data files give none
+DEFAULT_REL_ERR = {'TOC': 0.05, 'LOI_550': 0.05}
+
+INPUT_FILES = ("Hg.xlsx", "LOI.xlsx", "C_total_delta13C.xlsx", "X_ray.xlsx",
+               str(Path("210_Pb_dating") / "Age.xlsx"), "qc_manual_flags.csv")
+# Inputs that may be absent (no manual flags)
+OPTIONAL_INPUTS = ("qc_manual_flags.csv",)
+
+# Entries of the results kept as JSON in the cache (no pickled objects)
+META_KEYS = ('cores', 'normalisers', 'window')
+
+# Modules whose code (and QC thresholds) the results depend on
+CODE_FILES = ("enrichment.py", "mixing_model.py", "proxy_qc.py", "compositional.py")
+
+
+def _core_proxies(core, data_dir, rel_err):
+    """
+    Proxy values, errors, ages and sample names of the Hg slices of a core
+    (values flagged by proxy_qc are NaN).
+
+    Returns:
+    - values, errors: arrays (n_slices, len(PROXIES))
+    - age: vector of slice ages
+    - samples: vector of sample names
+    """
+    hg = read_screened(data_dir / "Hg.xlsx", usecols=[f"Sample_{core}", f"Depth_{core}",
+                                                      f"Hg_conc_{core}", f"RSD_{core}"])
+    hg = hg.dropna(subset=[f"Depth_{core}"])
+    n = len(hg)
+    loi = read_screened(data_dir / "LOI.xlsx", usecols=[f"LOI_550_{core}"])[f"LOI_550_{core}"]
+    age = pd.read_excel(data_dir / "210_Pb_dating" / "Age.xlsx", usecols=[f"age_{core}"])[f"age_{core}"]
+
+    values = np.full((n, len(PROXIES)), np.nan)
+    errors = np.full((n, len(PROXIES)), np.nan)
+    values[:, 0] = hg[f"Hg_conc_{core}"]
+    errors[:, 0] = hg[f"RSD_{core}"] * values[:, 0]
+
+    # XRF areas averaged over each slice; error of the mean from the fit errors (AreaStd)
+    xrf = read_screened(data_dir / "X_ray.xlsx", sheet_name=core)
+    top, bottom = slice_edges(hg[f"Depth_{core}"])
+    cols = [area_column(xrf.columns, e) for e in ('Ti', 'Al')]
+    depth = xrf[DEPTH_COLUMNS[core]].to_numpy(dtype=float)
+    area = slice_means(depth, xrf[cols].to_numpy(), top, bottom)
+    var = slice_means(depth, xrf[[c + "Std" for c in cols]].to_numpy() ** 2, top, bottom)
+    n_points = np.searchsorted(np.sort(depth), bottom) - np.searchsorted(np.sort(depth), top)
+    values[:, 1:3] = area
+    errors[:, 1:3] = np.sqrt(var / n_points[:, None])
+
+    if core == 'EYC':
+        c_tot = read_screened(data_dir / "C_total_delta13C.xlsx", usecols=["sample_EYC", "C_total"])
+        values[:, 3] = c_tot.set_index("sample_EYC")["C_total"].reindex(np.arange(1, n + 1)) * 100
+    values[:, 4] = loi.to_numpy(dtype=float)[:n]
+    for j, name in enumerate(PROXIES):
+        if name in rel_err:
+            errors[:, j] = rel_err[name] * values[:, j]
+
+    return values, errors, age.to_numpy(dtype=float)[:n], hg[f"Sample_{core}"].astype(str).to_numpy()
+
+
+def build_cube(cores=CORES, data_dir=DATA_DIR, rel_err=DEFAULT_REL_ERR):
+    """
+    Aligned proxy cube of all cores (NaN-padded to the longest core).
+
+    Returns:
+    - dict with 'values', 'errors' (core, slice, proxy), 'age', 'sample'
+      (core, slice), 'cores', 'proxies'
+    """
+    parts = [_core_proxies(core, Path(data_dir), rel_err) for core in cores]
+    n = max(len(p[2]) for p in parts)
+    cube = {
+        'values': np.full((len(cores), n, len(PROXIES)), np.nan),
+        'errors': np.full((len(cores), n, len(PROXIES)), np.nan),
+        'age': np.full((len(cores), n), np.nan),
+        'sample': np.full((len(cores), n), '', dtype=object),
+        'cores': list(cores), 'proxies': list(PROXIES),
+    }
+    for i, (values, errors, age, samples) in enumerate(parts):
+        k = len(age)
+        cube['values'][i, :k], cube['errors'][i, :k] = values, errors
+        cube['age'][i, :k], cube['sample'][i, :k] = age, samples
+    return cube
+
+
+def enrichment_factors(cube, normalisers=NORMALISERS, window=BASELINE_WINDOW):
+    """
+    Hg/X ratios and enrichment factors for every core, slice and normaliser.
+
+    Errors are propagated to first order assuming independent errors:
+    σ(a/b) = (a/b) √((σa/a)² + (σb/b)²). The baseline ratio of each core and
+    normaliser is the mean of the ratios inside `window`, with the standard
+    error of that mean as its uncertainty.
+
+    Returns:
+    - dict with 'ratio', 'err_ratio', 'EF', 'err_EF' (core, slice, normaliser),
+      'baseline', 'err_baseline', 'n_baseline' (core, normaliser),
+      'age', 'sample', 'cores', 'normalisers', 'window'
+    """
+    j = [cube['proxies'].index(x) for x in normalisers]
+    hg, e_hg = cube['values'][..., :1], cube['errors'][..., :1]
+    X, e_X = cube['values'][..., j], cube['errors'][..., j]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        R = hg / X
+        e_R = np.abs(R) * np.sqrt((e_hg / hg) ** 2 + (e_X / X) ** 2)
+
+        lo = -np.inf if window[0] is None else window[0]
+        hi = np.inf if window[1] is None else window[1]
+        in_base = ((cube['age'] >= lo) & (cube['age'] <= hi))[..., None] & np.isfinite(R)
+        n_base = in_base.sum(axis=1)
+        R_base = np.where(in_base, R, 0).sum(axis=1) / n_base
+        dev = np.where(in_base, R - R_base[:, None], 0)
+        e_base = np.sqrt((dev ** 2).sum(axis=1) / (n_base - 1)) / np.sqrt(n_base)
+
+        EF = R / R_base[:, None]
+        e_EF = np.abs(EF) * np.sqrt((e_R / R) ** 2 + (e_base / R_base)[:, None] ** 2)
+
+    return {
+        'ratio': R, 'err_ratio': e_R, 'EF': EF, 'err_EF': e_EF,
+        'baseline': R_base, 'err_baseline': e_base, 'n_baseline': n_base,
+        'age': cube['age'], 'sample': cube['sample'],
+        'cores': cube['cores'], 'normalisers': list(normalisers), 'window': list(window),
+    }
+
+
+def cache_key(cores, normalisers, window, rel_err, data_dir=DATA_DIR):
+    """
+    Hash of the input files, the code (proxy_qc thresholds included) and the
+    settings of an enrichment run.
+    """
+    h = hashlib.sha1()
+    for name in INPUT_FILES:
+        path = Path(data_dir) / name
+        if name in OPTIONAL_INPUTS and not path.exists():
+            h.update(f"no {name}".encode())
+            continue
+        h.update(path.read_bytes())
+    for name in CODE_FILES:
+        h.update((Path(__file__).resolve().parent / name).read_bytes())
+    h.update(json.dumps([list(cores), list(normalisers), list(window), rel_err], sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def load_enrichment(cores=CORES, normalisers=NORMALISERS, window=BASELINE_WINDOW,
+                    rel_err=DEFAULT_REL_ERR, data_dir=DATA_DIR, refresh=False):
+    """
+    Enrichment results from the cache, computed and cached on first use.
+
+    Parameters:
+    - cores, normalisers, window, rel_err: see build_cube / enrichment_factors
+    - data_dir: path of the Data folder
+    - refresh: recompute even if a cached result exists
+
+    Returns:
+    - dict (see enrichment_factors)
+    """
+    key = cache_key(cores, normalisers, window, rel_err, data_dir)
+    path = CACHE_DIR / f"enrichment_{key}.npz"
+    if path.exists() and not refresh:
+        with np.load(path) as f:
+            res = {k: f[k] for k in f.files if k != 'meta'}
+            res.update(json.loads(str(f['meta'])))
+        return res
+
+    res = enrichment_factors(build_cube(cores, data_dir, rel_err), normalisers, window)
+    CACHE_DIR.mkdir(exist_ok=True)
+    arrays = {k: np.asarray(v, dtype=str if k == 'sample' else None)
+              for k, v in res.items() if k not in META_KEYS}
+    np.savez(path, meta=json.dumps({k: res[k] for k in META_KEYS}), **arrays)
+    return res
+
+
+def to_frame(res, core):
+    """
+    Table of one core: sample, age and ratio / EF columns with errors.
+    """
+    i = res['cores'].index(core)
+    keep = np.isfinite(res['age'][i])
+    df = pd.DataFrame({'sample': res['sample'][i][keep], 'age': res['age'][i][keep]})
+    for j, x in enumerate(res['normalisers']):
+        for key, label in (('ratio', f"Hg/{x}"), ('EF', f"EF_{x}")):
+            df[label] = res[key][i, keep, j]
+            df[f"err_{label}"] = res[f"err_{key}"][i, keep, j]
+    return df
+
+
+def main():
+    res = load_enrichment()
+    for i, core in enumerate(res['cores']):
+        df = to_frame(res, core)
+        recent = df['age'] >= 1970
+        print(f"\n{core}: baseline before {res['window'][1]:.0f} "
+              f"({', '.join(f'{x}: n={n}' for x, n in zip(res['normalisers'], res['n_baseline'][i]))})")
+        for x in res['normalisers']:
+            ef = df.loc[recent, f"EF_{x}"]
+            if ef.notna().any():
+                print(f"  EF_{x} since 1970: mean {ef.mean():.2f}, max {ef.max():.2f}")
+
+
+if __name__ == "__main__":
+    main()
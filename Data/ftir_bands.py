@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 10:05:44 2026
+
+Band-integration indices from FT-IR ATR spectra.
+
+Baseline-corrected areas, heights and ratios of configurable absorption bands
+are computed for all spectra of a core at once, as matrix operations on the
+(spectra × wavenumber) array, using index ranges precomputed on the
+wavenumber axis. The carbonate bands marked in carbonate.py (~1440–1530 and
+~880 cm⁻¹) give a direct, PCA-free carbonate proxy that can be regressed
+against THg and LOI 950.
+"""
+
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import linregress
+
+from proxy_qc import read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+FTIR_DIR = DATA_DIR / "FT-IR_ATR"
+
+# Band limits [cm⁻¹]; the baseline is drawn between the two edges of each band
+BANDS = {
+    'carbonate_v3': (1380.0, 1530.0),   # CO3 asymmetric stretch (calcite ~1420, dolomite ~1440)
+    'carbonate_v2': (860.0, 900.0),     # CO3 out-of-plane bend (calcite 875, dolomite 880)
+    'silicate': (940.0, 1150.0),        # Si-O stretch of clays and quartz
+    'aliphatic': (2800.0, 3000.0),      # C-H stretch of organic matter
+}
+
+# Ratios of band areas: name -> (numerator, denominator)
+RATIOS = {
+    'carbonate_v3/silicate': ('carbonate_v3', 'silicate'),
+    'carbonate_v2/silicate': ('carbonate_v2', 'silicate'),
+    'aliphatic/silicate': ('aliphatic', 'silicate'),
+}
+
+# Points averaged at each band edge to anchor the baseline
+N_EDGE = 5
+
+
+def load_spectra(path):
+    """
+    Load an Orange input file (input_<core>.csv) as arrays.
+
+    Parameters:
+    - path: CSV with one spectrum per row, first column = sample name,
+      header = wavenumbers
+
+    Returns:
+    - wn: vector of increasing wavenumbers [cm⁻¹]
+    - names: list of sample names
+    - S: float array (n_spectra, n_wavenumbers) of absorbances
+    """
+    df = pd.read_csv(path, index_col=0)
+    wn = df.columns.astype(float).to_numpy()
+    S = df.to_numpy(dtype=float)
+    order = np.argsort(wn)
+    return wn[order], list(df.index.astype(str)), S[:, order]
+
+
+def sample_number(name):
+    """
+    Slice number of a sample name (e.g. 'EYC23-12' -> 12).
+    """
+    return int(re.search(r"(\d+)$", name).group(1))
+
+
+def band_ranges(wn, bands=BANDS):
+    """
+    Precompute the index range of each band on a wavenumber axis.
+
+    Returns:
+    - dict band -> (i0, i1), slice bounds on wn
+    """
+    ranges = {}
+    for name, (lo, hi) in bands.items():
+        i0, i1 = np.searchsorted(wn, [lo, hi])
+        if i1 - i0 < 2 * N_EDGE:
+            raise ValueError(f"Band '{name}' ({lo}–{hi} cm⁻¹) is too narrow for this axis")
+        ranges[name] = (int(i0), int(i1))
+    return ranges
+
+
+def trapezoid_weights(x):
+    """
+    Weights w such that w @ y is the trapezoidal integral of y over x.
+    """
+    dx = np.diff(x)
+    w = np.zeros_like(x)
+    w[:-1] += dx / 2
+    w[1:] += dx / 2
+    return w
+
+
+def band_indices(wn, S, bands=BANDS, ratios=RATIOS, ranges=None):
+    """
+    Baseline-corrected area and height of every band for all spectra at once.
+
+    The baseline of each spectrum is the straight line joining the mean
+    absorbance of the first and last N_EDGE points of the band.
+
+    Parameters:
+    - wn: increasing wavenumbers (n_wavenumbers,)
+    - S: absorbances (n_spectra, n_wavenumbers)
+    - bands, ratios: band limits and area ratios (see BANDS, RATIOS)
+    - ranges: optional output of band_ranges(wn, bands), to reuse across calls
+
+    Returns:
+    - DataFrame (n_spectra rows) with <band>_area, <band>_height and ratio columns
+    """
+    if ranges is None:
+        ranges = band_ranges(wn, bands)
+
+    out = {}
+    for name, (i0, i1) in ranges.items():
+        x = wn[i0:i1]
+        Y = S[:, i0:i1]
+
+        # Linear baseline a + b * x per spectrum, anchored on the band edges
+        x_l, x_r = x[:N_EDGE].mean(), x[-N_EDGE:].mean()
+        y_l, y_r = Y[:, :N_EDGE].mean(axis=1), Y[:, -N_EDGE:].mean(axis=1)
+        b = (y_r - y_l) / (x_r - x_l)
+        a = y_l - b * x_l
+
+        w = trapezoid_weights(x)
+        out[f"{name}_area"] = Y @ w - (a * w.sum() + b * (w @ x))
+        out[f"{name}_height"] = (Y - (a[:, None] + b[:, None] * x[None, :])).max(axis=1)
+
+    for name, (num, den) in ratios.items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[name] = out[f"{num}_area"] / out[f"{den}_area"]
+    return pd.DataFrame(out)
+
+
+def core_index_table(core, data_dir=DATA_DIR, bands=BANDS, ratios=RATIOS):
+    """
+    Band indices of a core aligned with its Hg and LOI samples.
+
+    Spectra are ordered by slice number; slice k matches row k-1 of Hg.xlsx,
+    LOI.xlsx and Age.xlsx (same convention as PCA_loadings in carbonate.py).
+    Values flagged by proxy_qc are NaN.
+
+    Returns:
+    - DataFrame with sample, THg, LOI_950, age and the band indices
+    """
+    wn, names, S = load_spectra(FTIR_DIR / core / f"input_{core}.csv")
+    numbers = np.array([sample_number(n) for n in names])
+    order = np.argsort(numbers)
+    indices = band_indices(wn, S[order], bands, ratios)
+    indices.insert(0, 'sample', [names[i] for i in order])
+    rows = numbers[order] - 1
+
+    hg = read_screened(Path(data_dir) / "Hg.xlsx")
+    loi = read_screened(Path(data_dir) / "LOI.xlsx")
+    age = pd.read_excel(Path(data_dir) / "210_Pb_dating" / "Age.xlsx")
+    indices['THg'] = hg[f"Hg_conc_{core}"].to_numpy()[rows]
+    indices['LOI_950'] = loi[f"LOI_950_{core}"].to_numpy()[rows]
+    indices['age'] = age[f"age_{core}"].to_numpy()[rows]
+    return indices
+
+
+def regress_indices(table, index_cols, targets=('THg', 'LOI_950')):
+    """
+    Linear regression of each target against each band index.
+
+    Returns:
+    - DataFrame with slope, intercept, R², p-value and n per (index, target)
+    """
+    rows = []
+    for target in targets:
+        for col in index_cols:
+            d = table[[col, target]].replace([np.inf, -np.inf], np.nan).dropna()
+            res = linregress(d[col], d[target])
+            rows.append({'index': col, 'target': target, 'slope': res.slope,
+                         'intercept': res.intercept, 'R2': res.rvalue ** 2,
+                         'p': res.pvalue, 'n': len(d)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    for core in ['EYC', 'GDL']:
+        table = core_index_table(core)
+        index_cols = [c for c in table.columns if c.endswith('_area') or '/' in c]
+        res = regress_indices(table, index_cols)
+        print(f"\n{core}: {len(table)} spectra")
+        print(res.round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 15:26:10 2026
+
+Preprocessing kernels for FT-IR spectral matrices.
+
+Every kernel takes and returns (wn, S), with S a (spectra × wavenumber) array,
+and works on the whole matrix in one array operation: resampling to a shared
+wavenumber grid, range cropping, SNV and MSC scatter correction, and
+Savitzky-Golay smoothing/derivatives. A chain of kernels is a list of
+(name, kwargs) steps, so the same preprocessing runs identically on spectra
+from any core or instrument once they are stacked on a common grid.
+"""
+
+import time
+
+import numpy as np
+from scipy.signal import savgol_filter
+
+from ftir_bands import FTIR_DIR, load_spectra
+
+# Spacing of the shared grid [cm⁻¹]
+GRID_STEP = 2.0
+
+# Default chain (on the shared grid): same range as carbonate.py, scatter correction, light smoothing
+DEFAULT_CHAIN = [
+    ('crop', {'lo': 400.0, 'hi': 4000.0}),
+    ('snv', {}),
+    ('savgol', {'window': 9, 'polyorder': 2, 'deriv': 0}),
+]
+
+
+def interpolation_weights(wn, grid):
+    """
+    Indices and weights of the linear interpolation from wn onto grid.
+
+    They depend only on the two axes, so they are computed once and applied
+    to any number of spectra.
+
+    Returns:
+    - idx: vector of right-neighbour indices on wn
+    - t: vector of weights of the right neighbour (NaN outside wn)
+    """
+    idx = np.clip(np.searchsorted(wn, grid), 1, len(wn) - 1)
+    t = (grid - wn[idx - 1]) / (wn[idx] - wn[idx - 1])
+    t[(grid < wn[0]) | (grid > wn[-1])] = np.nan
+    return idx, t
+
+
+def resample(wn, S, grid=None, step=GRID_STEP):
+    """
+    Resample all spectra onto a new wavenumber grid (linear interpolation).
+
+    Parameters:
+    - wn: increasing wavenumbers of S
+    - S: spectra (n_spectra, len(wn))
+    - grid: target wavenumbers; if None, a regular grid with `step` over wn
+    - step: spacing of that grid (default GRID_STEP)
+
+    Returns:
+    - grid, S on the grid (NaN outside the original range)
+    """
+    if grid is None:
+        grid = regular_grid(wn[0], wn[-1], step)
+    grid = np.asarray(grid, dtype=float)
+    idx, t = interpolation_weights(wn, grid)
+    return grid, S[:, idx - 1] * (1 - t) + S[:, idx] * t
+
+
+def regular_grid(lo, hi, step):
+    """
+    Regular grid from lo to hi (inclusive when hi falls on the grid).
+    """
+    return lo + step * np.arange(int(np.floor((hi - lo) / step + 1e-9)) + 1)
+
+
+def common_grid(axes, step=None):
+    """
+    Regular grid covering the overlap of several wavenumber axes.
+
+    Parameters:
+    - axes: list of increasing wavenumber vectors
+    - step: grid spacing (default: the coarsest median spacing of the axes)
+
+    Returns:
+    - grid vector
+    """
+    lo = max(a[0] for a in axes)
+    hi = min(a[-1] for a in axes)
+    if step is None:
+        step = max(np.median(np.diff(a)) for a in axes)
+    return regular_grid(np.ceil(lo / step) * step, hi, step)
+
+
+def crop(wn, S, lo, hi):
+    """
+    Keep the wavenumbers between lo and hi (inclusive).
+    """
+    i0 = np.searchsorted(wn, lo, side='left')
+    i1 = np.searchsorted(wn, hi, side='right')
+    return wn[i0:i1], S[:, i0:i1]
+
+
+def snv(wn, S):
+    """
+    Standard normal variate: centre and scale every spectrum.
+    """
+    mean = np.nanmean(S, axis=1, keepdims=True)
+    std = np.nanstd(S, axis=1, keepdims=True)
+    return wn, (S - mean) / std
+
+
+def msc(wn, S, reference=None):
+    """
+    Multiplicative scatter correction against a reference spectrum.
+
+    Each spectrum is regressed on the reference (S_i ≈ a_i + b_i * ref) in
+    closed form for all spectra at once, then corrected as (S_i - a_i) / b_i.
+    Like snv, NaNs (e.g. the edges of resampled spectra) are left out of the
+    fit of each spectrum and kept in the output.
+
+    Parameters:
+    - reference: reference spectrum (default: mean spectrum of S)
+    """
+    ref = np.nanmean(S, axis=0) if reference is None else np.asarray(reference, dtype=float)
+    valid = np.isfinite(S) & np.isfinite(ref)[None, :]
+    Sv = np.where(valid, S, np.nan)
+    Rv = np.where(valid, ref[None, :], np.nan)
+    mean_S = np.nanmean(Sv, axis=1)
+    mean_R = np.nanmean(Rv, axis=1)
+    Rc = Rv - mean_R[:, None]
+    b = np.nansum((Sv - mean_S[:, None]) * Rc, axis=1) / np.nansum(Rc * Rc, axis=1)
+    a = mean_S - b * mean_R
+    return wn, (S - a[:, None]) / b[:, None]
+
+
+def savgol(wn, S, window=11, polyorder=2, deriv=0):
+    """
+    Savitzky-Golay smoothing or derivative along the wavenumber axis.
+
+    The grid must be regular (resample first); derivatives are per cm⁻¹.
+    """
+    step = np.diff(wn)
+    if not np.allclose(step, step[0], rtol=1e-3):
+        raise ValueError("Savitzky-Golay needs a regular grid: add a 'resample' step before 'savgol'")
+    return wn, savgol_filter(S, window, polyorder, deriv=deriv, delta=step[0], axis=1)
+
+
+KERNELS = {
+    'resample': resample,
+    'crop': crop,
+    'snv': snv,
+    'msc': msc,
+    'savgol': savgol,
+}
+
+
+def apply_chain(wn, S, chain=DEFAULT_CHAIN):
+    """
+    Run a preprocessing chain on a spectral matrix.
+
+    Parameters:
+    - wn, S: wavenumbers and spectra (n_spectra, len(wn))
+    - chain: list of (kernel name, kwargs) steps, applied in order
+
+    Returns:
+    - wn, S after the last step
+    """
+    for name, kwargs in chain:
+        if name not in KERNELS:
+            raise ValueError(f"Unknown preprocessing step '{name}' (use one of {sorted(KERNELS)})")
+        wn, S = KERNELS[name](wn, S, **kwargs)
+    return wn, S
+
+
+def load_stack(paths, chain=DEFAULT_CHAIN, grid=None, step=GRID_STEP):
+    """
+    Load spectra from several files onto one grid and preprocess them together.
+
+    Parameters:
+    - paths: list of input_<core>.csv files (any wavenumber axes)
+    - chain: preprocessing chain applied after stacking
+    - grid: common grid (default: common_grid of the input axes with `step`)
+    - step: spacing of the default common grid [cm⁻¹]
+
+    Returns:
+    - wn: wavenumbers after preprocessing
+    - names: list of sample names
+    - S: preprocessed spectra (n_spectra_total, len(wn))
+    """
+    loaded = [load_spectra(p) for p in paths]
+    if grid is None:
+        grid = common_grid([wn for wn, _, _ in loaded], step)
+    names = [n for _, ns, _ in loaded for n in ns]
+    S = np.vstack([resample(wn, s, grid)[1] for wn, _, s in loaded])
+    wn, S = apply_chain(grid, S, chain)
+    return wn, names, S
+
+
+def main():
+    paths = [FTIR_DIR / core / f"input_{core}.csv" for core in ['EYC', 'GDL']]
+    t0 = time.perf_counter()
+    wn, names, S = load_stack(paths)
+    print(f"Stacked {S.shape[0]} spectra on {S.shape[1]} points "
+          f"({wn[0]:.0f}–{wn[-1]:.0f} cm⁻¹) in {time.perf_counter() - t0:.2f} s")
+
+    # === Throughput of the chain alone on a large batch ===
+    big = np.tile(S, (max(1, 5000 // len(S)), 1))
+    t0 = time.perf_counter()
+    apply_chain(wn, big, [('snv', {}), ('savgol', {'window': 9, 'polyorder': 2, 'deriv': 1})])
+    print(f"SNV + first derivative on {len(big)} spectra in {time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 14:37:18 2026
+
+Nearest-neighbour similarity index of FT-IR spectra across cores.
+
+Spectra are preprocessed with ftir_preprocess (common grid, SNV, smoothing)
+and projected on a PCA basis fitted once when the index is built. The scores
+are kept in a columnar store (similarity.index/, see columnar_store.py) with
+the basis next to them; each core added later is projected on the same basis
+and appended as a new segment with its own KD-tree, so no rebuild is needed.
+Segments are merged into one tree when there are more than MAX_SEGMENTS.
+k-NN and radius queries take any number of query spectra (e.g. glacial flour
+or soil end-members) in one batched call.
+
+Usage:
+    python ftir_similarity.py [<endmembers.csv> ...]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+import columnar_store
+from ftir_bands import FTIR_DIR, load_spectra
+from ftir_preprocess import DEFAULT_CHAIN, GRID_STEP, apply_chain, common_grid, load_stack, resample
+
+INDEX_PATH = FTIR_DIR / "similarity.index"
+BASIS_FILE = "basis.npz"
+
+# Number of principal components kept in the index space
+N_COMPONENTS = 10
+
+# Segments (one KD-tree each) allowed before they are merged
+MAX_SEGMENTS = 8
+
+
+def core_name(path):
+    """
+    Core code of an Orange input file (input_<core>.csv -> <core>).
+    """
+    return Path(path).stem.removeprefix("input_")
+
+
+def fit_basis(S, n_components=N_COMPONENTS):
+    """
+    PCA basis of preprocessed spectra (SVD of the centred matrix).
+
+    Returns:
+    - mean: mean spectrum
+    - components: (n_components, n_wavenumbers) orthonormal loadings
+    - explained: explained variance ratio of each component
+    """
+    mean = S.mean(axis=0)
+    _, s, Vt = np.linalg.svd(S - mean, full_matrices=False)
+    var = s ** 2
+    return mean, Vt[:n_components], var[:n_components] / var.sum()
+
+
+def build_index(paths, path=INDEX_PATH, n_components=N_COMPONENTS, chain=DEFAULT_CHAIN, step=GRID_STEP):
+    """
+    Build a new index from the spectra of one or more cores.
+
+    Parameters:
+    - paths: list of input_<core>.csv files
+    - path: folder of the index
+    - n_components: dimension of the index space
+    - chain: preprocessing chain (see ftir_preprocess)
+    - step: spacing of the common grid [cm⁻¹]
+
+    Returns:
+    - index: dict (see open_index)
+    """
+    path = Path(path)
+    if columnar_store.exists(path):
+        raise FileExistsError(f"Similarity index already exists: {path}")
+
+    loaded = [load_spectra(p) for p in paths]
+    grid = common_grid([wn for wn, _, _ in loaded], step)
+    wn, names, S = load_stack(paths, chain, grid)
+    mean, components, explained = fit_basis(S, n_components)
+
+    path.mkdir(parents=True)
+    np.savez(path / BASIS_FILE, grid=grid, mean=mean, components=components, explained=explained)
+    cores = [core_name(p) for p, (_, ns, _) in zip(paths, loaded) for _ in ns]
+    scores = (S - mean) @ components.T
+    columnar_store.append_columns(path, _to_columns(cores, names, scores),
+                                  attrs={'chain': chain, 'segments': [[0, len(names)]],
+                                         'cores': sorted(set(cores))})
+    return open_index(path)
+
+
+def _to_columns(cores, names, scores):
+    return {
+        'core': np.array(cores).astype('S16'),
+        'sample': np.array(names).astype('S32'),
+        **{f"pc_{i}": scores[:, i].astype(np.float32) for i in range(scores.shape[1])},
+    }
+
+
+def open_index(path=INDEX_PATH):
+    """
+    Load an index: basis, scores and one KD-tree per segment.
+
+    Returns:
+    - index: dict with path, grid, mean, components, explained, chain,
+      core, sample, scores, segments and trees
+    """
+    path = Path(path)
+    attrs = columnar_store.read_meta(path)['attrs']
+    basis = np.load(path / BASIS_FILE)
+    cols = columnar_store.read_columns(path)
+    n_pc = basis['components'].shape[0]
+    scores = np.column_stack([cols[f"pc_{i}"] for i in range(n_pc)]).astype(float)
+
+    index = {
+        'path': path,
+        'grid': basis['grid'], 'mean': basis['mean'],
+        'components': basis['components'], 'explained': basis['explained'],
+        'chain': [(name, kwargs) for name, kwargs in attrs['chain']],
+        'core': np.char.decode(cols['core']), 'sample': np.char.decode(cols['sample']),
+        'scores': scores, 'segments': [tuple(s) for s in attrs['segments']],
+    }
+    index['trees'] = [cKDTree(scores[a:b]) for a, b in index['segments']]
+    return index
+
+
+def project(index, wn, S):
+    """
+    Scores of raw spectra in the index space (same grid, chain and basis).
+
+    Parameters:
+    - wn: increasing wavenumbers of S
+    - S: raw absorbances (n_spectra, len(wn))
+
+    Returns:
+    - scores (n_spectra, n_components)
+    """
+    _, R = resample(wn, S, index['grid'])
+    _, R = apply_chain(index['grid'], R, index['chain'])
+    return (R - index['mean']) @ index['components'].T
+
+
+def add_spectra(index, core, names, wn, S):
+    """
+    Add the spectra of a new core to an index as a new segment.
+
+    Spectra are projected on the existing basis and appended to the store;
+    only the KD-tree of the new segment is built. When there are more than
+    MAX_SEGMENTS segments they are merged into one.
+
+    Returns:
+    - index: updated index dict
+    """
+    if core in set(index['core']):
+        raise ValueError(f"Core {core} is already in the index {index['path']}")
+    scores = project(index, wn, S)
+    n0 = len(index['scores'])
+    n1 = columnar_store.append_columns(index['path'], _to_columns([core] * len(names), names, scores))
+
+    index['core'] = np.concatenate([index['core'], [core] * len(names)])
+    index['sample'] = np.concatenate([index['sample'], names])
+    index['scores'] = np.vstack([index['scores'], scores.astype(np.float32).astype(float)])
+    index['segments'].append((n0, n1))
+    index['trees'].append(cKDTree(index['scores'][n0:n1]))
+    if len(index['segments']) > MAX_SEGMENTS:
+        compact_index(index)
+    columnar_store.update_attrs(index['path'], segments=[list(s) for s in index['segments']],
+                                cores=sorted(set(index['core'].tolist())))
+    return index
+
+
+def add_core(index, csv_path):
+    """
+    Add all spectra of an input_<core>.csv file to an index.
+    """
+    wn, names, S = load_spectra(csv_path)
+    return add_spectra(index, core_name(csv_path), names, wn, S)
+
+
+def compact_index(index):
+    """
+    Merge all segments into one KD-tree (the stored scores are unchanged).
+    """
+    n = len(index['scores'])
+    index['segments'] = [(0, n)]
+    index['trees'] = [cKDTree(index['scores'])]
+    columnar_store.update_attrs(index['path'], segments=[[0, n]])
+    return index
+
+
+def knn_query(index, Q, k=5, workers=-1):
+    """
+    k nearest indexed spectra of every query, over all segments.
+
+    Parameters:
+    - Q: query scores (n_queries, n_components), see project()
+    - k: number of neighbours
+    - workers: threads used by cKDTree.query (-1: all cores)
+
+    Returns:
+    - dist, rows: arrays (n_queries, k) of distances and index rows, nearest first
+    """
+    Q = np.atleast_2d(Q)
+    dist, rows = [], []
+    for (a, b), tree in zip(index['segments'], index['trees']):
+        kk = min(k, b - a)
+        d, i = tree.query(Q, k=kk, workers=workers)
+        dist.append(d.reshape(len(Q), kk))
+        rows.append(i.reshape(len(Q), kk) + a)
+    dist, rows = np.hstack(dist), np.hstack(rows)
+
+    k = min(k, dist.shape[1])
+    order = np.argsort(dist, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(dist, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+def radius_query(index, Q, r, workers=-1):
+    """
+    All indexed spectra within distance r of every query.
+
+    Returns:
+    - list (one per query) of sorted index rows
+    """
+    Q = np.atleast_2d(Q)
+    hits = [[] for _ in range(len(Q))]
+    for (a, _), tree in zip(index['segments'], index['trees']):
+        for q, found in enumerate(tree.query_ball_point(Q, r, workers=workers)):
+            hits[q].extend(a + i for i in found)
+    return [np.sort(np.asarray(h, dtype=int)) for h in hits]
+
+
+def neighbour_table(index, names, dist, rows):
+    """
+    Long table of k-NN results (query, rank, core, sample, distance).
+    """
+    k = rows.shape[1]
+    return pd.DataFrame({
+        'query': np.repeat(names, k),
+        'rank': np.tile(np.arange(1, k + 1), len(names)),
+        'core': index['core'][rows.ravel()],
+        'sample': index['sample'][rows.ravel()],
+        'distance': dist.ravel(),
+    })
+
+
+def main():
+    paths = [FTIR_DIR / core / f"input_{core}.csv" for core in ['EYC', 'GDL']]
+    if columnar_store.exists(INDEX_PATH):
+        index = open_index()
+    else:
+        index = build_index(paths[:1])
+        index = add_core(index, paths[1])
+    print(f"Index: {len(index['scores'])} spectra from {sorted(set(index['core'].tolist()))}, "
+          f"{len(index['segments'])} segment(s), explained variance {index['explained'].sum():.3f}")
+
+    # === Batched queries: all spectra, repeated to a few thousand ===
+    wn, names, S = load_spectra(paths[1])
+    Q = np.tile(project(index, wn, S), (100, 1))
+    t0 = time.perf_counter()
+    dist, rows = knn_query(index, Q, k=5)
+    print(f"k-NN (k=5) for {len(Q)} queries in {time.perf_counter() - t0:.3f} s")
+    r = np.median(dist[:, 1])
+    t0 = time.perf_counter()
+    hits = radius_query(index, Q, r)
+    print(f"Radius query (r={r:.3f}) for {len(Q)} queries in {time.perf_counter() - t0:.3f} s, "
+          f"median {np.median([len(h) for h in hits]):.0f} hits")
+
+    # === End-member spectra given on the command line ===
+    for em_path in sys.argv[1:]:
+        wn, names, S = load_spectra(em_path)
+        dist, rows = knn_query(index, project(index, wn, S), k=5)
+        print(f"\nNearest samples to the end-members of {em_path}:")
+        print(neighbour_table(index, names, dist, rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
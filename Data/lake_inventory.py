@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 10:12:36 2026
+
+Focusing-corrected whole-lake Hg inventory from one or more cores per lake.
+
+HgAR_calc.compute_mass() multiplies the flux integral of a single core by the
+lake surface. Here every core gets a focusing factor FF = I_core / I_ref from
+its unsupported 210Pb inventory, where I_ref is either the inventory supported
+by the atmospheric 210Pb flux (flux / λ) or, by default, the area-weighted
+mean inventory of the lake's cores. Focus-corrected fluxes are combined with
+area weights (bathymetric zone areas, or Voronoi cells of the cores clipped
+to the lake outline) into a whole-lake Hg mass. Uncertainties of fluxes,
+inventories and atmospheric flux are propagated by Monte Carlo, vectorised
+over cores and draws.
+
+A manifest (CSV) lists the cores: lake, core and optionally zone_area_m2,
+x, y (core position [m]), flux, err_flux (1970–2023 flux integral [µg/m²]),
+inventory, err_inventory [Bq/m²]. Missing fluxes and inventories are taken
+from the repository data of the core (HgAR.xlsx, 210Pb metadata/profile).
+
+Usage:
+    python lake_inventory.py [<manifest.csv>]
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from matplotlib.path import Path as Polygon
+from scipy.spatial import cKDTree
+
+from HgAR_calc import surface_EYC_m2, surface_GDL_m2
+from HgAR_incremental import WINDOW, trapezoid_terms, window_mask
+from proxy_qc import read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+PB_DIR = DATA_DIR / "210_Pb_dating"
+
+LAMBDA_PB210 = np.log(2) / 22.2  # decay constant of 210Pb [1/yr]
+
+# Lake surfaces of HgAR_calc.py [m²]
+LAKE_AREAS = {'EYC': surface_EYC_m2, 'GDL': surface_GDL_m2}
+
+# Grid spacing used to clip Voronoi cells to a lake outline [m]
+VORONOI_RESOLUTION = 2.0
+
+
+def metadata_inventory(core, pb_dir=PB_DIR):
+    """
+    Unsupported 210Pb inventory reported by the latest serac metadata file.
+
+    Returns:
+    - inventory, error [Bq/m²], or (nan, nan) when no metadata is found
+    """
+    files = sorted((Path(pb_dir) / core).glob(f"{core}_Metadata_*.txt"))
+    if not files:
+        return np.nan, np.nan
+    text = files[-1].read_text()
+    m = re.search(r'"Inventory \(Lead\)"\s*"([\d.]+) Bq/m2 \(\+/-\s*([\d.]+)', text)
+    return (float(m.group(1)), float(m.group(2))) if m else (np.nan, np.nan)
+
+
+def profile_inventory(core, pb_dir=PB_DIR):
+    """
+    Unsupported 210Pb inventory integrated from the <core>.txt profile.
+
+    Unmeasured layers get Pbex interpolated linearly between measured ones;
+    each layer contributes Pbex [Bq/kg] × density [kg/m³] × thickness [m].
+
+    Returns:
+    - inventory, error [Bq/m²] (error from Pbex_er of the measured layers)
+    """
+    d = pd.read_csv(Path(pb_dir) / core / f"{core}.txt", sep="\t")
+    mid = ((d['depth_top'] + d['depth_bottom']) / 2).to_numpy()
+    ok = d['Pbex'].notna().to_numpy()
+    pb = np.interp(mid, mid[ok], d.loc[ok, 'Pbex'])
+    mass = d['density'].to_numpy() * 1000 * (d['depth_bottom'] - d['depth_top']).to_numpy() / 1000
+    err = np.sqrt(np.nansum((d['Pbex_er'].to_numpy() * mass) ** 2))
+    return float((pb * mass).sum()), float(err)
+
+
+def core_flux(core, window=WINDOW, data_dir=DATA_DIR):
+    """
+    Hg flux integral of a core over the window and its uncertainty, with the
+    window and trapezoid rules of HgAR_calc (samples flagged by proxy_qc left out).
+
+    Returns:
+    - area, err [µg/m²]
+    """
+    hgar = read_screened(Path(data_dir) / "HgAR.xlsx", usecols=[f"Hg_AR_{core}", f"Err_{core}"])
+    age = pd.read_excel(Path(data_dir) / "210_Pb_dating" / "Age.xlsx", usecols=[f"age_{core}"])
+    df = pd.DataFrame({'age': age[f"age_{core}"], 'HgAR': hgar[f"Hg_AR_{core}"],
+                       'err': hgar[f"Err_{core}"]}).dropna().sort_values('age')
+    sel = window_mask(df['age'].to_numpy(), window)
+    area, var = trapezoid_terms(*(df.loc[sel, c].to_numpy() for c in ('age', 'HgAR', 'err')))
+    return float(area.sum()), float(np.sqrt(var.sum()))
+
+
+def voronoi_areas(outline, xy, resolution=VORONOI_RESOLUTION):
+    """
+    Areas of the Voronoi cells of the cores clipped to the lake outline.
+
+    The outline is rasterised on a regular grid and every cell inside it is
+    assigned to its nearest core.
+
+    Parameters:
+    - outline: polygon vertices (n_vertices, 2) [m]
+    - xy: core positions (n_cores, 2) [m]
+    - resolution: grid spacing [m]
+
+    Returns:
+    - vector of areas [m²], one per core
+    """
+    outline = np.asarray(outline, dtype=float)
+    lo, hi = outline.min(axis=0), outline.max(axis=0)
+    gx = np.arange(lo[0] + resolution / 2, hi[0], resolution)
+    gy = np.arange(lo[1] + resolution / 2, hi[1], resolution)
+    pts = np.column_stack([g.ravel() for g in np.meshgrid(gx, gy)])
+    pts = pts[Polygon(outline).contains_points(pts)]
+    _, nearest = cKDTree(np.asarray(xy, dtype=float)).query(pts)
+    return np.bincount(nearest, minlength=len(xy)) * resolution ** 2
+
+
+def default_manifest():
+    """
+    Manifest of the cores in the repository: one core per lake, lake area
+    from HgAR_calc.py.
+    """
+    return pd.DataFrame({'lake': list(LAKE_AREAS), 'core': list(LAKE_AREAS),
+                         'zone_area_m2': list(LAKE_AREAS.values())})
+
+
+def complete_manifest(manifest, outlines=None, window=WINDOW):
+    """
+    Fill fluxes, inventories and area weights missing from a manifest.
+
+    Parameters:
+    - manifest: DataFrame (see module docstring)
+    - outlines: optional dict lake -> outline vertices, for Voronoi weights of
+      lakes whose cores have x, y but no zone_area_m2
+    - window: flux integration window
+
+    Returns:
+    - completed copy of the manifest
+    """
+    m = manifest.copy()
+    for col in ('zone_area_m2', 'flux', 'err_flux', 'inventory', 'err_inventory'):
+        if col not in m:
+            m[col] = np.nan
+
+    for i, core in m['core'].items():
+        if np.isnan(m.at[i, 'flux']):
+            m.at[i, 'flux'], m.at[i, 'err_flux'] = core_flux(core, window)
+        if np.isnan(m.at[i, 'inventory']):
+            inv = metadata_inventory(core)
+            if np.isnan(inv[0]):
+                inv = profile_inventory(core)
+            m.at[i, 'inventory'], m.at[i, 'err_inventory'] = inv
+
+    for lake, rows in m.groupby('lake').groups.items():
+        if m.loc[rows, 'zone_area_m2'].isna().any():
+            if outlines is None or lake not in outlines:
+                raise ValueError(f"Lake {lake}: give zone_area_m2 for every core or an outline with x, y")
+            m.loc[rows, 'zone_area_m2'] = voronoi_areas(outlines[lake], m.loc[rows, ['x', 'y']].to_numpy())
+    return m
+
+
+def lake_inventory(manifest, n_draws=10000, atm_flux=None, seed=0):
+    """
+    Monte Carlo whole-lake Hg mass, vectorised over cores and draws.
+
+    Parameters:
+    - manifest: completed manifest (see complete_manifest)
+    - n_draws: number of Monte Carlo draws
+    - atm_flux: optional (flux, err) of atmospheric 210Pb [Bq/m²/yr]; if None
+      the reference inventory is the area-weighted mean of the lake's cores
+    - seed: random seed
+
+    Returns:
+    - dict with 'lakes', 'mass' (n_draws, n_lakes) [µg], 'mean_flux'
+      (n_draws, n_lakes) [µg/m²], 'FF' (n_draws, n_cores)
+    """
+    rng = np.random.default_rng(seed)
+    lakes, lake_idx = np.unique(manifest['lake'].to_numpy(), return_inverse=True)
+    onehot = np.eye(len(lakes))[lake_idx]                         # (core, lake)
+    area = manifest['zone_area_m2'].to_numpy(dtype=float)
+    lake_area = area @ onehot                                     # (lake,)
+    w = area / lake_area[lake_idx]                                # weights within each lake
+
+    def draw(mean, err):
+        x = mean + err * rng.standard_normal((n_draws, len(mean)))
+        return np.clip(x, 1e-12 * np.abs(mean).max(), None)
+
+    F = draw(manifest['flux'].to_numpy(dtype=float), manifest['err_flux'].to_numpy(dtype=float))
+    I = draw(manifest['inventory'].to_numpy(dtype=float), manifest['err_inventory'].to_numpy(dtype=float))
+
+    if atm_flux is None:
+        I_ref = ((I * w) @ onehot)[:, lake_idx]                   # (draw, core)
+    else:
+        flux = draw(np.array([atm_flux[0]]), np.array([atm_flux[1]]))
+        I_ref = flux / LAMBDA_PB210
+
+    FF = I / I_ref
+    mean_flux = (F / FF * w) @ onehot                             # (draw, lake)
+    return {'lakes': list(lakes), 'mass': mean_flux * lake_area, 'mean_flux': mean_flux,
+            'FF': FF, 'lake_area': lake_area}
+
+
+def summary_table(res, manifest, q=(2.5, 50, 97.5)):
+    """
+    Percentiles of the whole-lake mass [kg] and of the focusing factors.
+    """
+    rows = []
+    P = np.percentile(res['mass'] / 1e9, q, axis=0)
+    for j, lake in enumerate(res['lakes']):
+        rows.append({'lake': lake, 'what': 'mass [kg]', **{f"p{qq:g}": P[k, j] for k, qq in enumerate(q)}})
+    P = np.percentile(res['FF'], q, axis=0)
+    for i, (lake, core) in enumerate(zip(manifest['lake'], manifest['core'])):
+        rows.append({'lake': lake, 'what': f"FF {core}", **{f"p{qq:g}": P[k, i] for k, qq in enumerate(q)}})
+    return pd.DataFrame(rows)
+
+
+def main():
+    manifest = pd.read_csv(sys.argv[1]) if len(sys.argv) > 1 else default_manifest()
+    manifest = complete_manifest(manifest)
+    print(manifest.round(2).to_string(index=False))
+
+    res = lake_inventory(manifest)
+    print("\nWhole-lake Hg mass (1970–2023), reference = lake mean inventory:")
+    print(summary_table(res, manifest).round(3).to_string(index=False))
+
+    # A regional atmospheric 210Pb flux gives absolute focusing factors
+    for flux in (100.0, 200.0):
+        res = lake_inventory(manifest, atm_flux=(flux, 0.2 * flux))
+        print(f"\nReference = atmospheric 210Pb flux {flux:.0f} ± 20% Bq/m²/yr:")
+        print(summary_table(res, manifest).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
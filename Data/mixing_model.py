@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 10:18:42 2026
+
+End-member mixing model for the source apportionment of sediment Hg.
+
+Every sediment slice is unmixed into end-members (e.g. atmospheric /
+catchment soil vs glacial flour) from its tracers: Hg concentration, CLR of
+the XRF elements averaged over the slice, LOI 550/950 and δ13C. The unmixing
+is a fully constrained least squares problem (non-negative fractions summing
+to one), solved exactly for all slices and all Monte Carlo draws of the
+end-member composition at once: with few end-members every support set is
+tried as a batched equality-constrained least squares problem and the best
+non-negative solution is kept. Draws are processed in chunks bounded in
+memory and run in parallel threads.
+
+End-members are read from a user-supplied CSV or Excel file with one row per
+end-member: a column 'endmember' with its name, one column per tracer with
+its mean and optional '<tracer>_sd' columns with its standard deviation, e.g.
+
+    endmember,Hg,Hg_sd,LOI_550,LOI_550_sd,CLR_Ti,CLR_Ti_sd
+    atmospheric,...
+    glacial,...
+
+Usage:
+    python mixing_model.py <endmembers.csv> [<core> ...]
+"""
+
+import sys
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from proxy_qc import DEPTH_COLUMNS, read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+
+# Support sets tried per problem grow as 2**n: keep the end-members few
+MAX_ENDMEMBERS = 8
+
+# Upper bound of the arrays of one chunk of Monte Carlo draws [bytes]
+MAX_CHUNK_BYTES = 64 * 2 ** 20
+
+
+def slice_edges(depth):
+    """
+    Top and bottom of the slices from their mid-depths (half-way between
+    neighbours, first and last slices symmetric around their mid-depth).
+    """
+    depth = np.asarray(depth, dtype=float)
+    mid = (depth[1:] + depth[:-1]) / 2
+    top = np.concatenate([[2 * depth[0] - mid[0]], mid])
+    bottom = np.concatenate([mid, [2 * depth[-1] - mid[-1]]])
+    return np.clip(top, 0, None), bottom
+
+
+def slice_means(depth_scan, values, top, bottom):
+    """
+    Mean of scan values inside each slice, for all columns at once
+    (cumulative sums over the depth-sorted scan).
+
+    Parameters:
+    - depth_scan: scan depths [mm]
+    - values: scan values (n_scan, n_columns)
+    - top, bottom: slice limits [mm]
+
+    Returns:
+    - means (n_slices, n_columns), NaN for slices without scan points
+    """
+    order = np.argsort(depth_scan)
+    d = np.asarray(depth_scan)[order]
+    v = np.asarray(values, dtype=float)[order]
+    ok = np.isfinite(v)
+    csum = np.vstack([np.zeros(v.shape[1]), np.cumsum(np.where(ok, v, 0), axis=0)])
+    ccnt = np.vstack([np.zeros(v.shape[1]), np.cumsum(ok, axis=0)])
+    i0 = np.searchsorted(d, top, side='left')
+    i1 = np.searchsorted(d, bottom, side='left')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (csum[i1] - csum[i0]) / (ccnt[i1] - ccnt[i0])
+
+
+def sample_tracers(core, data_dir=DATA_DIR):
+    """
+    Tracer table of the Hg slices of a core.
+
+    Returns:
+    - DataFrame (one row per Hg.xlsx row) with sample, depth, Hg, LOI_550,
+      LOI_950, delta_13_C (EYC only) and the CLR_* columns of X_ray.xlsx
+      averaged over each slice (on the sediment depth, DEPTH_COLUMNS); values flagged by proxy_qc are NaN
+    """
+    data_dir = Path(data_dir)
+    hg = read_screened(data_dir / "Hg.xlsx", usecols=[f"Sample_{core}", f"Depth_{core}", f"Hg_conc_{core}"])
+    loi = read_screened(data_dir / "LOI.xlsx", usecols=[f"LOI_550_{core}", f"LOI_950_{core}"])
+    hg = hg.dropna(subset=[f"Depth_{core}"])
+
+    table = pd.DataFrame({
+        'sample': hg[f"Sample_{core}"].to_numpy(),
+        'depth': hg[f"Depth_{core}"].to_numpy(dtype=float),
+        'Hg': hg[f"Hg_conc_{core}"].to_numpy(dtype=float),
+        'LOI_550': loi[f"LOI_550_{core}"].to_numpy(dtype=float)[:len(hg)],
+        'LOI_950': loi[f"LOI_950_{core}"].to_numpy(dtype=float)[:len(hg)],
+    })
+    if core == 'EYC':
+        delta = read_screened(data_dir / "C_total_delta13C.xlsx", usecols=["sample_EYC", "delta_13_C"])
+        table['delta_13_C'] = delta.set_index("sample_EYC")["delta_13_C"].reindex(
+            np.arange(1, len(table) + 1)).to_numpy()
+
+    xrf = read_screened(data_dir / "X_ray.xlsx", sheet_name=core)
+    clr_cols = [c for c in xrf.columns if c.startswith("CLR_")]
+    top, bottom = slice_edges(table['depth'])
+    depth = xrf[DEPTH_COLUMNS[core]].to_numpy(dtype=float)
+    table[clr_cols] = slice_means(depth, xrf[clr_cols].to_numpy(), top, bottom)
+    return table
+
+
+def load_endmembers(path):
+    """
+    Read an end-member file (see module docstring).
+
+    Returns:
+    - names: list of end-member names
+    - mean: DataFrame (tracer columns, one row per end-member)
+    - sd: DataFrame of standard deviations (0 where not given)
+    """
+    path = Path(path)
+    df = pd.read_excel(path) if path.suffix in ('.xlsx', '.xls') else pd.read_csv(path)
+    df = df.set_index('endmember')
+    tracers = [c for c in df.columns if not c.endswith('_sd')]
+    sd = pd.DataFrame({t: df[f"{t}_sd"] if f"{t}_sd" in df else 0.0 for t in tracers}, index=df.index)
+    return list(df.index.astype(str)), df[tracers].astype(float), sd.astype(float)
+
+
+def tracer_scale(samples, em_mean):
+    """
+    Scale of every tracer: spread of the samples and end-members together, so
+    that tracers with different units weigh equally in the misfit.
+    """
+    both = pd.concat([samples[em_mean.columns], em_mean])
+    scale = both.std(axis=0).to_numpy()
+    return np.where(scale > 0, scale, 1.0)
+
+
+def support_sets(m):
+    """
+    All non-empty subsets of m end-members, as boolean masks (2**m - 1, m).
+    """
+    codes = np.arange(1, 2 ** m)
+    return (codes[:, None] >> np.arange(m)[None, :]) & 1 == 1
+
+
+def fcls(A, B):
+    """
+    Fully constrained least squares for a stack of end-member matrices.
+
+    min ||A x - b||² subject to x >= 0 and sum(x) = 1, for every draw of A and
+    every sample b. For each support set the equality-constrained problem is
+    solved through its KKT system (one small matrix per draw, shared by all
+    samples); the feasible solution with the smallest misfit is the optimum.
+
+    Parameters:
+    - A: end-member matrices (n_draws, n_tracers, m), scaled tracers
+    - B: samples (n_samples, n_tracers), same scaling
+
+    Returns:
+    - X: fractions (n_draws, n_samples, m)
+    - misfit: residual sum of squares (n_draws, n_samples)
+    """
+    n_draws, _, m = A.shape
+    G = np.swapaxes(A, 1, 2) @ A                  # (draw, m, m)
+    C = B @ A                                     # (draw, sample, m)
+    bb = (B ** 2).sum(axis=1)                     # (sample,)
+
+    X = np.full(C.shape, np.nan)
+    misfit = np.full(C.shape[:2], np.inf)
+    for P in support_sets(m):
+        p = int(P.sum())
+        K = np.zeros((n_draws, p + 1, p + 1))
+        K[:, :p, :p] = G[:, P][:, :, P]
+        K[:, :p, p] = K[:, p, :p] = 1.0
+        rhs = np.concatenate([C[:, :, P], np.ones(C.shape[:2] + (1,))], axis=2)
+        sol = rhs @ np.swapaxes(np.linalg.pinv(K), 1, 2)
+        x = sol[:, :, :p]
+
+        Gp = G[:, P][:, :, P]
+        rss = np.einsum('dsi,dij,dsj->ds', x, Gp, x) - 2 * (C[:, :, P] * x).sum(axis=2) + bb
+        better = (x >= -1e-12).all(axis=2) & (rss < misfit)
+        full = np.zeros(C.shape)
+        full[:, :, P] = np.clip(x, 0, None)
+        X = np.where(better[:, :, None], full, X)
+        misfit = np.where(better, rss, misfit)
+    return X, np.clip(misfit, 0, None)
+
+
+def unmix(samples, em_names, em_mean, em_sd, tracers=None, n_draws=1000, seed=0,
+          max_chunk_bytes=MAX_CHUNK_BYTES, n_workers=None):
+    """
+    Monte Carlo end-member unmixing of all samples.
+
+    Parameters:
+    - samples: tracer table (see sample_tracers)
+    - em_names, em_mean, em_sd: end-members (see load_endmembers)
+    - tracers: tracers used (default: all end-member tracers present in samples)
+    - n_draws: number of Monte Carlo draws of the end-member composition
+    - seed: seed of the draws (results do not depend on chunking or threads)
+    - max_chunk_bytes: memory bound of one chunk of draws
+    - n_workers: number of threads (default: ThreadPoolExecutor default)
+
+    Returns:
+    - dict with
+      'fractions': (n_draws, n_samples, n_endmembers), NaN for samples with
+      missing tracers;
+      'misfit': scaled residual sum of squares (n_draws, n_samples);
+      'hg_share': share of the sediment Hg from each end-member (if Hg is a
+      tracer), same shape as fractions;
+      'tracers', 'endmembers': labels
+    """
+    if tracers is None:
+        tracers = [t for t in em_mean.columns if t in samples.columns]
+    if len(tracers) < len(em_names) - 1:
+        raise ValueError(f"{len(em_names)} end-members need at least {len(em_names) - 1} tracers, "
+                         f"got {tracers}")
+    if len(em_names) > MAX_ENDMEMBERS:
+        raise ValueError(f"At most {MAX_ENDMEMBERS} end-members are supported, got {len(em_names)}")
+
+    B_all = samples[tracers].to_numpy(dtype=float)
+    ok = np.isfinite(B_all).all(axis=1)
+    mean = em_mean[tracers].to_numpy()
+    sd = em_sd[tracers].to_numpy()
+    scale = tracer_scale(samples[ok], em_mean[tracers])
+    B = B_all[ok] / scale
+
+    # === Draws of the end-member composition (small), drawn once for all chunks ===
+    rng = np.random.default_rng(seed)
+    E = mean[None] + sd[None] * rng.standard_normal((n_draws,) + mean.shape)
+    A = np.swapaxes(E, 1, 2) / scale[None, :, None]
+
+    # === Chunks of draws bounded in memory, solved in parallel ===
+    m, s = len(em_names), len(B)
+    per_draw = 8 * s * (6 * m + 4)
+    chunk = max(1, min(n_draws, max_chunk_bytes // per_draw))
+    starts = range(0, n_draws, chunk)
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        results = list(pool.map(lambda i: fcls(A[i:i + chunk], B), starts))
+
+    fractions = np.full((n_draws, len(samples), m), np.nan)
+    misfit = np.full((n_draws, len(samples)), np.nan)
+    fractions[:, ok] = np.concatenate([X for X, _ in results])
+    misfit[:, ok] = np.concatenate([r for _, r in results])
+    out = {'fractions': fractions, 'misfit': misfit, 'tracers': list(tracers), 'endmembers': list(em_names)}
+
+    if 'Hg' in tracers:
+        E_hg = E[:, :, tracers.index('Hg')]
+        contrib = fractions * E_hg[:, None, :]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['hg_share'] = contrib / contrib.sum(axis=2, keepdims=True)
+    return out
+
+
+def summarise(result, samples, key='fractions', q=(2.5, 50, 97.5)):
+    """
+    Percentiles of the Monte Carlo fractions per sample and end-member.
+
+    Returns:
+    - DataFrame with sample, depth and <endmember>_p<q> columns
+    """
+    with warnings.catch_warnings():
+        # Samples with missing tracers are NaN in every draw
+        warnings.simplefilter('ignore', RuntimeWarning)
+        P = np.nanpercentile(result[key], q, axis=0)
+    df = samples[['sample', 'depth']].copy()
+    for j, name in enumerate(result['endmembers']):
+        for k, qq in enumerate(q):
+            df[f"{name}_p{qq:g}"] = P[k, :, j]
+    return df
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        sys.exit(1)
+
+    em_names, em_mean, em_sd = load_endmembers(sys.argv[1])
+    for core in sys.argv[2:] or ['EYC', 'GDL']:
+        samples = sample_tracers(core)
+        res = unmix(samples, em_names, em_mean, em_sd)
+        print(f"\n{core}: {len(samples)} samples, tracers {res['tracers']}")
+        key = 'hg_share' if 'hg_share' in res else 'fractions'
+        print(f"Median and 95% range of {key}:")
+        print(summarise(res, samples, key).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
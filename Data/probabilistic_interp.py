@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Nov 12 09:41:26 2026
+
+Probabilistic interpolation of the sparse HgAR samples onto an annual grid.
+
+HgAR_calc.py joins the samples linearly (interp1d, with extrapolation) before
+the 1970 normalisation and the 1970–2023 integrals, which says nothing about
+the values between samples. Here each core's HgAR is the value f of a
+penalised spline on the annual grid: the samples are y = W f + e, where W
+interpolates linearly between the two grid years around each sample age and
+e ~ N(0, err²) comes from Err_* in HgAR.xlsx, and the prior penalises the
+second differences of f with precision λ (a discrete integrated random walk,
+i.e. the Whittaker smoother). The posterior of f is Gaussian with precision
+
+    Q = Wᵀ Σ⁻¹ W + λ DᵀD + ε I
+
+which is banded (bandwidth 2). The cores are stacked as the blocks of one
+block-diagonal banded system, so one banded Cholesky factorisation gives the
+posterior means of all cores, and the selected inverse of the factor
+(Takahashi recursion, restricted to the band) their posterior variances;
+both cost O(grid length), i.e. linear in the number of samples for a fixed
+span. λ is chosen per core by maximising the marginal likelihood over a
+grid of values, evaluated for all cores with each factorisation.
+
+Between distant samples and beyond the last one the posterior variance grows,
+instead of being hidden by a straight line. The integrals and the 1970
+values get their uncertainty from the same posterior (integral()), and
+posterior draws (draws()) are kept in a labelled result store
+(results/hgar_interp, see result_store.py).
+
+A Gaussian process with a Matérn-3/2 kernel has the same Markov structure;
+the spline form is used because its precision is banded on any grid.
+
+Usage:
+    python probabilistic_interp.py [<start> <end>]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import linalg
+from scipy.interpolate import interp1d
+
+import result_store
+from proxy_qc import read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+STORE_PATH = result_store.RESULTS_DIR / "hgar_interp"
+
+CORES = ('EYC', 'GDL')
+BAND = 2                   # bandwidth of the second-difference penalty
+EPS = 1e-8                 # ridge on the level and slope, relative to λ
+# Candidate λ, as 1 / (τ · sd(y))² for second-difference sd τ relative to the data sd
+TAUS = np.logspace(-3, 0.5, 29)
+N_DRAWS = 1000
+PERIOD = (1970, 2023)
+
+
+# === Data ===
+
+def load_cores(data_dir=DATA_DIR, cores=CORES):
+    """
+    HgAR samples and their errors of each core.
+
+    Returns:
+    - dict core -> (age, HgAR, err), sorted by increasing age, without missing
+      or flagged values (proxy_qc)
+    """
+    age = pd.read_excel(data_dir / "210_Pb_dating" / "Age.xlsx")
+    hgar = read_screened(data_dir / "HgAR.xlsx")
+    out = {}
+    for core in cores:
+        df = pd.DataFrame({'age': age[f"age_{core}"], 'y': hgar[f"Hg_AR_{core}"],
+                           'err': hgar[f"Err_{core}"]}).dropna().sort_values('age')
+        out[core] = (df['age'].to_numpy(), df['y'].to_numpy(), df['err'].to_numpy())
+    return out
+
+
+def annual_grid(series, start=None, end=None):
+    """
+    Whole years covering every core (or start–end).
+    """
+    lo = min(a.min() for a, _, _ in series.values()) if start is None else start
+    hi = max(a.max() for a, _, _ in series.values()) if end is None else end
+    return np.arange(np.floor(lo), np.ceil(hi) + 1)
+
+
+# === Banded algebra ===
+
+def interp_weights(grid, age):
+    """
+    Linear interpolation of the grid values at the sample ages (the rows of W).
+
+    Returns:
+    - j: index of the grid year at or below each age (clipped to the grid)
+    - w: weight of grid[j + 1] (that of grid[j] is 1 - w)
+    """
+    j = np.clip(np.floor(age - grid[0]).astype(int), 0, len(grid) - 2)
+    w = np.clip(age - grid[j], 0, 1)
+    return j, w
+
+
+def _penalty_bands(m, band=BAND):
+    # Lower bands of DᵀD for the difference operator of order band (row k: entries (i + k, i))
+    d = np.diff(np.eye(band + 1), band, axis=0)[0]    # e.g. (1, -2, 1)
+    P = np.zeros((band + 1, m))
+    for r in range(m - band):
+        for k in range(band + 1):
+            P[k, r:r + band + 1 - k] += d[k:] * d[:band + 1 - k]
+    return P
+
+
+def precision_bands(grid, series, lams, eps=EPS, band=BAND):
+    """
+    Lower bands of the posterior precision Q and the right-hand side Wᵀ Σ⁻¹ y
+    of all cores, stacked block by block.
+
+    Parameters:
+    - grid: annual grid (m,)
+    - series: dict core -> (age, y, err)
+    - lams: λ of each core (same order as series)
+
+    Returns:
+    - Q: array (band + 1, n_cores · m), Q[k, i] = Q[i + k, i]
+    - b: vector (n_cores · m,)
+    - prior: bands of the prior precision λ DᵀD + ε λ I (same layout as Q)
+    """
+    m = len(grid)
+    P = _penalty_bands(m, band)
+    n = len(series)
+    Q = np.zeros((band + 1, n * m))
+    prior = np.zeros_like(Q)
+    b = np.zeros(n * m)
+    for c, ((age, y, err), lam) in enumerate(zip(series.values(), lams)):
+        s = slice(c * m, (c + 1) * m)
+        prior[:, s] = lam * P
+        prior[0, s] += eps * lam
+        j, w = interp_weights(grid, age)
+        inv = 1 / err ** 2
+        data = np.zeros((band + 1, m))
+        np.add.at(data[0], j, (1 - w) ** 2 * inv)
+        np.add.at(data[0], j + 1, w ** 2 * inv)
+        np.add.at(data[1], j, (1 - w) * w * inv)
+        Q[:, s] = prior[:, s] + data
+        np.add.at(b, c * m + j, (1 - w) * y * inv)
+        np.add.at(b, c * m + j + 1, w * y * inv)
+    return Q, b, prior
+
+
+def selected_inverse(L, band=BAND):
+    """
+    Band of Q⁻¹ from the banded Cholesky factor of Q (Takahashi recursion).
+
+    Parameters:
+    - L: lower factor in band storage, L[k, i] = L[i + k, i] (cholesky_banded, lower=True)
+
+    Returns:
+    - S: band of the inverse in the same layout, S[k, i] = Q⁻¹[i + k, i]
+    """
+    N = L.shape[1]
+    S = np.zeros_like(L)
+
+    def sigma(r, c):
+        # Q⁻¹[r, c] for |r - c| <= band, from the entries already computed
+        return S[r - c, c] if r >= c else S[c - r, r]
+
+    for i in range(N - 1, -1, -1):
+        ks = range(i + 1, min(i + band, N - 1) + 1)
+        for j in reversed(ks):
+            S[j - i, i] = -sum(L[k - i, i] * sigma(k, j) for k in ks) / L[0, i]
+        S[0, i] = 1 / L[0, i] ** 2 - sum(L[k - i, i] * S[k - i, i] for k in ks) / L[0, i]
+    return S
+
+
+def _block_logdet(L, n, m):
+    # log-determinant of each diagonal block from the Cholesky factor
+    return 2 * np.log(L[0]).reshape(n, m).sum(axis=1)
+
+
+# === Fit ===
+
+def fit(series=None, grid=None, taus=TAUS, band=BAND):
+    """
+    Posterior HgAR of every core on the annual grid.
+
+    λ of each core maximises the marginal likelihood
+    log p(y | λ) = -½ (yᵀΣ⁻¹y - bᵀμ + log|Q| - log|λDᵀD + ελI| + Σ log 2πσ²)
+    over λ = 1 / (τ · sd(y))² for τ in taus; the cores share each factorisation.
+
+    Parameters:
+    - series: dict core -> (age, y, err) (default: load_cores())
+    - grid: annual grid (default: annual_grid(series))
+
+    Returns:
+    - dict with cores, grid, mean and sd (n_cores, m), lam, tau, log_evidence
+      (n_cores, len(taus)), and the factor L and shape used by integral() and draws()
+    """
+    series = load_cores() if series is None else series
+    grid = annual_grid(series) if grid is None else np.asarray(grid, dtype=float)
+    n, m = len(series), len(grid)
+    scale = np.array([np.std(y) for _, y, _ in series.values()])
+    const = np.array([np.sum(y ** 2 / e ** 2) + np.sum(np.log(2 * np.pi * e ** 2))
+                      for _, y, e in series.values()])
+
+    evidence = np.zeros((n, len(taus)))
+    for t, tau in enumerate(taus):
+        lams = 1 / (tau * scale) ** 2
+        Q, b, prior = precision_bands(grid, series, lams, band=band)
+        L = linalg.cholesky_banded(Q, lower=True)
+        mu = linalg.cho_solve_banded((L, True), b)
+        Lp = linalg.cholesky_banded(prior, lower=True)
+        quad = (b * mu).reshape(n, m).sum(axis=1)
+        evidence[:, t] = -0.5 * (const - quad + _block_logdet(L, n, m) - _block_logdet(Lp, n, m))
+
+    best = np.argmax(evidence, axis=1)
+    lams = 1 / (taus[best] * scale) ** 2
+    Q, b, _ = precision_bands(grid, series, lams, band=band)
+    L = linalg.cholesky_banded(Q, lower=True)
+    mu = linalg.cho_solve_banded((L, True), b)
+    S = selected_inverse(L, band)
+    return {'cores': list(series), 'grid': grid, 'mean': mu.reshape(n, m),
+            'sd': np.sqrt(S[0]).reshape(n, m), 'lam': lams, 'tau': taus[best],
+            'log_evidence': evidence, 'L': L, 'band': band}
+
+
+def integral(post, start=PERIOD[0], end=PERIOD[1]):
+    """
+    Posterior mean and sd of each core's HgAR integral over start–end
+    (trapezoid on the annual grid) and of its value at start; start and end
+    must be years of the grid.
+
+    Returns:
+    - DataFrame (one row per core): area, area_sd [µg m⁻²], ref, ref_sd
+      [µg m⁻² y⁻¹] and norm_area [years] (area / ref, first order)
+    """
+    grid, L = post['grid'], post['L']
+    n, m = len(post['cores']), len(grid)
+    if not (start < end and start in grid and end in grid):
+        raise ValueError(f"start and end must be years of the grid ({grid[0]:.0f}–{grid[-1]:.0f}) "
+                         f"with start < end, got {start}–{end}")
+    inside = (grid >= start) & (grid <= end)
+    w = np.zeros(m)
+    w[inside] = 1.0
+    idx = np.flatnonzero(inside)
+    w[idx[[0, -1]]] = 0.5
+    e = (grid == start).astype(float)
+
+    rows = []
+    for c, core in enumerate(post['cores']):
+        s = slice(c * m, (c + 1) * m)
+        W = np.zeros((n * m, 2))
+        W[s, 0], W[s, 1] = w, e
+        C = W.T @ linalg.cho_solve_banded((L, True), W)     # covariance of (area, ref)
+        area, ref = w @ post['mean'][c], e @ post['mean'][c]
+        rows.append({'core': core, 'area': area, 'area_sd': np.sqrt(C[0, 0]), 'ref': ref,
+                     'ref_sd': np.sqrt(C[1, 1]), 'norm_area': area / ref,
+                     'norm_area_sd': abs(area / ref) * np.sqrt(C[0, 0] / area ** 2 + C[1, 1] / ref ** 2
+                                                               - 2 * C[0, 1] / (area * ref))})
+    return pd.DataFrame(rows)
+
+
+def draws(post, n_draws=N_DRAWS, rng=None):
+    """
+    Posterior realisations of every core's annual HgAR, f = μ + L⁻ᵀ z.
+
+    Returns:
+    - float32 array (n_draws, n_cores, m)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    L, band = post['L'], post['band']
+    n, m = post['mean'].shape
+    # Lᵀ in the upper band layout of solve_banded
+    U = np.zeros_like(L)
+    for k in range(band + 1):
+        U[band - k, k:] = L[k, :L.shape[1] - k]
+    z = rng.standard_normal((n * m, n_draws))
+    f = linalg.solve_banded((0, band), U, z).T.reshape(n_draws, n, m)
+    return (f + post['mean']).astype(np.float32)
+
+
+def linear_reference(series, start=PERIOD[0], end=PERIOD[1]):
+    """
+    Value at start and integral over start–end of the linearly interpolated
+    samples, as in HgAR_calc.py.
+    """
+    x = np.linspace(start, end, 1000)
+    rows = []
+    for core, (age, y, _) in series.items():
+        f = interp1d(age, y, bounds_error=False, fill_value="extrapolate")
+        v = f(x)
+        rows.append({'core': core, 'area': np.sum((v[1:] + v[:-1]) / 2 * np.diff(x)),
+                     'ref': float(f(start))})
+    return pd.DataFrame(rows)
+
+
+def save(post, samples, path=STORE_PATH):
+    """
+    Keep the posterior mean, sd and draws in a labelled result store.
+    """
+    result_store.create(path, {'draw': np.arange(len(samples)), 'core': post['cores'],
+                               'year': post['grid']},
+                        attrs={'lambda': dict(zip(post['cores'], post['lam'].tolist()))}, overwrite=True)
+    units = {'units': 'µg m-2 y-1'}
+    result_store.write_variable(path, 'HgAR_mean', post['mean'], ['core', 'year'], attrs=units)
+    result_store.write_variable(path, 'HgAR_sd', post['sd'], ['core', 'year'], attrs=units)
+    result_store.write_variable(path, 'HgAR', samples, ['draw', 'core', 'year'], attrs=units)
+
+
+def main():
+    series = load_cores()
+    start, end = (int(v) for v in sys.argv[1:3]) if len(sys.argv) > 2 else PERIOD
+    t0 = time.perf_counter()
+    post = fit(series)
+    dt = time.perf_counter() - t0
+    n_samples = sum(len(a) for a, _, _ in series.values())
+    print(f"{len(series)} cores, {n_samples} samples -> {post['mean'].size} grid years "
+          f"({len(TAUS)} values of λ) in {dt:.3f} s")
+    for core, tau, lam in zip(post['cores'], post['tau'], post['lam']):
+        print(f"  {core}: τ = {tau:.3g} sd, λ = {lam:.3g}")
+
+    # Posterior sd between samples vs at the samples
+    for c, (core, (age, _, err)) in enumerate(series.items()):
+        at = np.interp(age, post['grid'], post['sd'][c])
+        print(f"  {core}: median sd {np.median(post['sd'][c]):.1f} (at samples {np.median(at):.1f}, "
+              f"sample err {np.median(err):.1f}), max {post['sd'][c].max():.1f} µg m⁻² y⁻¹")
+
+    res = integral(post, start, end)
+    lin = linear_reference(series, start, end)
+    res['area_linear'] = lin['area']
+    res['ref_linear'] = lin['ref']
+    res['norm_area_linear'] = lin['area'] / lin['ref']
+    print(f"\nHgAR {start:.0f}–{end:.0f}:")
+    print(res.round(2).to_string(index=False))
+
+    samples = draws(post, rng=np.random.default_rng(0))
+    save(post, samples)
+    print(f"\nSaved to {STORE_PATH.relative_to(DATA_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
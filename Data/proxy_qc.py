@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 11:04:13 2026
+
+Automated outlier / quality screening of the proxy profiles.
+
+Every proxy column of every core is screened in one vectorised pass per
+sheet (all columns at once):
+- Hampel filter: deviation from the running median larger than N_SIGMA
+  robust standard deviations (1.4826 × running MAD);
+- robust z-score of the residuals after removing a running-median trend
+  (modified z-score, 0.6745 (r - median) / MAD);
+- replicate RSD: Hg concentrations whose replicate RSD exceeds MAX_RSD.
+
+A point counts as an outlier when both statistical tests flag it, or when its
+RSD is too high. The flags are written as a sparse table (file, sheet,
+column, row, reason) to qc_flags.csv, together with the manual flags of
+qc_manual_flags.csv, and read_screened() applies them (NaN) when loading a
+sheet, so every loader sees the same screened data. Values computed from a
+flagged value are flagged with it (DERIVED_COLUMNS: the HgAR and its error
+in HgAR.xlsx follow the Hg concentration of the same row in Hg.xlsx).
+
+Usage:
+    python proxy_qc.py
+"""
+
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+DATA_DIR = Path(__file__).resolve().parent
+# Flag tables, in the data folder they screen
+FLAGS_NAME = "qc_flags.csv"
+MANUAL_FLAGS_NAME = "qc_manual_flags.csv"
+FLAGS_FILE = DATA_DIR / FLAGS_NAME
+
+FLAG_COLUMNS = ['file', 'sheet', 'column', 'row', 'reason']
+
+# Screened profiles: (file, sheet or None, regex of the proxy columns)
+PROFILES = [
+    ("Hg.xlsx", None, r"^Hg_conc_"),
+    ("LOI.xlsx", None, r"^LOI_(550|950)_"),
+    ("DBD.xlsx", None, r"^DBD_"),
+    ("C_total_delta13C.xlsx", None, r"^(C_total|delta_13_C)$"),
+    ("X_ray.xlsx", "EYC", r"^CLR_"),
+    ("X_ray.xlsx", "GDL", r"^CLR_"),
+]
+
+# Sediment depth column [mm] of each X_ray.xlsx sheet (the GDL CoreDepth is the
+# scanner position, 52 mm below the sediment surface; ages follow Depth)
+DEPTH_COLUMNS = {'EYC': 'CoreDepth', 'GDL': 'Depth'}
+# Age column of each X_ray.xlsx sheet
+AGE_COLUMNS = {'EYC': 'Age_X_EYC', 'GDL': 'Age'}
+
+# Replicate RSD columns: value column regex -> RSD column template
+RSD_COLUMNS = {r"^Hg_conc_(\w+)$": r"RSD_\1"}
+
+# Values computed from a screened column, flagged with it (reason 'derived'):
+# (file, source file, source column regex, templates of the derived columns)
+DERIVED_COLUMNS = [
+    ("HgAR.xlsx", "Hg.xlsx", r"^Hg_conc_(\w+)$", (r"Hg_AR_\1", r"Err_\1")),
+]
+
+HAMPEL_WINDOW = 7       # points of the running median (odd)
+DETREND_WINDOW = 11     # points of the trend removed before the robust z-score (odd)
+N_SIGMA = 3.0           # Hampel threshold [robust standard deviations]
+MAX_Z = 3.5             # modified z-score threshold
+MAX_RSD = 0.15          # replicate RSD threshold (fraction)
+MIN_POINTS = 3          # valid points needed in a window
+
+
+def nan_median(W, axis=-1):
+    """
+    Median along an axis ignoring NaN (sort-based; NaN sort last).
+
+    Returns:
+    - median and number of valid values
+    """
+    W = np.sort(np.moveaxis(W, axis, -1), axis=-1)
+    k = np.isfinite(W).sum(axis=-1)
+    lo = np.take_along_axis(W, np.maximum((k - 1) // 2, 0)[..., None], axis=-1)[..., 0]
+    hi = np.take_along_axis(W, np.maximum(k // 2, 0)[..., None], axis=-1)[..., 0]
+    return np.where(k > 0, (lo + hi) / 2, np.nan), k
+
+
+def running_median(X, window):
+    """
+    Centred running median and MAD of every column (NaN-aware, shrinking at
+    the ends).
+
+    Parameters:
+    - X: array (n, p)
+    - window: odd number of points
+
+    Returns:
+    - med, mad: arrays (n, p); NaN where fewer than MIN_POINTS values
+    """
+    h = window // 2
+    P = np.pad(X, ((h, h), (0, 0)), constant_values=np.nan)
+    W = sliding_window_view(P, window, axis=0)          # (n, p, window)
+    med, k = nan_median(W)
+    mad, _ = nan_median(np.abs(W - med[..., None]))
+    enough = k >= MIN_POINTS
+    return np.where(enough, med, np.nan), np.where(enough, mad, np.nan)
+
+
+def hampel_flags(X, window=HAMPEL_WINDOW, n_sigma=N_SIGMA):
+    """
+    Hampel filter flags of every column of X (n, p).
+    """
+    med, mad = running_median(X, window)
+    with np.errstate(invalid='ignore'):
+        return (np.abs(X - med) > n_sigma * 1.4826 * mad) & (mad > 0)
+
+
+def robust_z_flags(X, window=DETREND_WINDOW, max_z=MAX_Z):
+    """
+    Modified z-score flags of every column of X (n, p) after removing a
+    running-median trend.
+    """
+    trend, _ = running_median(X, window)
+    R = X - trend
+    med, _ = nan_median(R, axis=0)
+    mad, _ = nan_median(np.abs(R - med), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = 0.6745 * (R - med) / mad
+        return (np.abs(z) > max_z) & (mad > 0)
+
+
+def screen_frame(df, columns, file, sheet=None):
+    """
+    Screen the proxy columns of one sheet.
+
+    Returns:
+    - DataFrame of flags (FLAG_COLUMNS), one row per flagged value
+    """
+    X = df[columns].to_numpy(dtype=float)
+    outlier = hampel_flags(X) & robust_z_flags(X)
+    rows, cols = np.nonzero(outlier)
+    flags = [pd.DataFrame({'column': np.asarray(columns)[cols], 'row': rows, 'reason': 'outlier'})]
+
+    for pattern, template in RSD_COLUMNS.items():
+        for col in columns:
+            rsd_col = re.sub(pattern, template, col) if re.match(pattern, col) else None
+            if rsd_col in df:
+                bad = np.flatnonzero(df[rsd_col].to_numpy(dtype=float) > MAX_RSD)
+                flags.append(pd.DataFrame({'column': col, 'row': bad, 'reason': 'rsd'}))
+
+    out = pd.concat(flags, ignore_index=True)
+    out.insert(0, 'sheet', sheet or '')
+    out.insert(0, 'file', file)
+    return out[FLAG_COLUMNS]
+
+
+def screen_all(data_dir=DATA_DIR, profiles=PROFILES):
+    """
+    Screen every profile and merge the manual flags.
+
+    Returns:
+    - flags: DataFrame (FLAG_COLUMNS)
+    - timings: dict (file, sheet) -> screening time [s] (excluding reading)
+    """
+    data_dir = Path(data_dir)
+    flags, timings = [], {}
+    for file, sheet, pattern in profiles:
+        df = pd.read_excel(data_dir / file, sheet_name=sheet or 0)
+        columns = [c for c in df.columns if re.search(pattern, str(c))]
+        t0 = time.perf_counter()
+        flags.append(screen_frame(df, columns, file, sheet))
+        timings[(file, sheet)] = time.perf_counter() - t0
+
+    manual = data_dir / MANUAL_FLAGS_NAME
+    if manual.exists():
+        flags.append(read_flags(manual))
+    flags = pd.concat(flags, ignore_index=True)
+    flags = pd.concat([flags, derived_flags(flags)], ignore_index=True)
+    flags = flags.drop_duplicates(['file', 'sheet', 'column', 'row'], keep='last')
+    return flags.sort_values(['file', 'sheet', 'column', 'row']).reset_index(drop=True), timings
+
+
+def derived_flags(flags, rules=DERIVED_COLUMNS):
+    """
+    Flags of the values computed from flagged values (DERIVED_COLUMNS), e.g.
+    the HgAR of a flagged Hg concentration.
+
+    Returns:
+    - DataFrame of flags (FLAG_COLUMNS), reason 'derived'
+    """
+    out = [pd.DataFrame(columns=FLAG_COLUMNS)]
+    for file, source, pattern, templates in rules:
+        src = flags[(flags['file'] == source) & flags['column'].str.match(pattern)]
+        for template in templates:
+            out.append(pd.DataFrame({'file': file, 'sheet': '',
+                                     'column': src['column'].str.replace(pattern, template, regex=True),
+                                     'row': src['row'], 'reason': 'derived'}))
+    return pd.concat(out, ignore_index=True)[FLAG_COLUMNS]
+
+
+def read_flags(path):
+    return pd.read_csv(path, dtype={'sheet': str}, keep_default_na=False)[FLAG_COLUMNS]
+
+
+def write_flags(flags, path=FLAGS_FILE):
+    flags[FLAG_COLUMNS].to_csv(path, index=False)
+
+
+def load_flags(data_dir=DATA_DIR, refresh=False):
+    """
+    Flag table of a data folder (its qc_flags.csv), recomputed (and rewritten)
+    when missing, when asked, or when a screened file, the manual flags of
+    that folder or the screening code (this module) are newer than it.
+    """
+    data_dir = Path(data_dir)
+    path = data_dir / FLAGS_NAME
+    sources = [data_dir / f for f, _, _ in PROFILES] + [data_dir / MANUAL_FLAGS_NAME, Path(__file__)]
+    newest = max(p.stat().st_mtime for p in sources if p.exists())
+    if refresh or not path.exists() or path.stat().st_mtime < newest:
+        flags, _ = screen_all(data_dir)
+        write_flags(flags, path)
+        return flags
+    return read_flags(path)
+
+
+def apply_flags(df, flags, file, sheets=('',)):
+    """
+    Set the flagged values of a sheet to NaN (rows are positions in the sheet).
+
+    Parameters:
+    - df: sheet as read by pandas (default header, no skipped rows)
+    - flags: flag table
+    - file: file name of the sheet
+    - sheets: sheet names the flags may carry ('' = first sheet)
+
+    Returns:
+    - copy of df with flagged values masked
+    """
+    df = df.copy()
+    sel = flags[(flags['file'] == file) & flags['sheet'].isin(sheets)]
+    for col, rows in sel.groupby('column')['row']:
+        if col in df:
+            pos = rows.to_numpy(dtype=int)
+            pos = pos[pos < len(df)]
+            df.iloc[pos, df.columns.get_loc(col)] = np.nan
+    return df
+
+
+def read_screened(path, sheet_name=None, usecols=None, flags=None, **kwargs):
+    """
+    pandas.read_excel with the QC flags applied.
+
+    Parameters:
+    - path: Excel file (flags are matched on its name)
+    - sheet_name: sheet (default: first sheet)
+    - usecols: columns to read
+    - flags: flag table (default: load_flags() of the file's folder)
+    - kwargs: extra arguments for pandas.read_excel
+
+    Returns:
+    - DataFrame with flagged values set to NaN
+    """
+    path = Path(path)
+    if flags is None:
+        flags = load_flags(path.parent)
+    with pd.ExcelFile(path) as xl:
+        first = xl.sheet_names[0]
+        sheet = first if sheet_name is None else sheet_name
+        df = xl.parse(sheet, usecols=usecols, **kwargs)
+    sheets = (sheet, '') if sheet == first else (sheet,)
+    return apply_flags(df, flags, path.name, sheets)
+
+
+def main():
+    flags, timings = screen_all()
+    write_flags(flags)
+    for (file, sheet), dt in timings.items():
+        n = ((flags['file'] == file) & (flags['sheet'] == (sheet or ''))).sum()
+        print(f"{file}{'[' + sheet + ']' if sheet else ''}: {n} flags, screened in {dt * 1000:.1f} ms")
+    print(f"\n{len(flags)} flags written to {FLAGS_FILE.name}")
+    print(flags.groupby(['file', 'sheet', 'reason']).size().to_string())
+
+
+if __name__ == "__main__":
+    main()
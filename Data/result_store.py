@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 30 10:05:44 2026
+
+Chunked, compressed result store with named dimensions.
+
+Ensemble outputs (draw × sample × core arrays of the age ensembles, Monte
+Carlo runs and sensitivity sweeps) do not fit the flat layout of HgAR.xlsx.
+A store is a folder with a meta.json describing the dimensions (name ->
+coordinate labels) and the variables (dimensions, dtype, chunk shape,
+attributes), and one zlib-compressed file per chunk of each variable
+(<variable>/<i>.<j>....z), in the spirit of Zarr.
+
+Reading is lazy: open_variable() returns a LazyVariable whose isel()/sel()
+only decompress the chunks touched by the selection. Variables with a 'draw'
+dimension get a percentile summary (<variable>_pct, 'quantile' instead of
+'draw') written next to them, so figures read percentile bands without
+loading the draws. export_excel() writes these summaries as a thin Excel view.
+"""
+
+import itertools
+import shutil
+import warnings
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Metadata layout: 'dims' (name -> coordinate list), 'variables' (name -> dict
+# with dims, dtype, shape, chunks, attrs) and 'attrs'
+from store_meta import exists, read_meta, write_meta as _write_meta
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+QUANTILES = (2.5, 16, 50, 84, 97.5)
+DRAW_DIM = 'draw'
+DRAW_CHUNK = 256          # draws per chunk (other dimensions are not chunked by default)
+COMPRESSION_LEVEL = 3
+
+
+def _to_list(coords):
+    return [c.item() if isinstance(c, np.generic) else c for c in np.asarray(coords).tolist()]
+
+
+def create(path, dims, attrs=None, overwrite=False):
+    """
+    Create a store, or add dimensions to an existing one.
+
+    Parameters:
+    - path: folder of the store
+    - dims: dict dimension name -> coordinate labels (numbers or strings)
+    - attrs: optional dict merged into the store attributes
+    - overwrite: delete an existing store first, e.g. when a script is re-run
+      with other coordinates (otherwise conflicting coordinates raise ValueError)
+    """
+    path = Path(path)
+    if overwrite and exists(path):
+        shutil.rmtree(path)
+    if exists(path):
+        meta = read_meta(path)
+    else:
+        path.mkdir(parents=True, exist_ok=True)
+        meta = {'dims': {}, 'variables': {}, 'attrs': {}}
+    for name, coords in dims.items():
+        coords = _to_list(coords)
+        if name in meta['dims'] and meta['dims'][name] != coords:
+            raise ValueError(f"Dimension '{name}' already exists with other coordinates")
+        meta['dims'][name] = coords
+    meta['attrs'].update(attrs or {})
+    _write_meta(path, meta)
+
+
+def coords(path, dim):
+    """
+    Coordinate labels of a dimension as an array.
+    """
+    return np.asarray(read_meta(path)['dims'][dim])
+
+
+def default_chunks(dims, shape):
+    return [min(n, DRAW_CHUNK) if d == DRAW_DIM else n for d, n in zip(dims, shape)]
+
+
+def write_variable(path, name, data, dims, chunks=None, attrs=None, quantiles=QUANTILES):
+    """
+    Write (or overwrite) a variable chunk by chunk.
+
+    Parameters:
+    - path: folder of the store (created with create())
+    - name: variable name
+    - data: array whose axes follow dims
+    - dims: dimension names, all declared in the store
+    - chunks: chunk length per dimension (default: DRAW_CHUNK along 'draw',
+      whole length along the others)
+    - attrs: optional dict of variable attributes (units, ...)
+    - quantiles: percentiles written as <name>_pct when data has a 'draw'
+      dimension (None: no summary)
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    data = np.asarray(data)
+    dims = list(dims)
+    shape = [len(meta['dims'][d]) for d in dims]
+    if list(data.shape) != shape:
+        raise ValueError(f"Variable '{name}' has shape {data.shape}, dimensions {dims} give {tuple(shape)}")
+    chunks = default_chunks(dims, shape) if chunks is None else [min(c, n) for c, n in zip(chunks, shape)]
+
+    folder = path / name
+    folder.mkdir(exist_ok=True)
+    for old in folder.glob("*.z"):
+        old.unlink()
+    for idx in itertools.product(*(range(-(-n // c)) for n, c in zip(shape, chunks))):
+        block = data[tuple(slice(i * c, (i + 1) * c) for i, c in zip(idx, chunks))]
+        raw = np.ascontiguousarray(block, dtype=block.dtype.newbyteorder("<")).tobytes()
+        (folder / ('.'.join(map(str, idx)) + '.z')).write_bytes(zlib.compress(raw, COMPRESSION_LEVEL))
+
+    meta['variables'][name] = {'dims': dims, 'dtype': data.dtype.newbyteorder("<").str, 'shape': shape,
+                               'chunks': chunks, 'attrs': attrs or {}}
+    _write_meta(path, meta)
+
+    if quantiles and DRAW_DIM in dims:
+        axis = dims.index(DRAW_DIM)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)   # NaN padding
+            pct = np.moveaxis(np.nanpercentile(data, quantiles, axis=axis), 0, axis)
+        create(path, {'quantile': [float(q) for q in quantiles]})
+        pct_dims = dims[:axis] + ['quantile'] + dims[axis + 1:]
+        write_variable(path, f"{name}_pct", pct, pct_dims, attrs={**(attrs or {}), 'summary_of': name},
+                       quantiles=None)
+
+
+class LazyVariable:
+    """
+    Handle on a stored variable; data are only read by isel(), sel() or
+    values.
+    """
+
+    def __init__(self, path, name):
+        self.path = Path(path)
+        self.name = name
+        meta = read_meta(self.path)
+        v = meta['variables'][name]
+        self.dims = list(v['dims'])
+        self.shape = tuple(v['shape'])
+        self.chunks = tuple(v['chunks'])
+        self.dtype = np.dtype(v['dtype'])
+        self.attrs = v['attrs']
+        self.coords = {d: np.asarray(meta['dims'][d]) for d in self.dims}
+
+    def __repr__(self):
+        return f"<LazyVariable {self.name} ({', '.join(f'{d}: {n}' for d, n in zip(self.dims, self.shape))})>"
+
+    def _chunk(self, idx):
+        shape = [min(c, n - i * c) for i, c, n in zip(idx, self.chunks, self.shape)]
+        raw = zlib.decompress((self.path / self.name / ('.'.join(map(str, idx)) + '.z')).read_bytes())
+        return np.frombuffer(raw, dtype=self.dtype).reshape(shape)
+
+    def isel(self, **index):
+        """
+        Select by position along named dimensions (int, slice or list of
+        positions); dimensions given as int are dropped.
+
+        Only the chunks holding selected positions are decompressed.
+
+        Returns:
+        - array over the remaining dimensions
+        """
+        unknown = set(index) - set(self.dims)
+        if unknown:
+            raise KeyError(f"Unknown dimensions {sorted(unknown)} (variable has {self.dims})")
+        positions, squeeze = [], []
+        for axis, (d, n) in enumerate(zip(self.dims, self.shape)):
+            sel = index.get(d, slice(None))
+            if isinstance(sel, slice):
+                positions.append(np.arange(n)[sel])
+            else:
+                if np.ndim(sel) == 0:
+                    squeeze.append(axis)
+                positions.append(np.arange(n)[np.atleast_1d(sel)])
+
+        out = np.empty([len(p) for p in positions], dtype=self.dtype)
+        chunk_ids = [np.unique(p // c) for p, c in zip(positions, self.chunks)]
+        for idx in itertools.product(*chunk_ids):
+            out_pos, local = [], []
+            for p, i, c in zip(positions, idx, self.chunks):
+                hit = np.flatnonzero(p // c == i)
+                out_pos.append(hit)
+                local.append(p[hit] - i * c)
+            out[np.ix_(*out_pos)] = self._chunk(idx)[np.ix_(*local)]
+        return out.squeeze(axis=tuple(squeeze)) if squeeze else out
+
+    def positions(self, **labels):
+        """
+        Positions of coordinate labels (a label or a list of labels per
+        dimension; nearest coordinate for numbers), for isel().
+        """
+        index = {}
+        for d, lab in labels.items():
+            if d not in self.coords:
+                raise KeyError(f"Unknown dimension '{d}' (variable has {self.dims})")
+            c = self.coords[d]
+            pos = [int(np.flatnonzero(c == x)[0]) if c.dtype.kind in 'US' else int(np.argmin(np.abs(c - x)))
+                   for x in np.atleast_1d(lab)]
+            index[d] = pos[0] if np.ndim(lab) == 0 else pos
+        return index
+
+    def kept_dims(self, **index):
+        """
+        Dimensions left after isel(**index) or sel(**index).
+        """
+        return [d for d in self.dims if d not in index or isinstance(index[d], slice) or np.ndim(index[d]) > 0]
+
+    def sel(self, **labels):
+        """
+        Select by coordinate label (see positions()).
+        """
+        return self.isel(**self.positions(**labels))
+
+    @property
+    def values(self):
+        return self.isel()
+
+
+def open_variable(path, name):
+    return LazyVariable(path, name)
+
+
+def variables(path):
+    return list(read_meta(path)['variables'])
+
+
+def percentiles(path, name, q=QUANTILES, **labels):
+    """
+    Percentile bands of a variable along 'draw'.
+
+    The stored <name>_pct summary is used when it holds every requested
+    percentile; otherwise the draws are read block by block (one block per
+    chunk of the first non-draw dimension).
+
+    Parameters:
+    - path: folder of the store
+    - name: variable with a 'draw' dimension
+    - q: percentiles
+    - labels: optional selection on the other dimensions (see sel())
+
+    Returns:
+    - array with one leading entry per percentile in q
+    """
+    meta = read_meta(path)
+    if f"{name}_pct" in meta['variables'] and all(float(x) in meta['dims']['quantile'] for x in q):
+        v = open_variable(path, f"{name}_pct")
+        out = v.sel(quantile=[float(x) for x in q], **labels)
+        return np.moveaxis(out, v.kept_dims(**labels).index('quantile'), 0)
+
+    v = open_variable(path, name)
+    if DRAW_DIM not in v.dims:
+        raise ValueError(f"Variable '{name}' has no '{DRAW_DIM}' dimension")
+    index = v.positions(**labels)
+    kept = v.kept_dims(**index)
+    rest = [d for d in kept if d != DRAW_DIM]
+    if not rest:
+        return np.nanpercentile(v.isel(**index), q, axis=0)
+
+    block_dim = rest[0]
+    axis = v.dims.index(block_dim)
+    pos = np.arange(v.shape[axis])[index.get(block_dim, slice(None))]
+    parts = []
+    for start in range(0, len(pos), v.chunks[axis]):
+        data = v.isel(**{**index, block_dim: pos[start:start + v.chunks[axis]]})
+        parts.append(np.nanpercentile(data, q, axis=kept.index(DRAW_DIM)))
+    return np.concatenate(parts, axis=1 + rest.index(block_dim))
+
+
+def to_frame(path, name, **labels):
+    """
+    Long table of a variable (one column per dimension plus the value).
+    """
+    v = open_variable(path, name)
+    index = v.positions(**labels)
+    data = v.isel(**index)
+    kept = v.kept_dims(**index)
+    grids = np.meshgrid(*(v.coords[d][index.get(d, slice(None))] for d in kept), indexing='ij')
+    df = pd.DataFrame({d: g.ravel() for d, g in zip(kept, grids)})
+    df[name] = data.ravel()
+    return df
+
+
+def sheet_names(names, limit=31):
+    """
+    Unique Excel sheet names for variables: names longer than the 31
+    characters Excel allows are cut, and a name that would collide with an
+    earlier one (Excel compares them case-insensitively) gets a '~<i>' suffix.
+
+    Returns:
+    - dict variable name -> sheet name
+    """
+    out, used = {}, set()
+    for name in names:
+        sheet, i = name[:limit], 1
+        while sheet.lower() in used:
+            suffix = f"~{i}"
+            sheet, i = name[:limit - len(suffix)] + suffix, i + 1
+        used.add(sheet.lower())
+        out[name] = sheet
+    return out
+
+
+def export_excel(path, xlsx_path, names=None):
+    """
+    Thin Excel view of a store: one sheet per variable, percentile summaries
+    in place of the draws (quantiles as columns).
+
+    Parameters:
+    - path: folder of the store
+    - xlsx_path: output Excel file
+    - names: variables to export (default: every variable without 'draw')
+    """
+    meta = read_meta(path)
+    if names is None:
+        names = [n for n, v in meta['variables'].items() if DRAW_DIM not in v['dims']]
+    sheets = sheet_names(names)
+    with pd.ExcelWriter(xlsx_path) as writer:
+        for name in names:
+            df = to_frame(path, name)
+            if 'quantile' in df:
+                index = [d for d in meta['variables'][name]['dims'] if d != 'quantile']
+                df = df.pivot_table(index=index, columns='quantile', values=name, sort=False) if index \
+                    else df.set_index('quantile').T
+                df.columns = [f"p{q:g}" for q in df.columns]
+                df = df.reset_index(drop=not index)
+            df.to_excel(writer, sheet_name=sheets[name], index=False)
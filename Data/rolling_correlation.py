@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov  3 09:14:52 2026
+
+Moving-window correlation between Hg and every proxy along the age axis.
+
+corr_matrix_*.py gives one correlation per core and
+compute_correlations_by_period (erosion.py) splits the record at 1970. Here
+the Pearson correlation of Hg with every proxy column is computed in a window
+of fixed duration (e.g. 10 years) centred on every scan position, at the full
+XRF resolution: Hg and LOI are interpolated in depth onto the scan positions
+and the window sums of x, y, x², y² and xy come from cumulative sums, so
+each window costs O(1) and all columns are done in one array pass.
+
+Neighbouring scan points are strongly autocorrelated (and Hg is interpolated
+between slices), so significance uses an effective sample size
+n_eff = n (1 - r1x r1y) / (1 + r1x r1y) (Bretherton et al., 1999), with the
+lag-1 autocorrelations r1 of both series in the window, also from
+cumulative sums of the products of consecutive values.
+
+Results are written to the result store (results/rolling_correlation_<core>,
+see result_store.py).
+
+Usage:
+    python rolling_correlation.py [<window_years>]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+import result_store
+from proxy_qc import AGE_COLUMNS, DEPTH_COLUMNS, read_screened
+
+DATA_DIR = Path(__file__).resolve().parent
+
+WINDOW_YEARS = 10.0
+MIN_POINTS = 10          # valid pairs needed in a window
+ALPHA = 0.05
+
+
+def load_core(core, data_dir=DATA_DIR, target='Hg'):
+    """
+    Scan-resolution table of a core: age, the target series (Hg concentration
+    or HgAR interpolated in depth between slices) and every CLR proxy plus LOI
+    (interpolated likewise). QC flags of proxy_qc are applied.
+
+    Returns:
+    - DataFrame sorted by increasing age, columns age, target, proxies...
+    """
+    data_dir = Path(data_dir)
+    xrf = read_screened(data_dir / "X_ray.xlsx", sheet_name=core)
+    hg = read_screened(data_dir / "Hg.xlsx", usecols=[f"Depth_{core}", f"Hg_conc_{core}"])
+    loi = read_screened(data_dir / "LOI.xlsx", usecols=[f"LOI_550_{core}", f"LOI_950_{core}"])
+    slices = pd.concat([hg, loi], axis=1).dropna(subset=[f"Depth_{core}"])
+    if target == 'HgAR':
+        hgar = read_screened(data_dir / "HgAR.xlsx", usecols=[f"Hg_AR_{core}"])
+        slices[f"Hg_AR_{core}"] = hgar[f"Hg_AR_{core}"]
+    slices = slices.sort_values(f"Depth_{core}")
+    depth = slices[f"Depth_{core}"].to_numpy(dtype=float)
+
+    def at_scan(col):
+        # Linear in sediment depth, NaN outside the sampled interval
+        ok = slices[col].notna().to_numpy()
+        return np.interp(xrf[DEPTH_COLUMNS[core]].to_numpy(dtype=float), depth[ok], slices.loc[ok, col],
+                         left=np.nan, right=np.nan)
+
+    out = pd.DataFrame({'age': xrf[AGE_COLUMNS[core]].to_numpy(dtype=float)})
+    out[target] = at_scan(f"Hg_AR_{core}" if target == 'HgAR' else f"Hg_conc_{core}")
+    for c in [c for c in xrf.columns if c.startswith('CLR_')]:
+        out[c] = xrf[c].to_numpy(dtype=float)
+    out['LOI_550'] = at_scan(f"LOI_550_{core}")
+    out['LOI_950'] = at_scan(f"LOI_950_{core}")
+    return out.dropna(subset=['age']).sort_values('age').reset_index(drop=True)
+
+
+def _window_sum(C, lo, hi):
+    # Sum of rows lo..hi-1 from a cumulative sum with a leading zero row
+    return C[hi] - C[lo]
+
+
+def _cumsum0(A):
+    return np.concatenate([np.zeros((1,) + A.shape[1:]), np.cumsum(A, axis=0)])
+
+
+def rolling_correlation(age, y, X, window=WINDOW_YEARS, centers=None, min_points=MIN_POINTS):
+    """
+    Pearson correlation of y with every column of X in age windows.
+
+    Parameters:
+    - age: vector (n,) of increasing ages
+    - y: vector (n,) of the target (NaN allowed)
+    - X: array (n, p) of proxies (NaN allowed)
+    - window: window length [years], centred on each centre
+    - centers: window centres (default: every age)
+    - min_points: valid pairs needed for a result
+
+    Returns:
+    - dict with 'center' (m,), 'r', 'n', 'n_eff', 'p' (m, p)
+    """
+    age = np.asarray(age, dtype=float)
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)[:, None]
+    centers = age if centers is None else np.asarray(centers, dtype=float)
+    lo = np.searchsorted(age, centers - window / 2, side='left')
+    hi = np.searchsorted(age, centers + window / 2, side='right')
+
+    # Pairwise validity and centring by the global means (less cancellation in the sums)
+    w = (np.isfinite(X) & np.isfinite(y)).astype(float)
+    x = np.where(w > 0, X - np.nanmean(X, axis=0), 0.0)
+    yy = np.where(w > 0, y - np.nanmean(y), 0.0)
+
+    n = _window_sum(_cumsum0(w), lo, hi)
+    sx, sy = _window_sum(_cumsum0(x), lo, hi), _window_sum(_cumsum0(yy), lo, hi)
+    sxx, syy = _window_sum(_cumsum0(x * x), lo, hi), _window_sum(_cumsum0(yy * yy), lo, hi)
+    sxy = _window_sum(_cumsum0(x * yy), lo, hi)
+
+    # Lag-1 sums over consecutive valid pairs (t, t+1) inside the window
+    w1 = w[:-1] * w[1:]
+    m = _window_sum(_cumsum0(w1), lo, np.maximum(hi - 1, lo))
+
+    def lag1(v):
+        a, b = v[:-1] * w1, v[1:] * w1
+        pa, pb = _window_sum(_cumsum0(a), lo, np.maximum(hi - 1, lo)), \
+            _window_sum(_cumsum0(b), lo, np.maximum(hi - 1, lo))
+        pab = _window_sum(_cumsum0(a * v[1:]), lo, np.maximum(hi - 1, lo))
+        return pa, pb, pab
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mx, my = sx / n, sy / n
+        vx, vy = sxx - n * mx ** 2, syy - n * my ** 2
+        r = (sxy - n * mx * my) / np.sqrt(vx * vy)
+
+        ax_, bx_, abx = lag1(x)
+        ay_, by_, aby = lag1(np.broadcast_to(yy, x.shape))
+        r1x = (abx - mx * (ax_ + bx_) + m * mx ** 2) / vx
+        r1y = (aby - my * (ay_ + by_) + m * my ** 2) / vy
+        rho = np.clip(r1x * r1y, -0.99, 0.99)
+        n_eff = np.clip(n * (1 - rho) / (1 + rho), 2, n)
+
+        t = r * np.sqrt((n_eff - 2) / (1 - r ** 2))
+        p = 2 * stats.t.sf(np.abs(t), np.maximum(n_eff - 2, 1))
+
+    bad = n < min_points
+    r[bad] = p[bad] = n_eff[bad] = np.nan
+    return {'center': centers, 'r': r, 'n': n, 'n_eff': n_eff, 'p': p}
+
+
+def naive_rolling_correlation(age, y, X, window=WINDOW_YEARS, min_points=MIN_POINTS):
+    """
+    Window-by-window correlation (reference for rolling_correlation).
+    """
+    r = np.full(X.shape, np.nan)
+    for i, c in enumerate(age):
+        sel = (age >= c - window / 2) & (age <= c + window / 2)
+        for j in range(X.shape[1]):
+            ok = sel & np.isfinite(X[:, j]) & np.isfinite(y)
+            if ok.sum() >= min_points:
+                r[i, j] = np.corrcoef(X[ok, j], y[ok])[0, 1]
+    return r
+
+
+def run_core(core, window=WINDOW_YEARS, target='Hg', data_dir=DATA_DIR):
+    """
+    Rolling correlations of a core, written to results/rolling_correlation_<core>.
+
+    Returns:
+    - result dict (see rolling_correlation) with 'proxies', and the store path
+    """
+    df = load_core(core, data_dir, target)
+    proxies = [c for c in df.columns if c not in ('age', target)]
+    res = rolling_correlation(df['age'].to_numpy(), df[target].to_numpy(), df[proxies].to_numpy(), window)
+    res['proxies'] = proxies
+
+    path = result_store.RESULTS_DIR / f"rolling_correlation_{core}"
+    result_store.create(path, {'age': res['center'], 'proxy': proxies},
+                        attrs={'core': core, 'target': target, 'window_years': window})
+    for k in ('r', 'n', 'n_eff', 'p'):
+        result_store.write_variable(path, k, res[k], ['age', 'proxy'])
+    return res, path
+
+
+def main():
+    window = float(sys.argv[1]) if len(sys.argv) > 1 else WINDOW_YEARS
+    for core in AGE_COLUMNS:
+        df = load_core(core)
+        proxies = [c for c in df.columns if c not in ('age', 'Hg')]
+        t0 = time.perf_counter()
+        res = rolling_correlation(df['age'].to_numpy(), df['Hg'].to_numpy(), df[proxies].to_numpy(), window)
+        dt = time.perf_counter() - t0
+        print(f"{core}: {len(df)} scan points × {len(proxies)} proxies, {window:g}-yr windows in {dt * 1000:.1f} ms")
+
+        res, path = run_core(core, window)
+        sig = res['p'] < ALPHA
+        for name in ('CLR_Ti', 'CLR_Fe', 'CLR_Zr', 'LOI_550'):
+            if name not in proxies:
+                continue
+            j = proxies.index(name)
+            r = pd.Series(res['r'][:, j], index=res['center'])
+            print(f"  Hg–{name}: r before 1970 (median) {r[r.index < 1970].median():.2f}, "
+                  f"after {r[r.index >= 1970].median():.2f}; "
+                  f"significant (n_eff) in {np.nanmean(sig[:, j]) * 100:.0f}% of windows")
+        print(f"  saved to {path.relative_to(DATA_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
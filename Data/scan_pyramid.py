@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Nov  5 09:42:18 2026
+
+Multi-resolution min/max/mean pyramids of long scans, cached on disk.
+
+A pyramid holds, for every variable of a series sampled along one axis (XRF
+scan depth, FT-IR wavenumber), level 0 = the samples themselves and coarser
+levels where every bucket merges FACTOR buckets of the level below, with
+their minimum, maximum, mean and number of valid samples. The bucket
+boundaries depend only on the axis, so they are stored once per level and
+shared by all variables. query() returns, for any axis range, the finest
+level that fits a number of points (e.g. the pixel width of a plot), so a
+viewer draws at most a few thousand buckets whatever the zoom, and the
+min/max envelope keeps the spikes that decimation or rolling means (figure_3)
+would hide.
+
+A pyramid is a folder (PYRAMID_DIR/<name>.pyr/) with one .npy file per level
+and variable (read back as memory maps) and a meta.json written last; it is
+rebuilt when a source file is newer (for the XRF scans, X_ray.xlsx or the QC
+flag tables).
+
+Usage:
+    python scan_pyramid.py [<core> ...]     (builds the XRF and FT-IR pyramids)
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from proxy_qc import DEPTH_COLUMNS, FLAGS_NAME, MANUAL_FLAGS_NAME, read_screened
+# Metadata layout: 'axis', 'variables', 'levels' (number of buckets per level),
+# 'factor' and 'attrs'
+from store_meta import exists, read_meta, write_meta as _write_meta
+
+DATA_DIR = Path(__file__).resolve().parent
+PYRAMID_DIR = DATA_DIR / "pyramids"
+
+FACTOR = 4            # buckets of a level merged into one bucket of the next
+MIN_BUCKETS = 64      # no level coarser than this
+
+BUCKET_DTYPE = np.dtype([('min', 'f4'), ('max', 'f4'), ('mean', 'f4'), ('n', 'i4')])
+
+# Variables of the X_ray.xlsx sheets (drawn along the sediment depth, proxy_qc.DEPTH_COLUMNS)
+XRF_PREFIXES = ('CLR_',)
+XRF_SUFFIXES = ('.Area',)
+
+
+def newest_mtime(sources):
+    """
+    Latest modification time of the existing files among sources.
+    """
+    return max((Path(p).stat().st_mtime for p in sources if Path(p).exists()), default=0.0)
+
+
+def is_stale(path, sources):
+    """
+    True when the pyramid is missing or older than one of its source files
+    (a path or a list of paths).
+    """
+    sources = [sources] if isinstance(sources, (str, Path)) else sources
+    return not exists(path) or read_meta(path)['attrs'].get('source_mtime', 0) < newest_mtime(sources)
+
+
+def _file_name(name):
+    # Variable names like 'Fe.Ka.Area' or 'EYC23-12' as safe folder names
+    return "".join(c if c.isalnum() or c in '-_' else '_' for c in name)
+
+
+def _merge_axis(x0, x1, factor):
+    # Bucket boundaries of the next level
+    idx = np.arange(0, len(x0), factor)
+    return x0[idx], np.maximum.reduceat(x1, idx)
+
+
+def _merge(b, factor):
+    # Next-level buckets: NaN-ignoring min/max, count-weighted mean
+    idx = np.arange(0, len(b), factor)
+    n = np.add.reduceat(b['n'], idx)
+    total = np.add.reduceat(np.where(b['n'] > 0, b['mean'].astype(float) * b['n'], 0.0), idx)
+    out = np.empty(len(idx), BUCKET_DTYPE)
+    out['min'] = np.fmin.reduceat(b['min'], idx)
+    out['max'] = np.fmax.reduceat(b['max'], idx)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out['mean'] = np.where(n > 0, total / n, np.nan)
+    out['n'] = n
+    return out
+
+
+def _save(path, array):
+    tmp = path.with_name(path.name + ".tmp.npy")
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def build_pyramid(path, x, data, axis='x', factor=FACTOR, min_buckets=MIN_BUCKETS, attrs=None):
+    """
+    Build (or rebuild) the pyramid of a series.
+
+    Parameters:
+    - path: folder of the pyramid
+    - x: vector of axis positions (NaN positions are dropped, sorted if needed)
+    - data: dict variable name -> vector (NaN allowed)
+    - axis: name of the axis (e.g. 'depth_mm', 'wavenumber')
+    - factor: buckets merged per level
+    - min_buckets: size under which no coarser level is built
+    - attrs: optional dict stored in the metadata
+
+    Returns:
+    - metadata dict
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    x = np.asarray(x, dtype=float)
+    keep = np.isfinite(x)
+    order = np.argsort(x[keep], kind='stable')
+    x = x[keep][order]
+
+    # Axis of every level
+    x0, x1, levels = x, x, []
+    while True:
+        _save(path / f"L{len(levels)}_x.npy", np.column_stack([x0, x1]))
+        levels.append(len(x0))
+        if len(x0) <= max(min_buckets, 1) * factor:
+            break
+        x0, x1 = _merge_axis(x0, x1, factor)
+
+    files = {}
+    for name, y in data.items():
+        y = np.asarray(y, dtype=np.float32)[keep][order]
+        b = np.empty(len(y), BUCKET_DTYPE)
+        b['min'] = b['max'] = b['mean'] = y
+        b['n'] = np.isfinite(y)
+        folder = path / _file_name(name)
+        folder.mkdir(exist_ok=True)
+        for k in range(len(levels)):
+            if k:
+                b = _merge(b, factor)
+            _save(folder / f"L{k}.npy", b)
+        files[name] = folder.name
+
+    meta = {'axis': axis, 'variables': files, 'levels': levels, 'factor': factor, 'attrs': attrs or {}}
+    _write_meta(path, meta)
+    return meta
+
+
+def variables(path):
+    return list(read_meta(path)['variables'])
+
+
+def level_for(meta, lo, hi, max_points, path):
+    """
+    Finest level with at most max_points buckets in [lo, hi].
+
+    Returns:
+    - level number, index range (i0, i1) of its buckets
+    """
+    for k in range(len(meta['levels'])):
+        x = np.load(Path(path) / f"L{k}_x.npy", mmap_mode='r')
+        i0 = max(int(np.searchsorted(x[:, 1], lo, side='left')) - 1, 0)
+        i1 = min(int(np.searchsorted(x[:, 0], hi, side='right')) + 1, len(x))
+        if i1 - i0 <= max_points or k == len(meta['levels']) - 1:
+            return k, (i0, i1)
+
+
+def query(path, name, lo=-np.inf, hi=np.inf, max_points=2000, meta=None):
+    """
+    Buckets of a variable covering [lo, hi] at the finest level that fits.
+
+    One bucket is kept on each side of the range so that lines reach the
+    edges of a plot.
+
+    Parameters:
+    - path: folder of the pyramid
+    - name: variable
+    - lo, hi: axis range
+    - max_points: maximum number of buckets returned
+    - meta: metadata (read_meta), to avoid re-reading it on every query
+
+    Returns:
+    - dict with 'level', 'x0', 'x1', 'x' (bucket centre), 'min', 'max',
+      'mean', 'n' (vectors)
+    """
+    path = Path(path)
+    meta = meta or read_meta(path)
+    k, (i0, i1) = level_for(meta, lo, hi, max_points, path)
+    x = np.load(path / f"L{k}_x.npy", mmap_mode='r')[i0:i1]
+    b = np.load(path / meta['variables'][name] / f"L{k}.npy", mmap_mode='r')[i0:i1]
+    return {'level': k, 'x0': x[:, 0], 'x1': x[:, 1], 'x': x.mean(axis=1),
+            'min': b['min'], 'max': b['max'], 'mean': b['mean'], 'n': b['n']}
+
+
+def xrf_pyramid(core, data_dir=DATA_DIR, pyramid_dir=PYRAMID_DIR, force=False):
+    """
+    Pyramid of the XRF scan of a core (X_ray.xlsx sheet, QC flags applied):
+    CLR and element area columns along the sediment depth [mm].
+
+    The pyramid is stale when X_ray.xlsx or the QC flag tables (computed and
+    manual) are newer than it.
+
+    Returns:
+    - folder of the pyramid (built only when missing or stale)
+    """
+    data_dir = Path(data_dir)
+    source = data_dir / "X_ray.xlsx"
+    sources = [source, data_dir / FLAGS_NAME, data_dir / MANUAL_FLAGS_NAME]
+    path = Path(pyramid_dir) / f"{core}_xrf.pyr"
+    if force or is_stale(path, sources):
+        df = read_screened(source, sheet_name=core)
+        cols = [c for c in df.columns if c.startswith(XRF_PREFIXES) or c.endswith(XRF_SUFFIXES)]
+        build_pyramid(path, df[DEPTH_COLUMNS[core]], {c: df[c] for c in cols}, axis='depth_mm',
+                      attrs={'core': core, 'source': source.name, 'source_mtime': newest_mtime(sources)})
+    return path
+
+
+def ftir_pyramid(core, data_dir=DATA_DIR, pyramid_dir=PYRAMID_DIR, force=False):
+    """
+    Pyramid of the FT-IR spectra of a core (FT-IR_ATR/<core>/input_<core>.csv):
+    one variable per spectrum along the wavenumber axis.
+
+    Returns:
+    - folder of the pyramid (built only when missing or stale)
+    """
+    from ftir_bands import load_spectra
+
+    source = Path(data_dir) / "FT-IR_ATR" / core / f"input_{core}.csv"
+    path = Path(pyramid_dir) / f"{core}_ftir.pyr"
+    if force or is_stale(path, source):
+        wn, names, S = load_spectra(source)
+        build_pyramid(path, wn, dict(zip(names, S)), axis='wavenumber',
+                      attrs={'core': core, 'source': str(source.relative_to(data_dir)),
+                             'source_mtime': source.stat().st_mtime})
+    return path
+
+
+def main():
+    cores = sys.argv[1:] or ['EYC', 'GDL']
+    for core in cores:
+        for build in (xrf_pyramid, ftir_pyramid):
+            t0 = time.perf_counter()
+            path = build(core, force=True)
+            meta = read_meta(path)
+            print(f"{path.name}: {len(meta['variables'])} variables, levels {meta['levels']} "
+                  f"built in {time.perf_counter() - t0:.2f} s")
+
+    # Query time on a long synthetic scan (10 m at 0.2 mm)
+    rng = np.random.default_rng(0)
+    x = np.arange(0, 10_000, 0.2)
+    path = PYRAMID_DIR / "synthetic.pyr"
+    build_pyramid(path, x, {'signal': np.cumsum(rng.standard_normal(x.size))}, axis='depth_mm')
+    meta = read_meta(path)
+    print(f"\nSynthetic scan, {x.size} points, levels {meta['levels']}")
+    for lo, hi in [(0, 10_000), (4000, 5000), (4500, 4510)]:
+        t0 = time.perf_counter()
+        q = query(path, 'signal', lo, hi, max_points=1500, meta=meta)
+        dt = time.perf_counter() - t0
+        print(f"  {lo}-{hi} mm: level {q['level']}, {len(q['x'])} buckets in {dt * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
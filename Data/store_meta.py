@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Nov 18 09:12:05 2026
+
+meta.json handling shared by the folder stores (columnar_store.py,
+result_store.py, scan_pyramid.py).
+
+Each store is a folder whose meta.json describes its content. The file is
+written last and replaced atomically, so a store is either complete or
+absent as seen by exists(), and an interrupted write never leaves a half
+written meta.json.
+"""
+
+import json
+import os
+from pathlib import Path
+
+META_FILE = "meta.json"
+
+
+def read_meta(path):
+    """
+    Read the metadata of a store (a dict, layout defined by each store).
+    """
+    with open(Path(path) / META_FILE) as f:
+        return json.load(f)
+
+
+def write_meta(path, meta):
+    # Write to a temporary file first so that meta.json is never half written
+    tmp = Path(path) / (META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, Path(path) / META_FILE)
+
+
+def exists(path):
+    return (Path(path) / META_FILE).exists()
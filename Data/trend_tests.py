@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov 10 10:05:12 2026
+
+Mann-Kendall trend tests and Sen's slopes of the Hg, HgAR and XRF proxy
+records in sliding and fixed age windows.
+
+For a series sorted by age, the Mann-Kendall statistic of a window is the sum
+of sign(y_j - y_i) over its pairs i < j. The signs of all pairs are computed
+once per series, as an array in age order, and their 2-D cumulative sum gives
+S for any contiguous window in O(1). All the windows of a series (sliding
+windows of WINDOW_YEARS every STEP_YEARS and the PERIODS of the figures) are
+evaluated in one pass. The same holds for the lag-1 autocorrelation of the
+Sen-detrended series, from cumulative sums of y, t and their lagged products.
+Sen's slope is the median of the pairwise slopes of the window, taken from
+the pair array as well.
+
+Serial correlation inflates the significance of the plain test, so Var(S) is
+scaled by n/n* (Yue and Wang, 2004), with n/n* = 1 + 2 Σ (1 - k/n) r1^k for
+the lag-1 autocorrelation r1 of the detrended window (AR(1)). Ties in y are
+not corrected for, because the records are continuous measurements.
+
+annotation() turns a row into the text used by the figures (figure_engine.py).
+
+Usage:
+    python trend_tests.py [<window_years>]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from change_points import load_series
+
+DATA_DIR = Path(__file__).resolve().parent
+OUTPUT_PATH = DATA_DIR / "results" / "trend_tests.csv"
+
+WINDOW_YEARS = 30.0
+STEP_YEARS = 5.0
+MIN_POINTS = 8
+ALPHA = 0.05
+PAIR_LIMIT = 4000      # above this series length the pair arrays are built per window
+
+# Fixed periods of the figures
+PERIODS = {'1900-1940': (1900, 1940), '1940-1970': (1940, 1970), 'since 1970': (1970, np.inf)}
+
+UNITS = {'Hg': 'ng g$^{-1}$', 'HgAR': r'$\mu$g m$^{-2}$ y$^{-1}$'}
+
+
+def windows_for(age, window=WINDOW_YEARS, step=STEP_YEARS, periods=PERIODS):
+    """
+    Sliding windows over the age span and the fixed periods.
+
+    Returns:
+    - DataFrame with label, start, end
+    """
+    starts = np.arange(np.floor(age.min() / step) * step, age.max() - window + step, step)
+    rows = [{'label': 'sliding', 'start': s, 'end': s + window} for s in starts]
+    rows += [{'label': name, 'start': lo, 'end': hi} for name, (lo, hi) in periods.items()]
+    return pd.DataFrame(rows)
+
+
+def _cumsum2d(A):
+    # 2-D cumulative sum with a leading row and column of zeros
+    C = np.zeros((A.shape[0] + 1, A.shape[1] + 1))
+    C[1:, 1:] = A.cumsum(0).cumsum(1)
+    return C
+
+
+def _cumsum0(v):
+    return np.concatenate([[0.0], np.cumsum(v)])
+
+
+def _lag1_sums(t, y):
+    # Cumulative sums of the products of consecutive samples (leading zero)
+    c = _cumsum0
+    return {'yy1': c(y[:-1] * y[1:]), 'ty1': c(t[:-1] * y[1:] + y[:-1] * t[1:]), 'tt1': c(t[:-1] * t[1:]),
+            'y0': c(y[:-1]), 'y1': c(y[1:]), 't0': c(t[:-1]), 't1': c(t[1:])}
+
+
+def variance_ratio(r1, n):
+    """
+    n/n* of Yue and Wang (2004) for AR(1) autocorrelation r1 in windows of n points.
+    """
+    k = np.arange(1, int(np.max(n)))
+    w = np.clip(1 - k / n[:, None], 0, None)
+    return 1 + 2 * np.sum(w * np.power(r1[:, None], k), axis=1)
+
+
+def mann_kendall(age, y, windows, min_points=MIN_POINTS):
+    """
+    Mann-Kendall test and Sen's slope of one series in every window.
+
+    Parameters:
+    - age: vector of increasing ages
+    - y: vector of values
+    - windows: DataFrame with start and end ages (windows_for)
+    - min_points: samples needed in a window
+
+    Returns:
+    - DataFrame (one row per window): n, S, tau, sen_slope [units / year],
+      r1, var_ratio, z, p (autocorrelation-corrected), p_raw
+    """
+    age, y = np.asarray(age, dtype=float), np.asarray(y, dtype=float)
+    a = np.searchsorted(age, windows['start'].to_numpy(), side='left')
+    b = np.searchsorted(age, windows['end'].to_numpy(), side='right')
+    n = (b - a).astype(float)
+    ok = n >= min_points
+
+    # S of every window from the signed pairs, and Sen's slopes
+    S = np.full(len(a), np.nan)
+    sen = np.full(len(a), np.nan)
+    if len(age) <= PAIR_LIMIT:
+        dt = age[None, :] - age[:, None]
+        sign = np.triu(np.sign(y[None, :] - y[:, None]) * np.sign(dt), 1)
+        C = _cumsum2d(sign)
+        S[ok] = C[b[ok], b[ok]] - C[a[ok], b[ok]] - C[b[ok], a[ok]] + C[a[ok], a[ok]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (y[None, :] - y[:, None]) / dt
+    for w in np.flatnonzero(ok):
+        i, j = np.triu_indices(b[w] - a[w], 1)
+        if len(age) <= PAIR_LIMIT:
+            s = slope[a[w] + i, a[w] + j]
+        else:
+            ta, ya = age[a[w]:b[w]], y[a[w]:b[w]]
+            S[w] = np.sum(np.sign(ya[j] - ya[i]) * np.sign(ta[j] - ta[i]))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                s = (ya[j] - ya[i]) / (ta[j] - ta[i])
+        sen[w] = np.median(s[np.isfinite(s)])
+
+    # Lag-1 autocorrelation of x = y - sen·t in every window, from cumulative sums
+    t = age - age.mean()
+    c = _cumsum0
+    Sy, St, Syy, Stt, Sty = c(y), c(t), c(y * y), c(t * t), c(t * y)
+    L = _lag1_sums(t, y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bb = np.nan_to_num(sen)
+        sx = (Sy[b] - Sy[a]) - bb * (St[b] - St[a])
+        sxx = (Syy[b] - Syy[a]) - 2 * bb * (Sty[b] - Sty[a]) + bb ** 2 * (Stt[b] - Stt[a])
+        bl = np.maximum(b - 1, a)
+        sx0 = (L['y0'][bl] - L['y0'][a]) - bb * (L['t0'][bl] - L['t0'][a])
+        sx1 = (L['y1'][bl] - L['y1'][a]) - bb * (L['t1'][bl] - L['t1'][a])
+        sxx1 = (L['yy1'][bl] - L['yy1'][a]) - bb * (L['ty1'][bl] - L['ty1'][a]) \
+            + bb ** 2 * (L['tt1'][bl] - L['tt1'][a])
+        mean = sx / n
+        r1 = (sxx1 - mean * (sx0 + sx1) + (n - 1) * mean ** 2) / (sxx - n * mean ** 2)
+    r1 = np.clip(np.nan_to_num(r1), -0.99, 0.99)
+
+    var_s = n * (n - 1) * (2 * n + 5) / 18
+    # Only significant positive autocorrelation is corrected for (Yue and Wang, 2004)
+    significant = r1 > stats.norm.ppf(1 - ALPHA / 2) / np.sqrt(np.maximum(n, 1))
+    ratio = np.where(significant & ok, variance_ratio(np.where(ok, r1, 0), np.maximum(n, 2)), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(S > 0, S - 1, np.where(S < 0, S + 1, 0)) / np.sqrt(var_s * ratio)
+        z_raw = np.where(S > 0, S - 1, np.where(S < 0, S + 1, 0)) / np.sqrt(var_s)
+        tau = S / (n * (n - 1) / 2)
+    out = pd.DataFrame({'n': n.astype(int), 'S': S, 'tau': tau, 'sen_slope': sen, 'r1': r1,
+                        'var_ratio': ratio, 'z': z, 'p': 2 * stats.norm.sf(np.abs(z)),
+                        'p_raw': 2 * stats.norm.sf(np.abs(z_raw))})
+    out.loc[~ok, ['S', 'tau', 'sen_slope', 'r1', 'var_ratio', 'z', 'p', 'p_raw']] = np.nan
+    return out
+
+
+def naive_mann_kendall(age, y):
+    """
+    Direct Mann-Kendall S and Sen's slope of one window (reference).
+    """
+    S, slopes = 0, []
+    for i in range(len(y)):
+        for j in range(i + 1, len(y)):
+            S += np.sign(y[j] - y[i]) * np.sign(age[j] - age[i])
+            if age[j] != age[i]:
+                slopes.append((y[j] - y[i]) / (age[j] - age[i]))
+    return S, np.median(slopes)
+
+
+def trend_table(series=None, window=WINDOW_YEARS, step=STEP_YEARS, periods=PERIODS, alpha=ALPHA):
+    """
+    Trend tests of every series in every window.
+
+    Parameters:
+    - series: dict (core, variable) -> (age, values) (default: change_points.load_series())
+
+    Returns:
+    - DataFrame with core, variable, label, start, end, the columns of
+      mann_kendall() and trend ('increasing', 'decreasing' or 'none')
+    """
+    series = load_series() if series is None else series
+    frames = []
+    for (core, var), (age, y) in series.items():
+        w = windows_for(age, window, step, periods)
+        df = pd.concat([w, mann_kendall(age, y, w)], axis=1)
+        df.insert(0, 'variable', var)
+        df.insert(0, 'core', core)
+        frames.append(df)
+    out = pd.concat(frames, ignore_index=True)
+    out['trend'] = np.where(out['p'] < alpha, np.where(out['S'] > 0, 'increasing', 'decreasing'), 'none')
+    return out
+
+
+def annotation(results, core, variable, label='since 1970'):
+    """
+    Short text of a trend for a figure panel, e.g.
+    'since 1970: +1.2 µg m⁻² y⁻¹ per decade (p = 0.01)'.
+    """
+    row = results[(results['core'] == core) & (results['variable'] == variable)
+                  & (results['label'] == label)].iloc[0]
+    if not np.isfinite(row['sen_slope']):
+        return f"{label}: n = {row['n']}"
+    unit = UNITS.get(variable, '')
+    p = f"p = {row['p']:.2f}" if row['p'] >= 0.01 else "p < 0.01"
+    return f"{label}: {row['sen_slope'] * 10:+.2g} {unit} per decade ({p})"
+
+
+def main():
+    window = float(sys.argv[1]) if len(sys.argv) > 1 else WINDOW_YEARS
+    series = load_series()
+    t0 = time.perf_counter()
+    results = trend_table(series, window)
+    dt = time.perf_counter() - t0
+    n_windows = results['n'].gt(0).sum()
+    print(f"{len(series)} series, {len(results)} windows ({n_windows} non-empty) in {dt:.2f} s\n")
+
+    fixed = results[results['label'] != 'sliding']
+    print(fixed[['core', 'variable', 'label', 'n', 'tau', 'sen_slope', 'var_ratio', 'p_raw', 'p', 'trend']]
+          .round(3).to_string(index=False))
+    print()
+    for core in ('EYC', 'GDL'):
+        print(f"{core} HgAR, {annotation(results, core, 'HgAR')}")
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(OUTPUT_PATH, index=False)
+    print(f"\nSaved to {OUTPUT_PATH.relative_to(DATA_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  2 09:38:21 2026
+
+Small-multiples atlas of downcore Hg profiles for any number of cores.
+
+Figure_2.py and figure_depth.py build one panel per core with twiny axes. Here
+all panels live in a single axes: every core gets a cell of a grid, its
+profiles are mapped into the cell, and the whole atlas is drawn with a fixed
+number of collections (one PolyCollection per error band, one LineCollection
+per profile type, one for the panel frames and one for the grid lines),
+whatever the number of cores. Tick values are computed once per scale and
+shared by all panels (labels on the outer panels only), so the render time
+grows linearly with the number of cores and no axes or artists are created
+per core apart from the panel title.
+
+Input is a long table with columns core, depth, Hg, err_Hg, HgAR, err_HgAR
+(read_table), or the repository cores (load_repository_cores).
+
+Usage:
+    python core_atlas.py [<profiles.csv>]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.lines import Line2D
+from matplotlib.ticker import MaxNLocator
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DATA_DIR = SCRIPT_DIR.parents[1] / "Data"
+
+PROFILE_COLUMNS = ['core', 'depth', 'Hg', 'err_Hg', 'HgAR', 'err_HgAR']
+
+# Colours of figure_depth.py
+HG_COLOR = '#654321'
+HGAR_COLOR = 'tab:brown'
+
+GAP = 0.18          # space between panels (fraction of a panel)
+N_TICKS = 4         # target number of ticks per scale
+PANEL_SIZE = 1.6    # panel width [inch]
+ASPECT = 1.6        # panel height / width
+
+
+def load_repository_cores(data_dir=DATA_DIR):
+    """
+    Profiles of the cores in the repository (Hg.xlsx, HgAR.xlsx, QC flags applied).
+
+    Returns:
+    - long DataFrame (PROFILE_COLUMNS), depth in mm
+    """
+    sys.path.insert(0, str(data_dir))
+    from data_loader import LoadRequest, load_all
+
+    bundle = load_all([LoadRequest('hg', "Hg.xlsx", screened=True),
+                       LoadRequest('hgar', "HgAR.xlsx", screened=True)], data_dir, executor='thread')
+    frames = []
+    for core in ('GDL', 'EYC'):
+        df = pd.DataFrame({
+            'core': core, 'depth': bundle.hg[f"Depth_{core}"], 'Hg': bundle.hg[f"Hg_conc_{core}"],
+            'err_Hg': bundle.hg[f"Hg_conc_{core}"] * bundle.hg[f"RSD_{core}"],
+            'HgAR': bundle.hgar[f"Hg_AR_{core}"], 'err_HgAR': bundle.hgar[f"Err_{core}"],
+        })
+        frames.append(df.dropna(subset=['depth']))
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_table(path):
+    """
+    Profiles from a CSV or Excel long table (PROFILE_COLUMNS).
+    """
+    path = Path(path)
+    df = pd.read_excel(path) if path.suffix in ('.xlsx', '.xls') else pd.read_csv(path)
+    missing = set(PROFILE_COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"{path.name}: missing columns {sorted(missing)}")
+    return df[PROFILE_COLUMNS]
+
+
+def synthetic_cores(n, n_samples=40, seed=0):
+    """
+    Random profiles (for render benchmarks).
+    """
+    rng = np.random.default_rng(seed)
+    depth = np.tile(np.arange(n_samples) * 5.0 + 2.5, n)
+    shape = np.exp(-np.arange(n_samples) / rng.uniform(5, 20, (n, 1))).ravel()
+    Hg = 50 + 150 * shape * np.repeat(rng.uniform(0.3, 1, n), n_samples)
+    HgAR = Hg * np.repeat(rng.uniform(0.5, 2, n), n_samples)
+    return pd.DataFrame({'core': np.repeat([f"C{i:03d}" for i in range(n)], n_samples), 'depth': depth,
+                         'Hg': Hg, 'err_Hg': 0.05 * Hg, 'HgAR': HgAR, 'err_HgAR': 0.1 * HgAR})
+
+
+def shared_ticks(vmax, n_ticks=N_TICKS):
+    """
+    Tick values from 0 to a rounded-up maximum, computed once per scale.
+
+    Returns:
+    - upper limit of the scale, tick values
+    """
+    ticks = MaxNLocator(n_ticks, steps=[1, 2, 2.5, 5, 10]).tick_values(0, vmax)
+    ticks = ticks[ticks >= 0]
+    top = ticks[-1] if ticks[-1] >= vmax else ticks[-1] + np.diff(ticks[-2:])[0]
+    return top, ticks[ticks <= top]
+
+
+def _band(x, err, y):
+    # Polygon of an error band: x - err going down, x + err coming back up
+    return np.concatenate([np.column_stack([x - err, y]), np.column_stack([x + err, y])[::-1]])
+
+
+def render_atlas(profiles, ncols=None, sort=None, title=None):
+    """
+    Draw the atlas of all cores of a long profile table.
+
+    Every panel shows Hg (dashed, bottom scale) and HgAR (solid, top scale)
+    against depth, with ±1σ bands; scales are shared by all panels.
+
+    Parameters:
+    - profiles: long DataFrame (PROFILE_COLUMNS)
+    - ncols: number of panel columns (default: ~square grid)
+    - sort: optional column ('Hg', 'HgAR') to order cores by their maximum
+    - title: optional figure title
+
+    Returns:
+    - matplotlib Figure
+    """
+    profiles = profiles.dropna(subset=['depth']).sort_values(['core', 'depth'], kind='stable')
+    groups = dict(tuple(profiles.groupby('core', sort=False)))
+    cores = list(groups)
+    if sort is not None:
+        cores.sort(key=lambda c: -np.nanmax(groups[c][sort]))
+    n = len(cores)
+    ncols = ncols or int(np.ceil(np.sqrt(n * ASPECT)))
+    nrows = int(np.ceil(n / ncols))
+
+    # Shared scales and ticks
+    hg_top, hg_ticks = shared_ticks(np.nanmax(profiles['Hg'] + profiles['err_Hg'].fillna(0)))
+    ar_top, ar_ticks = shared_ticks(np.nanmax(profiles['HgAR'] + profiles['err_HgAR'].fillna(0)))
+    d_top, d_ticks = shared_ticks(np.nanmax(profiles['depth']))
+
+    step = 1 + GAP
+    lines = {'Hg': [], 'HgAR': []}
+    bands = {'Hg': [], 'HgAR': []}
+    for k, core in enumerate(cores):
+        g = groups[core]
+        x0, y0 = (k % ncols) * step, (k // ncols) * step * ASPECT
+        y = y0 + g['depth'].to_numpy(dtype=float) / d_top * ASPECT
+        for name, top in (('Hg', hg_top), ('HgAR', ar_top)):
+            v = g[name].to_numpy(dtype=float)
+            e = g[f"err_{name}"].to_numpy(dtype=float)
+            ok = np.isfinite(v)
+            if ok.sum() < 2:
+                continue
+            lines[name].append(np.column_stack([x0 + v[ok] / top, y[ok]]))
+            ok &= np.isfinite(e)
+            if ok.sum() >= 2:
+                bands[name].append(_band(x0 + v[ok] / top, e[ok] / top, y[ok]))
+
+    # Frames and grid lines of all panels at once
+    cells = np.array([((k % ncols) * step, (k // ncols) * step * ASPECT) for k in range(n)])
+    unit = np.array([[0, 0], [1, 0], [1, ASPECT], [0, ASPECT], [0, 0]])
+    frames = cells[:, None, :] + unit[None]
+    gx = hg_ticks[(hg_ticks > 0) & (hg_ticks < hg_top)] / hg_top
+    gy = d_ticks[(d_ticks > 0) & (d_ticks < d_top)] / d_top * ASPECT
+    grid = [[(cx + x, cy), (cx + x, cy + ASPECT)] for cx, cy in cells for x in gx] + \
+           [[(cx, cy + yy), (cx + 1, cy + yy)] for cx, cy in cells for yy in gy]
+
+    width = ncols * PANEL_SIZE * step
+    height = nrows * PANEL_SIZE * ASPECT * step + 0.8
+    fig = plt.figure(figsize=(width, height))
+    ax = fig.add_axes([0.4 / width, 0.45 / height, 1 - 0.5 / width, 1 - 1.1 / height])
+    ax.set_axis_off()
+
+    ax.add_collection(LineCollection(grid, colors='0.85', linewidths=0.5, linestyles='--'))
+    ax.add_collection(PolyCollection(bands['HgAR'], facecolors=HGAR_COLOR, alpha=0.25, edgecolors='none'))
+    ax.add_collection(PolyCollection(bands['Hg'], facecolors=HG_COLOR, alpha=0.2, edgecolors='none'))
+    ax.add_collection(LineCollection(lines['HgAR'], colors=HGAR_COLOR, linewidths=1.5))
+    ax.add_collection(LineCollection(lines['Hg'], colors=HG_COLOR, linewidths=1.0, linestyles='--'))
+    ax.add_collection(LineCollection(frames, colors='0.2', linewidths=0.6))
+
+    # Labels: core names, shared tick labels on the outer panels only
+    fs = 7
+    for k, core in enumerate(cores):
+        cx, cy = cells[k]
+        ax.text(cx + 0.97, cy + ASPECT - 0.03, core, ha='right', va='bottom', fontsize=fs + 1,
+                fontstyle='italic')
+    bottom_row = {k % ncols: cells[k] for k in range(n)}          # lowest panel of each column
+    for cx, cy in bottom_row.values():
+        for t in hg_ticks:
+            ax.text(cx + t / hg_top, cy + ASPECT + 0.03, f"{t:g}", ha='center', va='top', fontsize=fs,
+                    color=HG_COLOR)
+    for cx, cy in cells[:min(ncols, n)]:
+        for t in ar_ticks:
+            ax.text(cx + t / ar_top, cy - 0.03, f"{t:g}", ha='center', va='bottom', fontsize=fs,
+                    color=HGAR_COLOR)
+    for cx, cy in cells[::ncols]:
+        for t in d_ticks:
+            ax.text(cx - 0.03, cy + t / d_top * ASPECT, f"{t:g}", ha='right', va='center', fontsize=fs)
+
+    ax.set_xlim(-0.25, ncols * step - GAP + 0.02)
+    ax.set_ylim(nrows * step * ASPECT - GAP * ASPECT + 0.25, -0.3)
+
+    handles = [Line2D([0], [0], color=HG_COLOR, lw=1, linestyle='--', label='THg (ng g$^{-1}$), bottom scale'),
+               Line2D([0], [0], color=HGAR_COLOR, lw=1.5,
+                      label=r'Hg AR ($\mu$g m$^{-2}$ y$^{-1}$), top scale'),
+               Line2D([0], [0], color='0.2', lw=0, label='Depth (mm), left scale')]
+    fig.legend(handles=handles, loc='lower center', ncol=3, fontsize=fs + 1, frameon=False)
+    if title:
+        fig.suptitle(title, fontsize=fs + 3)
+    return fig
+
+
+def benchmark(sizes=(10, 50, 200, 400)):
+    """
+    Render time of synthetic atlases (Agg draw, no file output).
+
+    Returns:
+    - DataFrame with n_cores, seconds, ms per core
+    """
+    rows = []
+    for n in sizes:
+        profiles = synthetic_cores(n)
+        t0 = time.perf_counter()
+        fig = render_atlas(profiles)
+        fig.canvas.draw()
+        dt = time.perf_counter() - t0
+        plt.close(fig)
+        rows.append({'n_cores': n, 'seconds': dt, 'ms_per_core': dt / n * 1000})
+    return pd.DataFrame(rows)
+
+
+def main():
+    profiles = read_table(sys.argv[1]) if len(sys.argv) > 1 else load_repository_cores()
+    fig = render_atlas(profiles)
+    fig.savefig(SCRIPT_DIR / "core_atlas.pdf", bbox_inches='tight')
+    fig.savefig(SCRIPT_DIR / "core_atlas.png", bbox_inches='tight', dpi=300)
+    plt.close(fig)
+    print(f"Atlas of {profiles['core'].nunique()} cores saved to core_atlas.pdf / .png")
+
+    if matplotlib.get_backend().lower() == 'agg':
+        print("\nRender time (synthetic cores):")
+        print(benchmark().round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
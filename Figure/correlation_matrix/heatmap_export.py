@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Nov  1 10:12:40 2026
+
+Batch export of the correlation heatmaps of corr_matrix_EYC.py and
+corr_matrix_GDL.py.
+
+Every write_image(..., engine='kaleido') call of the single-figure scripts
+pays the start-up of the kaleido browser process, which dominates the runtime
+of a small heatmap. An ExportSession keeps one export process alive and
+renders all the requested heatmaps (cores × rolling windows × significance
+masks) in one go: with kaleido >= 1.0 the figures are written in a single
+plotly.io.write_images call on a persistent sync server, with older kaleido
+versions the plotly scope stays alive between calls. engine='matplotlib'
+draws the same heatmaps with matplotlib only (no plotly, no browser), and is
+used automatically when plotly or kaleido is not installed.
+
+Usage:
+    python heatmap_export.py [kaleido|matplotlib]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from scipy import stats
+
+try:
+    import plotly.express as px
+    import plotly.io as pio
+except ImportError:
+    px = pio = None
+
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+OUTPUT_DIR = SCRIPT_DIR / "heatmaps"
+
+# Settings of corr_matrix_<core>.py: input file, rows used, columns
+CORES = {
+    'EYC': {'file': "corr_EYC.xlsx", 'n_rows': 721,
+            'columns': ['CLR_K', 'CLR_Ti', 'CLR_Si', 'CLR_Al', 'CLR_Ca', 'CLR_Mn', 'CLR_Fe', 'CLR_Zn',
+                        'CLR_Rb', 'CLR_Sr', 'CLR_Zr', 'CLR_Pb', 'CLR_Br', 'CLR_S', 'LOI_950', 'Hg_AR']},
+    'GDL': {'file': "corr_GDL.xlsx", 'n_rows': 201,
+            'columns': ['CLR_K', 'CLR_Ti', 'CLR_Si', 'CLR_Al', 'CLR_Ca', 'CLR_Mn', 'CLR_Fe', 'CLR_Rb',
+                        'CLR_Sr', 'CLR_Zr', 'CLR_Pb', 'CLR_Br', 'LOI_950', 'Hg_AR']},
+}
+
+# Rolling windows of the scripts (EYC: 5, GDL: 1) and significance masks
+WINDOWS = (1, 5, 10)
+MASKS = {'all': None, 'p05': 0.05}
+
+WIDTH, HEIGHT = 800, 600   # figure size [px] (plotly layout of the scripts)
+
+
+def load_core(core, data_dir=SCRIPT_DIR):
+    """
+    Columns of a core used by its correlation matrix, limited to the rows of
+    the script.
+    """
+    cfg = CORES[core]
+    return pd.read_excel(Path(data_dir) / cfg['file'], usecols=cfg['columns'],
+                         nrows=cfg['n_rows'])[cfg['columns']]
+
+
+def correlation(data, window):
+    """
+    Pearson correlation matrix of the rolling means of every column, as in
+    corr_matrix_<core>.py, with two-sided p-values.
+
+    The p-values use the number of pairwise complete rolling means; the
+    smoothing makes neighbouring values dependent, so they are optimistic for
+    window > 1.
+
+    Returns:
+    - corr, pval: DataFrames labelled without the CLR_ prefix
+    """
+    smooth = data.rolling(window=window).mean()
+    smooth.columns = [c.replace('CLR_', '').replace('_', ' ') for c in data.columns]
+    corr = smooth.corr()
+    valid = smooth.notna().to_numpy(dtype=float)
+    n = valid.T @ valid
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = corr.to_numpy() * np.sqrt((n - 2) / (1 - corr.to_numpy() ** 2))
+    pval = pd.DataFrame(2 * stats.t.sf(np.abs(t), n - 2), index=corr.index, columns=corr.columns)
+    return corr, pval
+
+
+def masked(corr, pval, alpha):
+    """
+    Rounded correlations, NaN where p >= alpha (alpha None: no mask).
+    """
+    rounded = np.round(corr, 2)
+    return rounded if alpha is None else rounded.where(pval < alpha)
+
+
+def plotly_figure(matrix, title):
+    """
+    Heatmap with the layout of corr_matrix_<core>.py.
+    """
+    fig = px.imshow(matrix, text_auto=True, aspect="auto", color_continuous_scale='RdBu_r',
+                    labels=dict(color="Correlation"), zmin=-1, zmax=1)
+    fig.update_layout(title=title, autosize=False, width=WIDTH, height=HEIGHT)
+    fig.update_traces(hovertemplate='x: %{x}<br>y: %{y}<br>Correlation: %{customdata:.2f}')
+    fig.data[0].update(customdata=matrix.values)
+    return fig
+
+
+def matplotlib_figure(matrix, title, dpi=100):
+    """
+    Static heatmap drawn with matplotlib only (no browser engine).
+    """
+    fig = Figure(figsize=(WIDTH / dpi, HEIGHT / dpi), dpi=dpi)
+    ax = fig.add_subplot()
+    values = matrix.to_numpy(dtype=float)
+    im = ax.imshow(np.ma.masked_invalid(values), cmap='RdBu_r', vmin=-1, vmax=1, aspect='auto')
+    im.cmap.set_bad('white')
+    ax.set_xticks(range(matrix.shape[1]), matrix.columns, rotation=90)
+    ax.set_yticks(range(matrix.shape[0]), matrix.index)
+    for (i, j), v in np.ndenumerate(values):
+        if np.isfinite(v):
+            ax.text(j, i, f"{v:.2f}", ha='center', va='center', fontsize=7,
+                    color='white' if abs(v) > 0.6 else 'black')
+    fig.colorbar(im, ax=ax, label="Correlation")
+    ax.set_title(title, loc='left')
+    fig.tight_layout()
+    return fig
+
+
+class ExportSession:
+    """
+    Context manager rendering many heatmaps with one export process.
+
+    Heatmaps added with render() are queued and written when the session
+    closes (or on flush()).
+
+    Parameters:
+    - engine: 'kaleido', 'matplotlib' or 'auto' (kaleido when plotly and
+      kaleido are installed)
+    """
+
+    def __init__(self, engine='auto'):
+        if engine == 'auto':
+            engine = 'kaleido' if px is not None and kaleido is not None else 'matplotlib'
+        if engine == 'kaleido' and (px is None or kaleido is None):
+            raise ImportError("engine='kaleido' needs plotly and kaleido (use engine='matplotlib')")
+        self.engine = engine
+        self.jobs = []
+        self._server = False
+
+    def __enter__(self):
+        if self.engine == 'kaleido' and hasattr(kaleido, 'start_sync_server'):
+            kaleido.start_sync_server(silence_warnings=True)
+            self._server = True
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if exc[0] is None:
+                self.flush()
+        finally:
+            if self._server:
+                kaleido.stop_sync_server(silence_warnings=True)
+                self._server = False
+
+    def render(self, matrix, title, path):
+        self.jobs.append((matrix, title, Path(path)))
+
+    def flush(self):
+        """
+        Write the queued heatmaps.
+
+        Returns:
+        - list of written paths
+        """
+        jobs, self.jobs = self.jobs, []
+        for _, _, path in jobs:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.engine == 'matplotlib':
+            for matrix, title, path in jobs:
+                matplotlib_figure(matrix, title).savefig(path)
+        else:
+            figs = [plotly_figure(matrix, title) for matrix, title, _ in jobs]
+            paths = [path for _, _, path in jobs]
+            if hasattr(pio, 'write_images'):
+                pio.write_images(figs, paths)
+            else:
+                # kaleido < 1.0: plotly keeps the same kaleido scope alive between calls
+                for fig, path in zip(figs, paths):
+                    fig.write_image(path, engine='kaleido')
+        return [path for _, _, path in jobs]
+
+
+def export_all(cores=tuple(CORES), windows=WINDOWS, masks=MASKS, engine='auto', fmt='pdf',
+               output_dir=OUTPUT_DIR):
+    """
+    Render every core × window × mask heatmap in one export session.
+
+    Returns:
+    - list of written paths
+    """
+    with ExportSession(engine) as session:
+        for core in cores:
+            data = load_core(core)
+            for window in windows:
+                corr, pval = correlation(data, window)
+                for mask, alpha in masks.items():
+                    title = f"Correlation Matrix {core}" + (f" (rolling mean {window})" if window > 1 else "") \
+                        + (f", p < {alpha:g}" if alpha is not None else "")
+                    session.render(masked(corr, pval, alpha), title,
+                                   Path(output_dir) / f"correlation_matrix_{core}_w{window}_{mask}.{fmt}")
+        written = session.flush()
+    return written
+
+
+def main():
+    engine = sys.argv[1] if len(sys.argv) > 1 else 'auto'
+    t0 = time.perf_counter()
+    written = export_all(engine=engine)
+    dt = time.perf_counter() - t0
+    print(f"{len(written)} heatmaps written to {OUTPUT_DIR.name}/ in {dt:.2f} s "
+          f"({dt / len(written) * 1000:.0f} ms per heatmap)")
+
+
+if __name__ == "__main__":
+    main()
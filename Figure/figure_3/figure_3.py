@@ -11,6 +11,7 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 import numpy as np
 import os
+import sys
 from pathlib import Path
 from scipy.interpolate import interp1d
 
@@ -20,36 +21,35 @@ if __name__ == "__main__":
     base_dir = current_dir.parent.parent
     data_dir = base_dir / "Data"
 
-    # Define file paths
-    hg_file = data_dir / "HgAR.xlsx"
-    age_file = data_dir / "210_Pb_dating" / "Age.xlsx"
-    emission_file = data_dir / "european_Hg_emission.xlsx"
-    xray_file = data_dir / "X_ray.xlsx"
-    hg_conc_file = data_dir / "Hg.xlsx"
-    loi_file = data_dir / "LOI.xlsx"
-    delta_file = data_dir / "C_total_delta13C.xlsx"
-    glacier_file = data_dir / "mass_balance_glacier.xlsx"
-    ftir_file = data_dir / "FT-IR_ATR" / "FT-IR_ATR.xlsx"
-
-    # Debug paths
-    print("Looking for HgAR file at:", hg_file)
-    print("Looking for Age file at:", age_file)
-    print("Looking for European Hg emission file at:", emission_file)
-    
-    # Check existence
-    if not hg_file.exists():
-        raise FileNotFoundError(f"HgAR file not found at: {hg_file}")
-    if not age_file.exists():
-        raise FileNotFoundError(f"Age file not found at: {age_file}")
-    if not emission_file.exists():
-        raise FileNotFoundError(f"European Hg emission file not found at: {emission_file}")
+    # Concurrent, QC-screened loading (data_loader.py in the Data folder)
+    sys.path.insert(0, str(data_dir))
+    from data_loader import LoadRequest, load_all
+
+    # Data needed by the figure (screened = QC flags applied, see Data/qc_flags.csv).
+    # Besides the manual LOI_550_EYC row-24 mask of the published figure, the
+    # automated flags drop LOI_950_EYC row 2, C_total row 1, CLR_Fe scan rows
+    # 15, 30-32 and 733 (EYC), and Hg_AR_GDL/Err_GDL rows 28, 35, 36 and 38
+    # (Hg_conc_GDL flagged), so Figure 3 differs from the published version there.
+    manifest = [
+        LoadRequest('hgar', "HgAR.xlsx", screened=True),
+        LoadRequest('age', "210_Pb_dating/Age.xlsx"),
+        LoadRequest('emission', "european_Hg_emission.xlsx"),
+        LoadRequest('xray', "X_ray.xlsx", usecols=["Age_X_EYC", "CLR_Fe", "CLR_Ti"], screened=True),
+        LoadRequest('hg', "Hg.xlsx", usecols=["Hg_conc_EYC", "RSD_EYC"], screened=True),
+        LoadRequest('loi', "LOI.xlsx", usecols=["LOI_550_EYC", "LOI_950_EYC"], screened=True),
+        LoadRequest('delta', "C_total_delta13C.xlsx", usecols=["C_total", "delta_13_C"], screened=True),
+        LoadRequest('glacier', "mass_balance_glacier.xlsx"),
+        LoadRequest('pca', "FT-IR_ATR/FT-IR_ATR.xlsx", sheet="EYC_loadings", usecols=["PC2_ord", "sCp3"]),
+    ]
 
     # === Load and process data ===
+    bundle = load_all(manifest, data_dir)
+    print("Load time per workbook:")
+    print(bundle.report())
 
-    # Load mercury flux data, age models, and European emissions
-    data = pd.read_excel(hg_file)
-    age_data = pd.read_excel(age_file)
-    emission_data = pd.read_excel(emission_file)
+    data = bundle.hgar
+    age_data = bundle.age
+    emission_data = bundle.emission
 
     # Normalize Hg fluxes relative to selected reference points
     norm_flux_GDL = data['Hg_AR_GDL'] / data.at[20, 'Hg_AR_GDL']
@@ -58,14 +58,13 @@ if __name__ == "__main__":
     # Normalize uncertainties accordingly
     err_flux_GDL = data['Err_GDL'] / data['Hg_AR_GDL'] * norm_flux_GDL
     err_flux_EYC = data['Err_EYC'] / data['Hg_AR_EYC'] * norm_flux_EYC
-    
-    # Read the required columns from other files
-    fe_data = pd.read_excel(xray_file, usecols=["Age_X_EYC", "CLR_Fe", "CLR_Ti"])
-    hg_data = pd.read_excel(hg_conc_file, usecols=["Hg_conc_EYC", "RSD_EYC"])
-    loi_data = pd.read_excel(loi_file, usecols=["LOI_550_EYC", "LOI_950_EYC"])
-    delta_data = pd.read_excel(delta_file, usecols=["C_total", "delta_13_C"])
-    glacier_data = pd.read_excel(glacier_file)
-    pca_data = pd.read_excel(ftir_file, sheet_name="EYC_loadings", usecols=["PC2_ord", "sCp3"])
+
+    fe_data = bundle.xray
+    hg_data = bundle.hg
+    loi_data = bundle.loi
+    delta_data = bundle.delta
+    glacier_data = bundle.glacier
+    pca_data = bundle.pca
 
     # === Extract and smooth data ===
     age = age_data["age_EYC"]
@@ -81,7 +80,6 @@ if __name__ == "__main__":
     Hg_err = Hg * RSD
 
     LOI_550 = loi_data["LOI_550_EYC"] * 100
-    LOI_550[24] = np.nan
     LOI_950 = loi_data["LOI_950_EYC"] * 100
     PC2 = pd.concat([pca_data["PC2_ord"], pd.Series([np.nan] * 5)], ignore_index=True)
     sCp3 = pd.concat([pca_data["sCp3"], pd.Series([np.nan] * 5)], ignore_index=True)
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Nov  6 09:18:44 2026
+
+Declarative figure specifications rendered by one engine over a shared data
+context.
+
+A figure is described as data: a FigureSpec holds a grid of Panel entries,
+each with its x and y Axis settings, Line and Band series, an optional twin
+x axis (twiny, as in Figure_2.py and figure_depth.py) with its own series,
+horizontal lines and spans, text annotations, a legend and the panel label.
+Series refer to data by name ('hg.Hg_conc_GDL': column of a dataset,
+'norm_flux.Lui': entry of a derived series), never by loading code.
+
+A DataContext resolves these names. Datasets are declared once as
+LoadRequest entries (data_loader.py) and the workbooks needed by all the
+figures of a build are loaded together in one concurrent load_all call; a
+derived series (errors from RSD, normalised fluxes, ...) is computed the
+first time it is asked for. Everything is cached in the context, so every
+workbook is read and every derived series computed once per build, however
+many figures use it.
+
+Usage:
+    python figure_engine.py [<figure_script.py> ...]   (default: all FIGURE_SCRIPTS)
+"""
+
+import importlib.util
+import sys
+import time
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
+from matplotlib.font_manager import FontProperties
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+FIGURE_DIR = SCRIPT_DIR.parent
+DATA_DIR = FIGURE_DIR.parent / "Data"
+
+sys.path.insert(0, str(DATA_DIR))
+from data_loader import LoadRequest, load_all  # noqa: E402
+
+# Figures built by default (paths relative to the Figure folder), each defining SPEC
+FIGURE_SCRIPTS = ["figure_2/Figure_2.py", "figure_depth/figure_depth.py",
+                  "figure_enrichment/figure_enrichment.py"]
+
+# Font sizes shared by the figures
+STYLE = {'label': 12, 'tick': 10, 'legend': 10, 'panel_label': 14}
+
+# Marker horizons and their line style
+HLINE_STYLE = {'linestyle': '--', 'linewidth': 1, 'color': 'black', 'alpha': 0.6}
+
+
+# --- Specification ------------------------------------------------------------
+
+class Axis(NamedTuple):
+    """
+    Settings of one axis of a panel.
+
+    - label: axis label
+    - color: colour of the label and tick labels (None: default)
+    - major, minor: spacing of the major / minor ticks (MultipleLocator)
+    - lim: (lo, hi) limits (hi < lo inverts the axis)
+    - ticks: explicit tick positions
+    - invert: invert the axis
+    """
+    label: Optional[str] = None
+    color: Optional[str] = None
+    major: Optional[float] = None
+    minor: Optional[float] = None
+    lim: Optional[Tuple[float, float]] = None
+    ticks: Optional[Sequence[float]] = None
+    invert: bool = False
+
+
+class Line(NamedTuple):
+    """
+    A series drawn as a line; x and y are data references.
+    """
+    x: str
+    y: str
+    color: Optional[str] = None
+    lw: float = 1.5
+    linestyle: str = '-'
+    marker: Optional[str] = None
+    label: Optional[str] = None
+
+
+class Band(NamedTuple):
+    """
+    x ± err shaded along y (fill_betweenx); all three are data references.
+    """
+    x: str
+    y: str
+    err: str
+    color: Optional[str] = None
+    alpha: float = 0.3
+
+
+class HSpan(NamedTuple):
+    y0: float
+    y1: float
+    color: str = '#E0E0E0'
+    alpha: float = 1.0
+
+
+class Text(NamedTuple):
+    """
+    Annotation at (x, y). coords 'data'; 'axes' (fractions of the axes);
+    'xlim' (x as a fraction of the upper x limit at drawing time, y in data).
+    With ref (a data reference to a string), the text comes from the context.
+    """
+    x: float
+    y: float
+    s: str
+    coords: str = 'data'
+    color: str = 'gray'
+    ha: str = 'right'
+    va: str = 'center'
+    fontweight: str = 'bold'
+    fontsize: Optional[float] = None
+    ref: Optional[str] = None
+
+
+class Legend(NamedTuple):
+    """
+    Legend of the labelled series of a panel and of its twin axis.
+    """
+    loc: str = 'best'
+    title: Optional[str] = None
+    italic_title: bool = True
+    framealpha: Optional[float] = None
+
+
+class Twin(NamedTuple):
+    """
+    Second x axis sharing the y axis of a panel (twiny).
+    """
+    axis: Axis
+    series: Sequence[Any] = ()
+
+
+class Panel(NamedTuple):
+    x: Axis = Axis()
+    y: Axis = Axis()
+    series: Sequence[Any] = ()
+    twin: Optional[Twin] = None
+    hlines: Sequence[float] = ()
+    spans: Sequence[HSpan] = ()
+    texts: Sequence[Text] = ()
+    legend: Optional[Legend] = None
+    label: Optional[str] = None
+    grid_alpha: Optional[float] = 0.3
+
+
+class FigureSpec(NamedTuple):
+    """
+    A figure: panels in row-major order on a nrows × ncols grid, and the files
+    written by build() (names relative to the folder of the spec's script).
+    """
+    name: str
+    panels: Sequence[Panel]
+    nrows: int = 1
+    ncols: int = 1
+    figsize: Tuple[float, float] = (10, 6)
+    sharey: bool = False
+    gridspec_kw: Optional[dict] = None
+    rc: Optional[dict] = None
+    outputs: Sequence[Tuple[str, dict]] = ()
+
+
+# --- Data context -------------------------------------------------------------
+
+class DataContext:
+    """
+    In-process cache of datasets and derived series, shared by all figures of
+    a build.
+
+    Parameters:
+    - data_dir: folder the LoadRequest files are relative to
+    - executor: data_loader executor ('thread' or 'process')
+    """
+
+    def __init__(self, data_dir=DATA_DIR, executor='thread'):
+        self.data_dir = Path(data_dir)
+        self.executor = executor
+        self.requests = {}
+        self.recipes = {}
+        self.frames = {}
+        self.derived = {}
+        self.timings = {}
+        self.stats = {'workbooks': 0, 'derived': 0, 'lookups': 0}
+
+    def dataset(self, name, file, sheet=None, screened=False):
+        """
+        Declare a dataset (whole sheet, so any column can be used).
+        """
+        self.requests[name] = LoadRequest(name, file, sheet, None, screened)
+
+    def derive(self, name, needs=()):
+        """
+        Decorator declaring a derived series: func(ctx) is called once, the
+        first time `name` is used. `needs` lists the datasets it reads, so
+        they are loaded with the others.
+        """
+        def register(func):
+            self.recipes[name] = (func, tuple(needs))
+            return func
+        return register
+
+    def _datasets_of(self, key):
+        if key in self.requests:
+            return {key}
+        if key in self.recipes:
+            return set(self.recipes[key][1])
+        raise KeyError(f"Unknown dataset or derived series: {key!r}")
+
+    def prefetch(self, refs):
+        """
+        Load in one concurrent call all the datasets needed by refs (data
+        references) and not loaded yet.
+        """
+        needed = set()
+        for ref in refs:
+            needed |= self._datasets_of(ref.split('.', 1)[0])
+        todo = [self.requests[n] for n in sorted(needed) if n not in self.frames]
+        if not todo:
+            return
+        bundle = load_all(todo, self.data_dir, executor=self.executor)
+        self.frames.update(bundle)
+        self.timings.update(bundle.timings)
+        self.stats['workbooks'] += len(bundle.timings)
+
+    def get(self, ref):
+        """
+        Value of a data reference: 'dataset' or 'dataset.column', 'derived'
+        or 'derived.key'.
+        """
+        self.stats['lookups'] += 1
+        key, _, item = ref.partition('.')
+        if key in self.requests:
+            if key not in self.frames:
+                self.prefetch([key])
+            value = self.frames[key]
+        else:
+            if key not in self.derived:
+                func, needs = self.recipes[key]
+                self.prefetch(needs)
+                self.derived[key] = func(self)
+                self.stats['derived'] += 1
+            value = self.derived[key]
+        return value[item] if item else value
+
+    def report(self):
+        return (f"{self.stats['workbooks']} workbooks read ({sum(self.timings.values()):.2f} s), "
+                f"{self.stats['derived']} derived series computed, {self.stats['lookups']} lookups")
+
+
+def standard_context(data_dir=DATA_DIR, executor='thread'):
+    """
+    Context with the datasets and derived series used by the Hg figures.
+
+    Datasets: age (210_Pb_dating/Age.xlsx), hg (Hg.xlsx), hg_ar (HgAR.xlsx),
+    lakes (Hg_lake.xlsx), emission (european_Hg_emission.xlsx); hg and hg_ar
+    with the QC flags of proxy_qc applied (flagged values NaN, skipped by lines).
+    Derived: hg_err.<core> (RSD × concentration), norm_flux.<lake> (flux /
+    maximum flux of the record), hgar_trend.<core> (Mann-Kendall / Sen's
+    slope of HgAR since 1970, as annotation text; trend_tests.py),
+    enrichment.<core>_<column> (columns of enrichment.to_frame: age, Hg/X,
+    EF_X and their err_ columns, from the enrichment cache).
+    """
+    ctx = DataContext(data_dir, executor)
+    ctx.dataset('age', "210_Pb_dating/Age.xlsx")
+    ctx.dataset('hg', "Hg.xlsx", screened=True)
+    ctx.dataset('hg_ar', "HgAR.xlsx", screened=True)
+    ctx.dataset('lakes', "Hg_lake.xlsx")
+    ctx.dataset('emission', "european_Hg_emission.xlsx")
+
+    @ctx.derive('hg_err', needs=('hg',))
+    def hg_err(c):
+        hg = c.get('hg')
+        return {core: hg[f"RSD_{core}"] * hg[f"Hg_conc_{core}"] for core in ('EYC', 'GDL')}
+
+    @ctx.derive('norm_flux', needs=('hg_ar', 'lakes'))
+    def norm_flux(c):
+        flux = {'GDL': c.get('hg_ar.Hg_AR_GDL')}
+        flux.update({lake: c.get(f'lakes.Flux_{lake}') for lake in ('Lui', 'Mont')})
+        return {lake: f / f.max() for lake, f in flux.items()}
+
+    @ctx.derive('hgar_trend', needs=('age', 'hg_ar'))
+    def hgar_trend(c):
+        from trend_tests import annotation, trend_table
+        series = {}
+        for core in ('EYC', 'GDL'):
+            df = pd.DataFrame({'age': c.get(f'age.age_{core}'), 'y': c.get(f'hg_ar.Hg_AR_{core}')})
+            df = df.dropna().sort_values('age', kind='stable')
+            series[(core, 'HgAR')] = (df['age'].to_numpy(), df['y'].to_numpy())
+        results = trend_table(series)
+        return {core: annotation(results, core, 'HgAR') for core in ('EYC', 'GDL')}
+
+    @ctx.derive('enrichment')
+    def enrichment_columns(c):
+        from enrichment import load_enrichment, to_frame
+        res = load_enrichment(data_dir=c.data_dir)
+        return {f"{core}_{col}": values.to_numpy()
+                for core in res['cores'] for col, values in to_frame(res, core).items()}
+
+    return ctx
+
+
+# --- Rendering ----------------------------------------------------------------
+
+def data_refs(spec):
+    """
+    Data references used by a figure spec.
+    """
+    refs = set()
+    for panel in spec.panels:
+        series = list(panel.series) + (list(panel.twin.series) if panel.twin else [])
+        for s in series:
+            refs.update(getattr(s, f) for f in ('x', 'y', 'err') if hasattr(s, f))
+        refs.update(t.ref for t in panel.texts if t.ref is not None)
+    return refs
+
+
+def _apply_axis(ax, which, axis):
+    params = {'labelsize': STYLE['tick']}
+    if axis.color:
+        params['colors'] = axis.color
+    if axis.label:
+        kw = {'color': axis.color} if axis.color else {}
+        getattr(ax, f"set_{which}label")(axis.label, fontsize=STYLE['label'], **kw)
+    ax.tick_params(axis=which, **params)
+    target = ax.xaxis if which == 'x' else ax.yaxis
+    if axis.major:
+        target.set_major_locator(ticker.MultipleLocator(axis.major))
+    if axis.minor:
+        target.set_minor_locator(ticker.MultipleLocator(axis.minor))
+    if axis.lim:
+        getattr(ax, f"set_{which}lim")(*axis.lim)
+    if axis.ticks is not None:
+        getattr(ax, f"set_{which}ticks")(list(axis.ticks))
+    if axis.invert:
+        getattr(ax, f"invert_{which}axis")()
+
+
+def _finite(ctx, *refs):
+    # Values of the references, without the points missing in any of them (QC-flagged
+    # samples), so that lines and bands join the neighbouring samples
+    values = [np.asarray(ctx.get(r), dtype=float) for r in refs]
+    ok = np.logical_and.reduce([np.isfinite(v) for v in values])
+    return [v[ok] for v in values]
+
+
+def _draw_series(ax, series, ctx):
+    for s in series:
+        if isinstance(s, Band):
+            x, y, err = _finite(ctx, s.x, s.y, s.err)
+            ax.fill_betweenx(y, x - err, x + err, color=s.color, alpha=s.alpha)
+        else:
+            x, y = _finite(ctx, s.x, s.y)
+            ax.plot(x, y, color=s.color, lw=s.lw, linestyle=s.linestyle, marker=s.marker, label=s.label)
+
+
+def render_panel(ax, panel, ctx):
+    """
+    Draw one panel (and its twin axis) on ax.
+    """
+    _draw_series(ax, panel.series, ctx)
+    _apply_axis(ax, 'x', panel.x)
+    _apply_axis(ax, 'y', panel.y)
+    if panel.grid_alpha is not None:
+        ax.grid(True, linestyle='--', alpha=panel.grid_alpha)
+
+    for span in panel.spans:
+        ax.axhspan(span.y0, span.y1, color=span.color, alpha=span.alpha)
+    for t in panel.texts:
+        kw = {'color': t.color, 'ha': t.ha, 'va': t.va, 'fontweight': t.fontweight,
+              'fontsize': t.fontsize or STYLE['label']}
+        if t.ref is not None:
+            t = t._replace(s=ctx.get(t.ref))
+        if t.coords == 'axes':
+            ax.text(t.x, t.y, t.s, transform=ax.transAxes, **kw)
+        elif t.coords == 'xlim':
+            ax.text(x=ax.get_xlim()[1] * t.x, y=t.y, s=t.s, **kw)
+        else:
+            ax.text(t.x, t.y, t.s, **kw)
+    for y in panel.hlines:
+        ax.axhline(y, **HLINE_STYLE)
+
+    handles = [line for line in ax.get_lines() if not line.get_label().startswith('_')]
+    if panel.twin is not None:
+        twin = ax.twiny()
+        _draw_series(twin, panel.twin.series, ctx)
+        _apply_axis(twin, 'x', panel.twin.axis)
+        handles += [line for line in twin.get_lines() if not line.get_label().startswith('_')]
+
+    if panel.legend is not None:
+        lg = panel.legend
+        kw = {'loc': lg.loc, 'fontsize': STYLE['legend']}
+        if lg.title:
+            kw['title'] = lg.title
+            if lg.italic_title:
+                kw['title_fontproperties'] = FontProperties(style='italic')
+        if lg.framealpha is not None:
+            kw['framealpha'] = lg.framealpha
+        ax.legend(handles=handles, **kw)
+    if panel.label:
+        ax.text(0.95, 0.02, panel.label, transform=ax.transAxes, fontsize=STYLE['panel_label'],
+                ha='right', va='bottom', fontweight='bold')
+
+
+def render(spec, ctx):
+    """
+    Draw a figure spec with the data of ctx.
+
+    Returns:
+    - matplotlib Figure
+    """
+    ctx.prefetch(data_refs(spec))
+    with plt.rc_context(spec.rc or {}):
+        fig, axs = plt.subplots(spec.nrows, spec.ncols, figsize=spec.figsize, sharey=spec.sharey,
+                                gridspec_kw=spec.gridspec_kw, constrained_layout=True, squeeze=False)
+        for ax, panel in zip(axs.ravel(), spec.panels):
+            render_panel(ax, panel, ctx)
+    return fig
+
+
+def load_spec(script):
+    """
+    SPEC of a figure script, imported from its path.
+    """
+    script = Path(script)
+    module_spec = importlib.util.spec_from_file_location(script.stem, script)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return module.SPEC
+
+
+def build(specs, ctx=None, output_dirs=None, show=False):
+    """
+    Render and save several figures with one data context.
+
+    Parameters:
+    - specs: list of FigureSpec
+    - ctx: DataContext (default: standard_context())
+    - output_dirs: folder of each spec's outputs (default: current folder)
+    - show: call plt.show() at the end instead of closing the figures
+
+    Returns:
+    - the context (with its load statistics), list of written paths
+    """
+    ctx = ctx or standard_context()
+    output_dirs = output_dirs or [Path.cwd()] * len(specs)
+    refs = set().union(*(data_refs(s) for s in specs))
+    ctx.prefetch(refs)
+
+    written = []
+    for spec, out in zip(specs, output_dirs):
+        fig = render(spec, ctx)
+        for name, kwargs in spec.outputs:
+            fig.savefig(Path(out) / name, **kwargs)
+            written.append(Path(out) / name)
+        if not show:
+            plt.close(fig)
+    if show:
+        plt.show()
+    return ctx, written
+
+
+def main():
+    scripts = [Path(s).resolve() for s in sys.argv[1:]] or [FIGURE_DIR / s for s in FIGURE_SCRIPTS]
+    specs = [load_spec(s) for s in scripts]
+    t0 = time.perf_counter()
+    ctx, written = build(specs, output_dirs=[s.parent for s in scripts])
+    print(f"{len(specs)} figures, {len(written)} files in {time.perf_counter() - t0:.2f} s")
+    print(ctx.report())
+
+
+if __name__ == "__main__":
+    # The figure scripts import figure_engine: run main() from that module, so
+    # their specs are built from the same classes as the ones render() checks
+    import figure_engine
+    figure_engine.main()
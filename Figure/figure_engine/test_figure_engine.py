@@ -0,0 +1,38 @@
+"""
+Smoke test of the figure_engine.py command line: a spec script with a line
+and a band is built through `python figure_engine.py <script>`.
+
+Run with: python -m pytest Figure/figure_engine
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ENGINE = Path(__file__).resolve().parent / "figure_engine.py"
+
+SPEC_SCRIPT = f'''
+import sys
+sys.path.insert(0, {str(ENGINE.parent)!r})
+from figure_engine import Axis, Band, FigureSpec, Line, Panel
+
+SPEC = FigureSpec(
+    name='Smoke',
+    panels=[Panel(x=Axis('THg'), y=Axis('Depth'),
+                  series=[Line('hg.Hg_conc_EYC', 'hg.Depth_EYC', 'tab:blue', label='Hg'),
+                          Band('hg.Hg_conc_EYC', 'hg.Depth_EYC', 'hg_err.EYC', 'tab:blue')])],
+    outputs=[('smoke.png', {{'dpi': 50}})],
+)
+'''
+
+
+def test_cli_builds_spec_script(tmp_path):
+    script = tmp_path / "smoke_spec.py"
+    script.write_text(SPEC_SCRIPT)
+    env = dict(os.environ, MPLBACKEND='Agg')
+    proc = subprocess.run([sys.executable, str(ENGINE), str(script)], cwd=tmp_path, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stderr
+    assert "1 figures, 1 files" in proc.stdout
+    assert (tmp_path / "smoke.png").stat().st_size > 0
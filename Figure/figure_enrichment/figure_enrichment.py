@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov 30 10:12:41 2026
+
+Hg enrichment factors of Grand Lake (a) and Eychauda (b) against age, for
+each normaliser (Ti, Al, total carbon, LOI 550) with their 1σ error, as a
+declarative spec drawn by figure_engine.py. The factors come from the
+enrichment cache of Data/enrichment.py (load_enrichment), relative to the
+oldest part of the records (before 1930).
+"""
+
+import sys
+from pathlib import Path
+
+# Figure engine (figure_engine/ in the Figure folder)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "figure_engine"))
+from figure_engine import Axis, Band, FigureSpec, Legend, Line, Panel, build
+
+# Normalisers and their colours (no TOC baseline at GDL: no total carbon data)
+NORMALISERS = {'Ti': 'tab:orange', 'Al': 'tab:green', 'TOC': 'tab:purple', 'LOI_550': 'tab:olive'}
+LABELS = {'Ti': 'Hg/Ti', 'Al': 'Hg/Al', 'TOC': 'Hg/TOC', 'LOI_550': 'Hg/LOI 550'}
+
+# Horizons of the age panels
+HORIZONS = (1915, 1940, 1970)
+
+
+def ef_panel(core, lake, normalisers, legend_loc, label, ylabel=None):
+    """
+    Enrichment factor ± error of every normaliser of a core against age.
+    """
+    series = []
+    for x in normalisers:
+        ef, age = f'enrichment.{core}_EF_{x}', f'enrichment.{core}_age'
+        series += [Line(ef, age, NORMALISERS[x], lw=2, marker='o', label=LABELS[x]),
+                   Band(ef, age, f'enrichment.{core}_err_EF_{x}', NORMALISERS[x], alpha=0.2)]
+    return Panel(
+        x=Axis('Enrichment factor', major=0.5, minor=0.25),
+        y=Axis(ylabel, lim=(1900, 2025), ticks=range(1900, 2025, 20)),
+        series=series,
+        hlines=HORIZONS,
+        legend=Legend(legend_loc, lake, framealpha=0.9),
+        label=label,
+    )
+
+
+SPEC = FigureSpec(
+    name='Figure enrichment',
+    nrows=1, ncols=2, figsize=(10, 6), sharey=True, gridspec_kw={'wspace': 0.075},
+    rc={'axes.labelsize': 14, 'xtick.labelsize': 12, 'ytick.labelsize': 12},
+    panels=[
+        ef_panel('GDL', 'Grand Lake', ['Ti', 'Al', 'LOI_550'], 'upper right', '(a)', ylabel='Age (years)'),
+        ef_panel('EYC', 'Eychauda Lake', ['Ti', 'Al', 'TOC', 'LOI_550'], 'upper left', '(b)'),
+    ],
+    outputs=[('Figure_enrichment.pdf', {'bbox_inches': 'tight', 'pad_inches': 0.2}),
+             ('Figure_enrichment.png', {'bbox_inches': 'tight', 'pad_inches': 0.2, 'dpi': 300})],
+)
+
+
+if __name__ == "__main__":
+    build([SPEC], output_dirs=[Path(__file__).resolve().parent], show=True)
@@ -18,21 +18,26 @@ def main():
     base_dir = current_dir.parent.parent
     data_dir = base_dir / "Data"
     
-    # Define file paths
-    hg_conc_file = data_dir / "Hg.xlsx"
-    loi_file = data_dir / "LOI.xlsx"
-    age_file = data_dir / "210_Pb_dating" / "Age.xlsx"
+    # Concurrent loading (data_loader.py in the Data folder)
+    sys.path.insert(0, str(data_dir))
+    from data_loader import LoadRequest, load_all
+
+    # Data needed by the figure (screened = QC flags applied, see Data/qc_flags.csv)
+    manifest = [
+        LoadRequest('hg_data', "Hg.xlsx", usecols=["Hg_conc_GDL"], screened=True),
+        LoadRequest('loi_data', "LOI.xlsx", usecols=["LOI_550_GDL"], screened=True),
+        LoadRequest('age_data', "210_Pb_dating/Age.xlsx", usecols=["age_GDL"]),
+    ]
 
-    # Check if files exist
-    for f in [hg_conc_file, loi_file, age_file]:
-        if not f.exists():
-            print(f"File non trovato: {f}", file=sys.stderr)
-            sys.exit(1)
-    
     # Load data
-    hg_data = pd.read_excel(hg_conc_file)
-    loi_data = pd.read_excel(loi_file)
-    age_data = pd.read_excel(age_file)
+    try:
+        bundle = load_all(manifest, data_dir)
+    except FileNotFoundError as e:
+        print(f"File non trovato: {e}", file=sys.stderr)
+        sys.exit(1)
+    hg_data = bundle.hg_data
+    loi_data = bundle.loi_data
+    age_data = bundle.age_data
     
     # Controllo colonne esatte (adatta nomi colonne se serve)
     # Qui assumo che hg_data abbia colonna "Hg_conc_GDL"
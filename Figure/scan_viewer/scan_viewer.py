@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Nov  5 14:07:33 2026
+
+Local viewer of long scans backed by the pyramids of scan_pyramid.py.
+
+One panel per variable, sharing the scan axis. Whenever the visible range
+changes (pan, zoom, home), every panel asks the pyramid for the buckets of
+the new range at the level that matches the panel width in pixels and only
+replaces the data of its mean line and min/max band, so the cost of a redraw
+depends on the screen size, not on the length of the scan.
+
+Usage:
+    python scan_viewer.py <core> [xrf|ftir] [<variable> ...]
+    e.g. python scan_viewer.py EYC xrf CLR_Fe CLR_Ti CLR_Zr
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DATA_DIR = SCRIPT_DIR.parents[1] / "Data"
+
+sys.path.insert(0, str(DATA_DIR))
+import scan_pyramid  # noqa: E402
+
+DEFAULT_VARIABLES = {'xrf': ['CLR_Fe', 'CLR_Ti', 'CLR_Zr', 'CLR_Br'], 'ftir': None}
+AXIS_LABELS = {'depth_mm': 'Depth (mm)', 'wavenumber': 'Wavenumber (cm$^{-1}$)'}
+
+LINE_COLOR = 'tab:brown'
+BAND_ALPHA = 0.3
+
+
+class ScanViewer:
+    """
+    Interactive figure over a pyramid.
+
+    Parameters:
+    - path: pyramid folder
+    - names: variables to show (default: the first four)
+    - oversample: buckets requested per pixel of panel width
+    """
+
+    def __init__(self, path, names=None, oversample=1.0):
+        self.path = Path(path)
+        self.meta = scan_pyramid.read_meta(self.path)
+        self.names = list(names or list(self.meta['variables'])[:4])
+        self.oversample = oversample
+        self.level, self.n_updates, self.update_time = None, 0, 0.0
+
+        self.fig, axs = plt.subplots(len(self.names), 1, sharex=True, squeeze=False,
+                                     figsize=(12, 1.8 * len(self.names) + 0.8), constrained_layout=True)
+        self.axs = axs[:, 0]
+        self.lines, self.bands = [], []
+        for ax, name in zip(self.axs, self.names):
+            line, = ax.plot([], [], color=LINE_COLOR, lw=1)
+            self.lines.append(line)
+            self.bands.append(None)
+            ax.set_ylabel(name.replace('CLR_', 'CLR '), fontsize=10)
+            ax.grid(True, linestyle='--', alpha=0.3)
+        self.axs[-1].set_xlabel(AXIS_LABELS.get(self.meta['axis'], self.meta['axis']))
+        self.title = self.fig.suptitle('')
+
+        # Full range from the coarsest level
+        x = np.load(self.path / f"L{len(self.meta['levels']) - 1}_x.npy")
+        self.update(x[0, 0], x[-1, 1])
+        self.axs[0].set_xlim(x[0, 0], x[-1, 1])
+        self.axs[0].callbacks.connect('xlim_changed', self._on_xlim)
+
+    def _on_xlim(self, ax):
+        self.update(*ax.get_xlim())
+
+    def update(self, lo, hi):
+        """
+        Load the buckets of [lo, hi] into every panel.
+
+        Returns:
+        - pyramid level used
+        """
+        t0 = time.perf_counter()
+        width = self.axs[0].bbox.width
+        max_points = max(int(width * self.oversample), 10)
+        for k, (ax, name) in enumerate(zip(self.axs, self.names)):
+            q = scan_pyramid.query(self.path, name, lo, hi, max_points, meta=self.meta)
+            self.lines[k].set_data(q['x'], q['mean'])
+            if self.bands[k] is not None:
+                self.bands[k].remove()
+            self.bands[k] = ax.fill_between(q['x'], q['min'], q['max'], color=LINE_COLOR,
+                                            alpha=BAND_ALPHA, lw=0) if q['level'] else None
+            ok = q['n'] > 0
+            if ok.any():
+                ymin, ymax = np.nanmin(q['min'][ok]), np.nanmax(q['max'][ok])
+                pad = 0.05 * (ymax - ymin) or 0.5
+                ax.set_ylim(ymin - pad, ymax + pad)
+        self.level = q['level']
+        self.title.set_text(f"{self.meta['attrs'].get('core', '')} — level {self.level} "
+                            f"(×{self.meta['factor'] ** self.level} samples per point)")
+        self.update_time += time.perf_counter() - t0
+        self.n_updates += 1
+        return self.level
+
+
+def benchmark(viewer, n_steps=20):
+    """
+    Time of zoom steps into the middle of the scan (query + Agg draw).
+
+    Returns:
+    - list of (visible span, level, seconds)
+    """
+    lo, hi = viewer.axs[0].get_xlim()
+    centre, rows = (lo + hi) / 2, []
+    for i in range(n_steps):
+        half = (hi - lo) / 2 * 0.7 ** i
+        t0 = time.perf_counter()
+        viewer.axs[0].set_xlim(centre - half, centre + half)      # the callback loads the buckets
+        viewer.fig.canvas.draw()
+        rows.append((2 * half, viewer.level, time.perf_counter() - t0))
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-2], file=sys.stderr)
+        sys.exit(1)
+    core = sys.argv[1]
+    kind = sys.argv[2] if len(sys.argv) > 2 else 'xrf'
+    build = {'xrf': scan_pyramid.xrf_pyramid, 'ftir': scan_pyramid.ftir_pyramid}[kind]
+    path = build(core)
+
+    viewer = ScanViewer(path, sys.argv[3:] or DEFAULT_VARIABLES[kind])
+    if matplotlib.get_backend().lower() == 'agg':
+        for span, level, dt in benchmark(viewer, 10):
+            print(f"span {span:10.2f}: level {level}, {dt * 1000:6.1f} ms")
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()